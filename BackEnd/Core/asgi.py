@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Core.settings')
 
 application = get_asgi_application()
+
+# Load the province/city gazetteer before the first signup needs it
+from addresses import gazetteer  # noqa: E402
+
+gazetteer.warm_on_startup()
@@ -0,0 +1,154 @@
+# Core/pagination.py
+"""
+Keyset (cursor) pagination shared by the list endpoints.
+
+A list is ordered by a fixed tuple of fields ending in a unique one (for
+example ``('-created_at', '-id')``). The next page continues strictly after
+the last row's values for those fields, so every page is the same index
+range scan as the first and costs O(page) however large the table grows.
+Cursors are opaque base64 JSON of those values.
+
+Responses keep the body a plain list and link the next page in a
+``Link: <...?cursor=...>; rel="next"`` header (``with_next_link``).
+Ordering fields must not be nullable.
+"""
+import base64
+import bisect
+import json
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework import exceptions
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _jsonable(value):
+    # Full precision: DjangoJSONEncoder truncates datetimes to milliseconds
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (uuid.UUID, Decimal)):
+        return str(value)
+    return value
+
+
+def encode_cursor(values):
+    raw = json.dumps([_jsonable(value) for value in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, size=None):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        raise InvalidCursor("Invalid cursor")
+    if not isinstance(values, list) or (size is not None and len(values) != size):
+        raise InvalidCursor("Invalid cursor")
+    return values
+
+
+def page_limit(params, default, maximum):
+    try:
+        limit = int(params.get('limit') or default)
+    except ValueError:
+        raise InvalidCursor("limit must be a number")
+    return max(1, min(limit, maximum))
+
+
+def with_next_link(request, response, next_cursor):
+    """Link the next page in the header so the body stays a plain list"""
+    if next_cursor:
+        params = request.GET.copy()
+        params['cursor'] = next_cursor
+        response['Link'] = f'<{request.build_absolute_uri(request.path)}?{params.urlencode()}>; rel="next"'
+    return response
+
+
+class KeysetPaginator:
+    """Pages a queryset, or an in-memory list already sorted ascending, by a fixed ordering"""
+
+    def __init__(self, ordering, default_limit=None, max_limit=100):
+        self.ordering = tuple(ordering)
+        self.fields = tuple(field.lstrip('-') for field in self.ordering)
+        self.default_limit = default_limit or settings.REST_FRAMEWORK.get('PAGE_SIZE') or 20
+        self.max_limit = max_limit
+
+    def limit(self, params):
+        return page_limit(params, self.default_limit, self.max_limit)
+
+    def position(self, row):
+        if isinstance(row, dict):
+            return [row[field] for field in self.fields]
+        return [getattr(row, field) for field in self.fields]
+
+    def encode(self, row):
+        return encode_cursor(self.position(row))
+
+    def decode(self, model, cursor):
+        values = decode_cursor(cursor, len(self.fields))
+        try:
+            return [model._meta.get_field(field).to_python(value) for field, value in zip(self.fields, values)]
+        except ValidationError:
+            raise InvalidCursor("Invalid cursor")
+
+    def after(self, values):
+        """Rows strictly past ``values`` in this ordering"""
+        condition = Q(pk__in=[])
+        for i, (field, value) in enumerate(zip(self.ordering, values)):
+            lookup = f"{field.lstrip('-')}__{'lt' if field.startswith('-') else 'gt'}"
+            equal = {name: previous for name, previous in zip(self.fields[:i], values[:i])}
+            condition |= Q(**equal, **{lookup: value})
+        return condition
+
+    def paginate(self, queryset, params):
+        """Return (rows, next_cursor) for the page after ``params['cursor']``"""
+        limit = self.limit(params)
+        if params.get('cursor'):
+            queryset = queryset.filter(self.after(self.decode(queryset.model, params['cursor'])))
+        rows = list(queryset.order_by(*self.ordering)[:limit + 1])
+        return rows[:limit], self.encode(rows[limit - 1]) if len(rows) > limit else None
+
+    def paginate_list(self, rows, params):
+        """Same as ``paginate`` for a cached list sorted by the (ascending) ordering fields"""
+        limit = self.limit(params)
+        start = 0
+        if params.get('cursor'):
+            values = decode_cursor(params['cursor'], len(self.fields))
+            try:
+                start = bisect.bisect_right(rows, values, key=self.position)
+            except TypeError:
+                raise InvalidCursor("Invalid cursor")
+        page = rows[start:start + limit]
+        return page, self.encode(page[-1]) if start + limit < len(rows) else None
+
+
+class KeysetPagination(BasePagination):
+    """
+    DRF pagination class for generic views. The view declares ``ordering``
+    (default newest id first) and may narrow ``max_page_size``.
+    """
+    ordering = ('-id',)
+    max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        paginator = KeysetPaginator(
+            getattr(view, 'ordering', self.ordering),
+            max_limit=getattr(view, 'max_page_size', self.max_page_size),
+        )
+        self.request = request
+        try:
+            rows, self.next_cursor = paginator.paginate(queryset, request.query_params)
+        except InvalidCursor as e:
+            raise exceptions.ValidationError({'success': False, 'message': str(e)})
+        return rows
+
+    def get_paginated_response(self, data):
+        return with_next_link(self.request, Response(data), self.next_cursor)
@@ -52,15 +52,38 @@ INSTALLED_APPS = [
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'authentication.authentication.ClaimsJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # Keyset pages with a Link: rel="next" header; see Core.pagination
+    'DEFAULT_PAGINATION_CLASS': 'Core.pagination.KeysetPagination',
+    'PAGE_SIZE': 20,
+    # Proxies in front of Django (Nginx = 1); used to find the client IP for rate limits
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES')) if os.getenv('NUM_PROXIES') else None,
 }
 
+# Sliding-window rate limits per scope and key ('ip', 'email'); see authentication.ratelimit
+RATE_LIMITS = {
+    'send-otp': {'ip': '10/h', 'email': '5/h'},
+    'verify-otp': {'ip': '30/h', 'email': '10/15m'},
+    'login': {'ip': '60/15m', 'email': '10/15m'},
+}
+
+# URL names checked by RateLimitMiddleware, mapped to their RATE_LIMITS scope
+RATE_LIMIT_VIEWS = {
+    'send_otp': 'send-otp',
+    'verify_otp': 'verify-otp',
+    'login': 'login',
+    'login_async': 'login',
+    'token_obtain_pair': 'login',
+}
+RATE_LIMIT_CACHE = 'default'
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'authentication.ratelimit.RateLimitMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -78,6 +101,9 @@ CORS_ALLOWED_ORIGINS = [
 
 CORS_ALLOW_CREDENTIALS = True
 
+# List endpoints link their next page in this header (Core.pagination.with_next_link)
+CORS_EXPOSE_HEADERS = ['Link']
+
 ROOT_URLCONF = 'Core.urls'
 
 TEMPLATES = [
@@ -110,6 +136,22 @@ DATABASES = {
     }
 }
 
+# Cache: Redis when REDIS_URL is set so every node shares it, otherwise per-process memory
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -126,6 +168,28 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashers: the first entry is used for new hashes, and the async login
+# rehashes stored passwords to it on successful login. PASSWORD_HASHER picks it.
+PASSWORD_HASHERS = [
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+_preferred_hasher = os.getenv('PASSWORD_HASHER')
+if _preferred_hasher in PASSWORD_HASHERS:
+    PASSWORD_HASHERS.remove(_preferred_hasher)
+    PASSWORD_HASHERS.insert(0, _preferred_hasher)
+
+# Async login (`login/async/`, ASGI only): bounded executor for password checks
+LOGIN_HASHING = {
+    'EXECUTOR': os.getenv('LOGIN_HASHING_EXECUTOR', 'thread'),  # 'thread' or 'process'
+    'WORKERS': int(os.getenv('LOGIN_HASHING_WORKERS', os.cpu_count() or 2)),
+    'MAX_QUEUE': int(os.getenv('LOGIN_HASHING_MAX_QUEUE', 64)),
+    'QUEUE_TIMEOUT_SECONDS': 5,
+}
+
 # Internationalization
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'UTC'
@@ -146,6 +210,16 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Custom User Model
 AUTH_USER_MODEL = 'authentication.User'
 
+# OTP storage: the cache store needs a shared cache (REDIS_URL) when running more than one node
+OTP_STORE = {
+    'BACKEND': os.getenv(
+        'OTP_STORE_BACKEND',
+        'authentication.otp_store.CacheOTPStore' if REDIS_URL else 'authentication.otp_store.DatabaseOTPStore',
+    ),
+    'TTL_SECONDS': 600,
+    'VERIFIED_TTL_SECONDS': 1800,
+}
+
 # JWT Settings
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=int(os.getenv('JWT_ACCESS_TOKEN_LIFETIME_MINUTES', 60))),
@@ -173,6 +247,89 @@ SIMPLE_JWT = {
     'SLIDING_TOKEN_REFRESH_EXP_CLAIM': 'refresh_exp',
     'SLIDING_TOKEN_LIFETIME': timedelta(minutes=5),
     'SLIDING_TOKEN_REFRESH_LIFETIME': timedelta(days=1),
+    # Rotation is revoked through authentication.revocation, not the token_blacklist app
+    'TOKEN_REFRESH_SERIALIZER': 'authentication.serializers.RevocableTokenRefreshSerializer',
+}
+
+# Refresh-token revocation (Bloom filter in front of the RevokedToken table)
+TOKEN_REVOCATION = {
+    'EXPECTED_REVOCATIONS_PER_DAY': int(os.getenv('TOKEN_REVOCATIONS_PER_DAY', 20000)),
+    'FALSE_POSITIVE_RATE': 0.001,
+    'SYNC_SECONDS': 5,
+    'COMPACT_SECONDS': 3600,
+}
+
+# Full User objects kept per process by ClaimsJWTAuthentication
+JWT_USER_CACHE_SIZE = int(os.getenv('JWT_USER_CACHE_SIZE', 10000))
+# How often a cached JWT user is checked against its version in the shared cache
+JWT_USER_VERSION_CHECK_SECONDS = int(os.getenv('JWT_USER_VERSION_CHECK_SECONDS', 5))
+
+# How often each process checks the shared cache for a newer province/city gazetteer
+GAZETTEER_VERSION_CHECK_SECONDS = int(os.getenv('GAZETTEER_VERSION_CHECK_SECONDS', 5))
+
+# Precomputed /addresses/ location responses (see addresses.snapshot)
+LOCATION_SNAPSHOT = {
+    'MAX_AGE': int(os.getenv('LOCATION_SNAPSHOT_MAX_AGE', 300)),
+    'VERSION_CHECK_SECONDS': GAZETTEER_VERSION_CHECK_SECONDS,
+}
+
+# In-memory province/city/barangay typeahead (see addresses.autocomplete)
+ADDRESS_AUTOCOMPLETE = {
+    'SYNC_SECONDS': GAZETTEER_VERSION_CHECK_SECONDS,
+    'DEFAULT_LIMIT': 10,
+    'MAX_LIMIT': 50,
+}
+
+# Admin user search: unset BACKEND picks the pg_trgm index on PostgreSQL, the in-memory n-gram index elsewhere
+USER_SEARCH = {
+    'BACKEND': os.getenv('USER_SEARCH_BACKEND'),
+    'PAGE_SIZE': 10,
+    'MAX_PAGE_SIZE': 50,
+}
+
+# SystemActivity write-behind buffer (see management.activity_log); MODE 'sync' writes each event inline
+ACTIVITY_LOG = {
+    'MODE': os.getenv('ACTIVITY_LOG_MODE', 'buffered'),
+    'BUFFER_SIZE': 10000,
+    'BATCH_SIZE': 500,
+    'FLUSH_SECONDS': 1.0,
+    'SETTLE_SECONDS': 5.0,
+}
+
+# Periodic maintenance jobs run by `manage.py run_maintenance` (see management.scheduler).
+# JOBS entries override the defaults by name: {'TASK': dotted path, 'EVERY': seconds}, or None to disable.
+MAINTENANCE = {
+    'POLL_SECONDS': 30,
+    'KEEP_RUNS_DAYS': 30,
+    'JOBS': {},
+}
+
+# SystemActivity partitions, rollups and retention (see management.activity_storage)
+ACTIVITY_STORAGE = {
+    'MONTHS_AHEAD': 3,
+    'KEEP_MONTHS': int(os.getenv('ACTIVITY_KEEP_MONTHS', 12)),
+    'ARCHIVE_DIR': os.getenv('ACTIVITY_ARCHIVE_DIR') or None,
+}
+
+# Appointment slots and the per-process schedule cache (see appointment.schedule)
+APPOINTMENTS = {
+    'SLOT_MINUTES': 15,
+    'DEFAULT_DURATION_MINUTES': 30,
+    'DAY_START': '08:00',
+    'DAY_END': '17:00',
+}
+
+# Front desk walk-in queues (see staff.queue)
+WALK_INS = {
+    'DEFAULT_SERVICE_MINUTES': 15,
+    'VERSION_CHECK_SECONDS': 2,
+}
+
+# Appointment reminders, sent by `manage.py run_reminders` (see notification.reminders)
+REMINDERS = {
+    'OFFSETS_MINUTES': (1440, 60),
+    'LOOKAHEAD_HOURS': 48,
+    'CATCH_UP_HOURS': 24,
 }
 
 # Email Configuration
@@ -184,6 +341,20 @@ EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = os.getenv('EMAIL_HOST_USER')
 EMAIL_USE_SSL = False
+EMAIL_TIMEOUT = int(os.getenv('EMAIL_TIMEOUT', 10))
+
+# Email outbox: requests queue mail, `manage.py run_email_outbox` delivers it
+EMAIL_OUTBOX = {
+    'WORKERS': int(os.getenv('EMAIL_OUTBOX_WORKERS', 2)),
+    'BATCH_SIZE': 20,
+    'MAX_ATTEMPTS': 5,
+    'BACKOFF_BASE_SECONDS': 5,
+    'BACKOFF_MAX_SECONDS': 600,
+    'LEASE_SECONDS': 120,
+    'POLL_INTERVAL_SECONDS': 1.0,
+    'BREAKER_FAILURE_THRESHOLD': 5,
+    'BREAKER_RESET_SECONDS': 60,
+}
 
 # Security Settings (for production)
 if not DEBUG:
@@ -0,0 +1,75 @@
+from django.test import RequestFactory, TestCase
+from rest_framework.response import Response
+
+from authentication.models import User
+from .pagination import InvalidCursor, KeysetPaginator, encode_cursor, with_next_link
+
+
+class KeysetPaginatorTests(TestCase):
+    def setUp(self):
+        # Repeated last names so the id tie-breaker matters
+        for i, last_name in enumerate(['Cruz', 'Abad', 'Cruz', 'Bautista', 'Abad', 'Cruz', 'Dela Paz']):
+            User.objects.create_user(email=f"user{i}@example.com", password=None, first_name='Test',
+                                     last_name=last_name, user_type='patient')
+        self.users = User.objects.filter(email__endswith='@example.com')
+        self.paginator = KeysetPaginator(('last_name', '-id'), max_limit=100)
+
+    def walk(self, queryset, limit):
+        pages = []
+        cursor = None
+        while True:
+            params = {'limit': limit, **({'cursor': cursor} if cursor else {})}
+            rows, cursor = self.paginator.paginate(queryset, params)
+            pages.append([row.pk for row in rows])
+            if cursor is None:
+                return pages
+
+    def test_pages_cover_the_ordering_once(self):
+        expected = list(self.users.order_by('last_name', '-id').values_list('pk', flat=True))
+        pages = self.walk(self.users, 3)
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual([pk for page in pages for pk in page], expected)
+
+    def test_exact_multiple_has_no_empty_last_page(self):
+        self.assertEqual([len(page) for page in self.walk(self.users, 7)], [7])
+
+    def test_rows_inserted_before_the_cursor_do_not_shift_later_pages(self):
+        rows, cursor = self.paginator.paginate(self.users, {'limit': 3})
+        seen = [row.pk for row in rows]
+        User.objects.create_user(email='early@example.com', password=None, first_name='Test', last_name='Aaron',
+                                 user_type='patient')
+        rows, _ = self.paginator.paginate(self.users, {'limit': 100, 'cursor': cursor})
+        rest = [row.pk for row in rows]
+        self.assertFalse(set(seen) & set(rest))
+        self.assertEqual(len(seen) + len(rest), 7)
+
+    def test_invalid_cursors(self):
+        for cursor in ['not-base64!', encode_cursor(['Cruz']), encode_cursor(['Cruz', 'not-an-id'])]:
+            with self.assertRaises(InvalidCursor):
+                self.paginator.paginate(self.users, {'cursor': cursor})
+        with self.assertRaises(InvalidCursor):
+            self.paginator.paginate(self.users, {'limit': 'ten'})
+
+    def test_limit_is_capped(self):
+        paginator = KeysetPaginator(('-id',), max_limit=2)
+        rows, cursor = paginator.paginate(self.users, {'limit': 50})
+        self.assertEqual(len(rows), 2)
+        self.assertIsNotNone(cursor)
+
+    def test_paginate_list_matches_a_sorted_list(self):
+        paginator = KeysetPaginator(('day', 'id'))
+        rows = [{'day': day, 'id': i} for i, day in enumerate(['2026-01-01', '2026-01-01', '2026-01-02',
+                                                                '2026-01-03', '2026-01-03'])]
+        page, cursor = paginator.paginate_list(rows, {'limit': 2})
+        self.assertEqual(page, rows[:2])
+        page, cursor = paginator.paginate_list(rows, {'limit': 2, 'cursor': cursor})
+        self.assertEqual(page, rows[2:4])
+        page, cursor = paginator.paginate_list(rows, {'limit': 2, 'cursor': cursor})
+        self.assertEqual((page, cursor), (rows[4:], None))
+
+    def test_next_link_header(self):
+        request = RequestFactory().get('/api/v1/appointments/', {'status': 'pending', 'cursor': 'old'})
+        response = with_next_link(request, Response([]), 'abc')
+        self.assertEqual(response['Link'],
+                         '<http://testserver/api/v1/appointments/?status=pending&cursor=abc>; rel="next"')
+        self.assertFalse(with_next_link(request, Response([]), None).has_header('Link'))
@@ -0,0 +1,224 @@
+# addresses/autocomplete.py
+"""
+In-memory typeahead over provinces, cities and barangays.
+
+Each index is a sorted array of normalized keys (see gazetteer.normalize_name)
+searched with bisect, so a query costs O(log n + k). Every word of a name
+is also indexed from that word on ("santa rosa" is found by "rosa").
+
+Provinces and cities are rebuilt when the gazetteer version changes.
+Barangays come from Address rows and grow incrementally: new addresses
+saved in this process are inserted right away, and rows written elsewhere
+(other workers, bulk imports) are picked up by id every SYNC_SECONDS.
+"""
+import heapq
+import threading
+import time
+from bisect import bisect_left
+from operator import itemgetter
+
+from django.conf import settings
+
+from .gazetteer import current_version, normalize_name
+from .models import Address, CityMunicipality, Province
+
+AUTOCOMPLETE_DEFAULTS = {
+    'SYNC_SECONDS': 5,
+    'DEFAULT_LIMIT': 10,
+    'MAX_LIMIT': 50,
+}
+
+TYPES = ('province', 'city', 'barangay')
+
+
+def autocomplete_setting(name):
+    return getattr(settings, 'ADDRESS_AUTOCOMPLETE', {}).get(name, AUTOCOMPLETE_DEFAULTS[name])
+
+
+def index_keys(name):
+    """'Santa Rosa' -> ['santa rosa', 'rosa']"""
+    words = normalize_name(name).split()
+    return [' '.join(words[i:]) for i in range(len(words))]
+
+
+class PrefixIndex:
+    """Sorted keys with their items. Writers swap in new lists, so readers never need a lock."""
+
+    def __init__(self):
+        self.entries = ([], [])
+
+    def add(self, name, item):
+        self.add_many([(name, item)])
+
+    def add_many(self, named_items):
+        """Merge (name, item) pairs: bisect inserts for a few, one merge pass for many"""
+        new = sorted(((key, item) for name, item in named_items for key in index_keys(name)), key=itemgetter(0))
+        keys, items = self.entries
+        if len(new) * 64 < len(keys):
+            keys, items = list(keys), list(items)
+            for key, item in new:
+                position = bisect_left(keys, key)
+                keys.insert(position, key)
+                items.insert(position, item)
+        else:
+            merged = list(heapq.merge(zip(keys, items), new, key=itemgetter(0)))
+            keys, items = [key for key, _ in merged], [item for _, item in merged]
+        self.entries = (keys, items)
+
+    def search(self, prefix, limit):
+        """First ``limit`` distinct items with a word starting with ``prefix``, alphabetically"""
+        keys, items = self.entries
+        results = []
+        seen = set()
+        position = bisect_left(keys, prefix)
+        while position < len(keys) and len(results) < limit:
+            if not keys[position].startswith(prefix):
+                break
+            if id(items[position]) not in seen:
+                seen.add(id(items[position]))
+                results.append(items[position])
+            position += 1
+        return results
+
+    def __len__(self):
+        return len(self.entries[1])
+
+
+class LocationIndex:
+    def __init__(self, version):
+        self.version = version
+        self.provinces = PrefixIndex()
+        self.cities = PrefixIndex()
+        self.cities_by_province = {}
+        self.barangays = PrefixIndex()
+        self.barangays_by_city = {}
+        self.known_barangays = set()
+        self.high_water = 0
+        self._lock = threading.Lock()
+        self._synced_at = time.monotonic()
+
+        province_names = {}
+        provinces = []
+        for province_id, name in Province.objects.values_list('id', 'name'):
+            province_names[province_id] = name
+            provinces.append((name, {'type': 'province', 'id': province_id, 'name': name}))
+        self.provinces.add_many(provinces)
+
+        self.city_names = {}
+        cities = []
+        for city_id, name, zip_code, province_id in CityMunicipality.objects.values_list(
+                'id', 'name', 'zip_code', 'province_id'):
+            self.city_names[city_id] = (name, province_id)
+            cities.append((name, {
+                'type': 'city',
+                'id': city_id,
+                'name': name,
+                'zip_code': zip_code,
+                'province_id': province_id,
+                'province_name': province_names.get(province_id),
+            }))
+        self.cities.add_many(cities)
+        self._index_by(self.cities_by_province, 'province_id', cities)
+
+        self._sync_barangays()
+
+    @staticmethod
+    def _index_by(indexes, field, named_items):
+        groups = {}
+        for name, item in named_items:
+            groups.setdefault(item[field], []).append((name, item))
+        for value, group in groups.items():
+            indexes.setdefault(value, PrefixIndex()).add_many(group)
+
+    def barangay_item(self, barangay, city_id):
+        """Item for a (barangay, city) pair not indexed yet, else None"""
+        barangay = ' '.join(barangay.split())
+        marker = (normalize_name(barangay), city_id)
+        if not barangay or marker in self.known_barangays or city_id not in self.city_names:
+            return None
+        self.known_barangays.add(marker)
+        city_name, province_id = self.city_names[city_id]
+        return {
+            'type': 'barangay',
+            'name': barangay,
+            'city_municipality_id': city_id,
+            'city_municipality_name': city_name,
+            'province_id': province_id,
+        }
+
+    def _sync_barangays(self):
+        rows = Address.objects.filter(id__gt=self.high_water).order_by('id').values_list(
+            'id', 'barangay', 'city_municipality_id')
+        barangays = []
+        for address_id, barangay, city_id in rows.iterator(chunk_size=5000):
+            item = self.barangay_item(barangay, city_id)
+            if item is not None:
+                barangays.append((item['name'], item))
+            self.high_water = address_id
+        if barangays:
+            self.barangays.add_many(barangays)
+            self._index_by(self.barangays_by_city, 'city_municipality_id', barangays)
+
+    def sync(self):
+        now = time.monotonic()
+        if now - self._synced_at < autocomplete_setting('SYNC_SECONDS'):
+            return
+        with self._lock:
+            if now - self._synced_at >= autocomplete_setting('SYNC_SECONDS'):
+                self._sync_barangays()
+                self._synced_at = now
+
+    def address_saved(self, address):
+        with self._lock:
+            item = self.barangay_item(address.barangay, address.city_municipality_id)
+            if item is not None:
+                self.barangays.add(item['name'], item)
+                self.barangays_by_city.setdefault(item['city_municipality_id'], PrefixIndex()).add(item['name'], item)
+
+    def search(self, query, types=TYPES, limit=None, province_id=None, city_id=None):
+        limit = min(limit or autocomplete_setting('DEFAULT_LIMIT'), autocomplete_setting('MAX_LIMIT'))
+        prefix = normalize_name(query)
+        if not prefix:
+            return []
+        self.sync()
+
+        results = []
+        if 'province' in types:
+            results += self.provinces.search(prefix, limit - len(results))
+        if 'city' in types and len(results) < limit:
+            index = self.cities if province_id is None else self.cities_by_province.get(province_id)
+            results += index.search(prefix, limit - len(results)) if index else []
+        if 'barangay' in types and len(results) < limit:
+            index = self.barangays if city_id is None else self.barangays_by_city.get(city_id)
+            results += index.search(prefix, limit - len(results)) if index else []
+        return results
+
+
+_index = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def get_index():
+    """Return this process's index, rebuilding it when provinces/cities change"""
+    global _index, _checked_at
+    now = time.monotonic()
+    if _index is not None and now - _checked_at < autocomplete_setting('SYNC_SECONDS'):
+        return _index
+
+    with _lock:
+        version = current_version()
+        if _index is None or _index.version != version:
+            _index = LocationIndex(version)
+        _checked_at = now
+        return _index
+
+
+def invalidate():
+    global _index
+    _index = None
+
+
+def address_saved(address):
+    if _index is not None:
+        _index.address_saved(address)
@@ -0,0 +1,128 @@
+# addresses/gazetteer.py
+"""
+In-memory gazetteer of provinces and cities.
+
+Each process holds an immutable snapshot of every Province and
+CityMunicipality keyed by normalized name (case, accents and spacing
+ignored), so resolving a signup address is two dictionary lookups.
+
+Snapshots are versioned through a counter in the shared cache. Saving or
+deleting a Province/CityMunicipality (admin edits, new names created during
+signup) bumps the counter, and every process reloads on its next lookup after
+noticing, checking at most every GAZETTEER_VERSION_CHECK_SECONDS.
+"""
+import logging
+import threading
+import time
+import unicodedata
+from types import MappingProxyType
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, transaction
+
+from .models import CityMunicipality, Province
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'gazetteer:version'
+
+
+def normalize_name(name):
+    """'  Biñan  City ' -> 'binan city'"""
+    decomposed = unicodedata.normalize('NFKD', name or '')
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(stripped.casefold().split())
+
+
+class Gazetteer:
+    def __init__(self, version, provinces, cities):
+        self.version = version
+        # normalized province name -> province id
+        self.provinces = MappingProxyType(provinces)
+        # (province id, normalized city name) -> city id
+        self.cities = MappingProxyType(cities)
+
+    @classmethod
+    def load(cls, version):
+        provinces = {}
+        for province_id, name in Province.objects.order_by('id').values_list('id', 'name'):
+            provinces.setdefault(normalize_name(name), province_id)
+        cities = {}
+        for city_id, name, province_id in CityMunicipality.objects.order_by('id').values_list(
+                'id', 'name', 'province_id'):
+            cities.setdefault((province_id, normalize_name(name)), city_id)
+        return cls(version, provinces, cities)
+
+    def province_id(self, name):
+        return self.provinces.get(normalize_name(name))
+
+    def city_id(self, province_id, name):
+        return self.cities.get((province_id, normalize_name(name)))
+
+
+_snapshot = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def current_version():
+    return cache.get(VERSION_KEY, 0)
+
+
+def get_gazetteer():
+    """Return this process's snapshot, reloading it if another process published a new version"""
+    global _snapshot, _checked_at
+    now = time.monotonic()
+    check_every = getattr(settings, 'GAZETTEER_VERSION_CHECK_SECONDS', 5)
+    if _snapshot is not None and now - _checked_at < check_every:
+        return _snapshot
+
+    with _lock:
+        version = current_version()
+        if _snapshot is None or _snapshot.version != version:
+            _snapshot = Gazetteer.load(version)
+        _checked_at = now
+        return _snapshot
+
+
+def warm_on_startup():
+    """Load the snapshot when a worker boots; if the database is not ready yet, the first lookup loads it"""
+    try:
+        get_gazetteer()
+    except DatabaseError as e:
+        logger.warning(f"Gazetteer not preloaded: {str(e)}")
+
+
+def bump_version():
+    """Publish a new version so every process reloads; takes effect locally right away"""
+    global _snapshot
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        if not cache.add(VERSION_KEY, 1, timeout=None):
+            cache.incr(VERSION_KEY)
+    _snapshot = None
+
+
+def resolve_city(province_name, city_name, zip_code=''):
+    """Return the CityMunicipality id for the given names, creating the province/city if unknown"""
+    gazetteer = get_gazetteer()
+    province_id = gazetteer.province_id(province_name)
+    if province_id is not None:
+        city_id = gazetteer.city_id(province_id, city_name)
+        if city_id is not None:
+            return city_id
+
+    # Unknown location: the case-insensitive unique constraints make this race safe
+    with transaction.atomic():
+        province, _ = Province.objects.get_or_create(
+            name__iexact=province_name.strip(),
+            defaults={'name': province_name.strip()},
+        )
+        city, _ = CityMunicipality.objects.get_or_create(
+            name__iexact=city_name.strip(),
+            province=province,
+            defaults={'name': city_name.strip(), 'zip_code': zip_code or ''},
+        )
+    return city.pk
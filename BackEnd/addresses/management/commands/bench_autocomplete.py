@@ -0,0 +1,60 @@
+import random
+import statistics
+import string
+import time
+
+from django.core.management.base import BaseCommand
+
+from addresses.autocomplete import PrefixIndex, get_index
+
+
+class Command(BaseCommand):
+    help = "Measure autocomplete latency on a synthetic index (or the live one with --live)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--names', type=int, default=42000, help="Synthetic names (the Philippines has ~42k barangays)")
+        parser.add_argument('--queries', type=int, default=20000)
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument('--live', action='store_true', help="Query the index built from the database")
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        syllables = ['san', 'ta', 'ma', 'ri', 'bi', 'ñan', 'lo', 'pez', 'ca', 'la', 'mba', 'ro', 'sa', 'po', 'blac', 'ion']
+
+        if options['live']:
+            index = get_index()
+            search = lambda prefix: index.search(prefix, limit=options['limit'])  # noqa: E731
+            size = len(index.provinces) + len(index.cities) + len(index.barangays)
+        else:
+            index = PrefixIndex()
+            started = time.perf_counter()
+            names = []
+            for i in range(options['names']):
+                words = [''.join(rng.choice(syllables) for _ in range(rng.randint(1, 3))) for _ in range(rng.randint(1, 3))]
+                names.append((' '.join(words).title(), {'type': 'barangay', 'name': ' '.join(words).title(), 'id': i}))
+            index.add_many(names)
+            self.stdout.write(f"Built {len(index)} keys in {(time.perf_counter() - started) * 1000:.0f}ms")
+            started = time.perf_counter()
+            for i in range(1000):
+                index.add(f"New Barangay {i}", {'type': 'barangay', 'name': f"New Barangay {i}", 'id': -i})
+            self.stdout.write(f"Incremental add: {(time.perf_counter() - started) * 1000:.3f}µs per name")
+            search = lambda prefix: index.search(prefix, options['limit'])  # noqa: E731
+            size = len(index)
+
+        prefixes = []
+        for _ in range(options['queries']):
+            word = rng.choice(syllables) + rng.choice(syllables + list(string.ascii_lowercase))
+            prefixes.append(word[:rng.randint(1, len(word))])
+
+        timings = []
+        for prefix in prefixes:
+            started = time.perf_counter()
+            search(prefix)
+            timings.append((time.perf_counter() - started) * 1e6)
+        timings.sort()
+
+        self.stdout.write(f"{size} index entries, {len(timings)} queries, limit {options['limit']}")
+        self.stdout.write(
+            f"p50 {statistics.median(timings):.1f}µs  p99 {timings[int(len(timings) * 0.99)]:.1f}µs  "
+            f"max {timings[-1]:.1f}µs"
+        )
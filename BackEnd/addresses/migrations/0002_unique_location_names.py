@@ -0,0 +1,44 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:17
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+def merge_duplicates(apps, schema_editor):
+    """Fold case-insensitive duplicate provinces/cities into the oldest row before adding the constraints"""
+    Province = apps.get_model('addresses', 'Province')
+    CityMunicipality = apps.get_model('addresses', 'CityMunicipality')
+    Address = apps.get_model('addresses', 'Address')
+
+    keep = {}
+    for province_id, name in Province.objects.order_by('id').values_list('id', 'name'):
+        keeper = keep.setdefault(name.lower(), province_id)
+        if keeper != province_id:
+            CityMunicipality.objects.filter(province_id=province_id).update(province_id=keeper)
+            Province.objects.filter(id=province_id).delete()
+
+    keep = {}
+    for city_id, name, province_id in CityMunicipality.objects.order_by('id').values_list('id', 'name', 'province_id'):
+        keeper = keep.setdefault((name.lower(), province_id), city_id)
+        if keeper != city_id:
+            Address.objects.filter(city_municipality_id=city_id).update(city_municipality_id=keeper)
+            CityMunicipality.objects.filter(id=city_id).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('addresses', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='citymunicipality',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('name'), models.F('province'), name='unique_city_per_province'),
+        ),
+        migrations.AddConstraint(
+            model_name='province',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('name'), name='unique_province_name'),
+        ),
+    ]
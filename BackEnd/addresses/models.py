@@ -1,9 +1,15 @@
 # addresses/models.py
 from django.db import models
+from django.db.models.functions import Lower
 
 class Province(models.Model):
     name = models.CharField(max_length=100)
     
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(Lower('name'), name='unique_province_name'),
+        ]
+    
     def __str__(self):
         return self.name
 
@@ -12,6 +18,11 @@ class CityMunicipality(models.Model):
     zip_code = models.CharField(max_length=10, blank=True)
     province = models.ForeignKey(Province, on_delete=models.CASCADE)
     
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(Lower('name'), 'province', name='unique_city_per_province'),
+        ]
+    
     def __str__(self):
         return self.name
 
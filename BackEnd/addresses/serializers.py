@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from .gazetteer import resolve_city
 from .models import Province, CityMunicipality, Address
 
 class ProvinceSerializer(serializers.ModelSerializer):
@@ -31,23 +32,18 @@ class AddressCreateSerializer(serializers.Serializer):
     zip_code = serializers.CharField(max_length=10, required=False, allow_blank=True)
     
     def create(self, validated_data):
-        # Get or create Province
-        province, created = Province.objects.get_or_create(
-            name=validated_data['province']
-        )
-        
-        # Get or create CityMunicipality
-        city_municipality, created = CityMunicipality.objects.get_or_create(
-            name=validated_data['city_municipality'],
-            province=province,
-            defaults={'zip_code': validated_data.get('zip_code', '')}
+        # Resolve Province/CityMunicipality from the in-memory gazetteer, creating them only if unknown
+        city_municipality_id = resolve_city(
+            validated_data['province'],
+            validated_data['city_municipality'],
+            validated_data.get('zip_code', ''),
         )
         
         # Create Address
         address = Address.objects.create(
             street=validated_data['street'],
             barangay=validated_data['barangay'],
-            city_municipality=city_municipality
+            city_municipality_id=city_municipality_id
         )
         
         return address
\ No newline at end of file
@@ -0,0 +1,25 @@
+# addresses/signals.py
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import autocomplete, snapshot
+from .gazetteer import bump_version
+from .models import Address, CityMunicipality, Province
+
+
+@receiver(post_save, sender=Province)
+@receiver(post_save, sender=CityMunicipality)
+@receiver(post_delete, sender=Province)
+@receiver(post_delete, sender=CityMunicipality)
+def invalidate_location_caches(sender, **kwargs):
+    """Publish a new location data version once the change is committed"""
+    transaction.on_commit(bump_version)
+    transaction.on_commit(snapshot.invalidate)
+    transaction.on_commit(autocomplete.invalidate)
+
+
+@receiver(post_save, sender=Address)
+def index_barangay(sender, instance, created, **kwargs):
+    """Add the barangay to this process's autocomplete index without a rebuild"""
+    transaction.on_commit(lambda: autocomplete.address_saved(instance))
@@ -0,0 +1,163 @@
+# addresses/snapshot.py
+"""
+Precomputed responses for the public location endpoints.
+
+The nested province -> cities list that signup forms load changes only
+when an admin edits locations. Instead of rebuilding it from the ORM on
+every request, each process serializes it once per gazetteer version into
+JSON, gzip and (when the ``brotli`` package is installed) brotli bytes.
+The paged province and city lists are sliced from the same rows.
+
+ETags are content hashes, so every node hands out the same tag for the
+same data and a client revalidating against any node gets a 304.
+"""
+import gzip
+import hashlib
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+
+from .gazetteer import current_version
+from .models import CityMunicipality, Province
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+SNAPSHOT_DEFAULTS = {
+    'MAX_AGE': 300,
+    'VERSION_CHECK_SECONDS': 5,
+}
+
+
+def snapshot_setting(name):
+    return getattr(settings, 'LOCATION_SNAPSHOT', {}).get(name, SNAPSHOT_DEFAULTS[name])
+
+
+class Payload:
+    """One JSON document with its precompressed encodings and ETags"""
+
+    def __init__(self, data):
+        self.body = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        digest = hashlib.sha256(self.body).hexdigest()[:32]
+        self.encodings = {None: (self.body, f'"{digest}"')}
+        self.encodings['gzip'] = (gzip.compress(self.body, compresslevel=9, mtime=0), f'"{digest}-gzip"')
+        if brotli is not None:
+            self.encodings['br'] = (brotli.compress(self.body, quality=11), f'"{digest}-br"')
+        self.etags = {etag for _, etag in self.encodings.values()}
+
+    def choose_encoding(self, accept_encoding):
+        accepted = set()
+        for item in accept_encoding.split(','):
+            coding, *params = item.split(';')
+            quality = 1.0
+            for param in params:
+                name, _, value = param.strip().partition('=')
+                if name == 'q':
+                    try:
+                        quality = float(value)
+                    except ValueError:
+                        quality = 0.0
+            if quality > 0:
+                accepted.add(coding.strip().lower())
+        for coding in ('br', 'gzip'):
+            if coding in self.encodings and (coding in accepted or '*' in accepted):
+                return coding
+        return None
+
+    def response(self, request):
+        coding = self.choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        body, etag = self.encodings[coding]
+
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH', '')
+        tags = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+        if '*' in tags or tags & self.etags:
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(body, content_type='application/json')
+            if coding:
+                response['Content-Encoding'] = coding
+        response['ETag'] = etag
+        response['Cache-Control'] = f"public, max-age={snapshot_setting('MAX_AGE')}"
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+
+class LocationSnapshot:
+    def __init__(self, version):
+        self.version = version
+        provinces = list(Province.objects.order_by('id').values('id', 'name'))
+        cities = list(CityMunicipality.objects.order_by('id').values('id', 'name', 'zip_code', 'province_id'))
+        province_names = {province['id']: province['name'] for province in provinces}
+
+        cities_by_province = {province['id']: [] for province in provinces}
+        for city in cities:
+            cities_by_province[city['province_id']].append(city)
+
+        self.locations = Payload([
+            {
+                'id': province['id'],
+                'name': province['name'],
+                'cities': [
+                    {'id': city['id'], 'name': city['name'], 'zip_code': city['zip_code']}
+                    for city in cities_by_province[province['id']]
+                ],
+            }
+            for province in provinces
+        ])
+        # Province and city lists are paged from these rows (sorted by id)
+        self.province_rows = provinces
+
+        def city_rows(rows):
+            return [
+                {
+                    'id': city['id'],
+                    'name': city['name'],
+                    'zip_code': city['zip_code'],
+                    'province': city['province_id'],
+                    'province_name': province_names[city['province_id']],
+                }
+                for city in rows
+            ]
+
+        self.city_rows = city_rows(cities)
+        self.city_rows_by_province = {
+            province_id: city_rows(rows) for province_id, rows in cities_by_province.items()
+        }
+
+    def cities_for(self, province_id):
+        try:
+            return self.city_rows_by_province.get(int(province_id), [])
+        except (TypeError, ValueError):
+            return []
+
+
+_snapshot = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def get_snapshot():
+    """Return this process's snapshot, rebuilding it when the location data version changes"""
+    global _snapshot, _checked_at
+    now = time.monotonic()
+    if _snapshot is not None and now - _checked_at < snapshot_setting('VERSION_CHECK_SECONDS'):
+        return _snapshot
+
+    with _lock:
+        version = current_version()
+        if _snapshot is None or _snapshot.version != version:
+            _snapshot = LocationSnapshot(version)
+        _checked_at = now
+        return _snapshot
+
+
+def invalidate():
+    """Drop this process's snapshot; the next request rebuilds it"""
+    global _snapshot
+    _snapshot = None
@@ -5,4 +5,5 @@ urlpatterns = [
     path('locations/', views.LocationDataView.as_view(), name='location-data'),
     path('provinces/', views.ProvinceListView.as_view(), name='provinces-list'),
     path('cities/', views.CityMunicipalityListView.as_view(), name='cities-list'),
+    path('autocomplete/', views.AddressAutocompleteView.as_view(), name='address-autocomplete'),
 ]
\ No newline at end of file
@@ -2,52 +2,56 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import AllowAny
-from .models import Province, CityMunicipality, Address
-from .serializers import ProvinceSerializer, CityMunicipalitySerializer, AddressSerializer
+from Core.pagination import InvalidCursor, KeysetPaginator, with_next_link
+from .autocomplete import TYPES, get_index
+from .snapshot import get_snapshot
+
+LOCATION_PAGES = KeysetPaginator(('id',), default_limit=100, max_limit=500)
+
+def location_page(request, rows):
+    try:
+        page, next_cursor = LOCATION_PAGES.paginate_list(rows, request.query_params)
+    except InvalidCursor as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return with_next_link(request, Response(page), next_cursor)
 
 class LocationDataView(APIView):
     permission_classes = [AllowAny]
     
     def get(self, request):
         """Get provinces and their cities for form dropdowns"""
-        provinces = Province.objects.prefetch_related('citymunicipality_set').all()
-        
-        data = []
-        for province in provinces:
-            cities = [
-                {
-                    'id': city.id,
-                    'name': city.name,
-                    'zip_code': city.zip_code
-                }
-                for city in province.citymunicipality_set.all()
-            ]
-            
-            data.append({
-                'id': province.id,
-                'name': province.name,
-                'cities': cities
-            })
-        
-        return Response(data, status=status.HTTP_200_OK)
+        return get_snapshot().locations.response(request)
 
 class ProvinceListView(APIView):
     permission_classes = [AllowAny]
     
     def get(self, request):
-        provinces = Province.objects.all()
-        serializer = ProvinceSerializer(provinces, many=True)
-        return Response(serializer.data)
+        """Provinces by id (?cursor=, ?limit=)"""
+        return location_page(request, get_snapshot().province_rows)
 
 class CityMunicipalityListView(APIView):
     permission_classes = [AllowAny]
     
     def get(self, request):
+        """Cities/municipalities by id, optionally ?province_id= (?cursor=, ?limit=)"""
         province_id = request.query_params.get('province_id')
-        if province_id:
-            cities = CityMunicipality.objects.filter(province_id=province_id)
-        else:
-            cities = CityMunicipality.objects.all()
+        snapshot = get_snapshot()
+        rows = snapshot.cities_for(province_id) if province_id else snapshot.city_rows
+        return location_page(request, rows)
+
+class AddressAutocompleteView(APIView):
+    permission_classes = [AllowAny]
+    
+    def get(self, request):
+        """Typeahead for provinces, cities and barangays: ?q=&types=city,barangay&limit=&province_id=&city_id="""
+        query = request.query_params.get('q', '')
+        types = [t for t in request.query_params.get('types', ','.join(TYPES)).split(',') if t in TYPES]
+        try:
+            limit = int(request.query_params['limit']) if request.query_params.get('limit') else None
+            province_id = int(request.query_params['province_id']) if request.query_params.get('province_id') else None
+            city_id = int(request.query_params['city_id']) if request.query_params.get('city_id') else None
+        except ValueError:
+            return Response({'error': 'limit, province_id and city_id must be integers'}, status=status.HTTP_400_BAD_REQUEST)
         
-        serializer = CityMunicipalitySerializer(cities, many=True)
-        return Response(serializer.data)
\ No newline at end of file
+        results = get_index().search(query, types=types, limit=limit, province_id=province_id, city_id=city_id)
+        return Response(results)
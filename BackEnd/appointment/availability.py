@@ -0,0 +1,216 @@
+# appointment/availability.py
+"""
+Free-slot search across many doctors.
+
+Each doctor's day is a boolean NumPy bitmap over the SLOT_MINUTES grid
+from local midnight: True where the slot lies inside working hours and
+touches no active appointment. A search stacks the bitmaps of every
+candidate doctor for a day into one (doctors x slots) matrix, finds
+runs of ``duration`` free slots with a cumulative sum, and takes the
+earliest starts with ``nonzero`` (or each doctor's first with
+``argmax``), walking forward a day at a time until it has enough.
+
+Bitmaps hang off the DaySchedule objects of appointment.schedule, so
+they share its per-(doctor, day) cache, eviction and invalidation on
+booking: a changed day comes back as a new DaySchedule and its bitmap is
+rebuilt. Working hours are cached per doctor and dropped for every
+process when any WorkingHours row changes (a shared version key, checked
+at most every VERSION_CHECK_SECONDS).
+"""
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+import numpy as np
+from django.core.cache import cache
+from django.utils import timezone
+
+from doctor.models import WorkingHours
+from .schedule import appointments_setting, day_bounds, get_schedules
+
+HOURS_VERSION_KEY = 'availability:hours_version'
+
+
+def bump_hours_version():
+    if not cache.add(HOURS_VERSION_KEY, 1, None):
+        try:
+            cache.incr(HOURS_VERSION_KEY)
+        except ValueError:
+            cache.set(HOURS_VERSION_KEY, 1, None)
+
+
+def default_hours():
+    start = datetime.strptime(appointments_setting('DAY_START'), '%H:%M').time()
+    end = datetime.strptime(appointments_setting('DAY_END'), '%H:%M').time()
+    return {weekday: [(start, end)] for weekday in appointments_setting('WORKING_DAYS')}
+
+
+def mark(size, first, last):
+    """Boolean array of ``size`` with [first[i], last[i]) set for every i"""
+    delta = np.zeros(size + 1, dtype=np.int32)
+    np.add.at(delta, first, 1)
+    np.add.at(delta, last, -1)
+    return np.cumsum(delta[:-1]) > 0
+
+
+class Availability:
+    def __init__(self, schedules=None, slot_minutes=None, version_check_seconds=None):
+        self.schedules = schedules or get_schedules()
+        self.slot_seconds = (slot_minutes or appointments_setting('SLOT_MINUTES')) * 60
+        self.version_check_seconds = (
+            appointments_setting('VERSION_CHECK_SECONDS') if version_check_seconds is None else version_check_seconds
+        )
+        self.hours = {}
+        self.hours_version = None
+        self.hours_checked_at = 0.0
+        # Bumped whenever cached hours are dropped; bitmaps built from older hours are rebuilt
+        self.generation = 0
+        self._lock = threading.Lock()
+
+    # Working hours
+
+    def check_hours_version(self):
+        now = time.monotonic()
+        if now - self.hours_checked_at < self.version_check_seconds:
+            return
+        version = cache.get(HOURS_VERSION_KEY)
+        with self._lock:
+            if version != self.hours_version:
+                self.hours.clear()
+                self.hours_version = version
+                self.generation += 1
+            self.hours_checked_at = now
+
+    def working_hours(self, doctor_ids):
+        """{doctor_id: {weekday: [(start_time, end_time)]}}, loading missing doctors with one query"""
+        missing = [doctor_id for doctor_id in doctor_ids if doctor_id not in self.hours]
+        if missing:
+            loaded = {doctor_id: {} for doctor_id in missing}
+            rows = WorkingHours.objects.filter(doctor_id__in=missing).values_list(
+                'doctor_id', 'weekday', 'start_time', 'end_time'
+            )
+            for doctor_id, weekday, start_time, end_time in rows.iterator(chunk_size=5000):
+                loaded[doctor_id].setdefault(weekday, []).append((start_time, end_time))
+            fallback = default_hours()
+            with self._lock:
+                for doctor_id, hours in loaded.items():
+                    self.hours[doctor_id] = hours or fallback
+        return {doctor_id: self.hours[doctor_id] for doctor_id in doctor_ids}
+
+    def working_windows(self, doctor_id, day):
+        """A doctor's working blocks on a local day as sorted [(start_at, end_at)], touching blocks merged"""
+        self.check_hours_version()
+        blocks = sorted(self.working_hours([doctor_id])[doctor_id].get(day.weekday(), []))
+        windows = []
+        for start, end in blocks:
+            start_at = timezone.make_aware(datetime.combine(day, start))
+            end_at = timezone.make_aware(datetime.combine(day, end))
+            if windows and start_at <= windows[-1][1]:
+                windows[-1] = (windows[-1][0], max(windows[-1][1], end_at))
+            else:
+                windows.append((start_at, end_at))
+        return windows
+
+    def within_hours(self, doctor_id, start_at, end_at):
+        """Whether [start_at, end_at) lies inside one of the doctor's working blocks"""
+        day = timezone.localtime(start_at).date()
+        return any(start <= start_at and end_at <= end for start, end in self.working_windows(doctor_id, day))
+
+    # Bitmaps
+
+    def slot_count(self, day):
+        start, end = day_bounds(day)
+        return int((end - start).total_seconds() // self.slot_seconds)
+
+    def working_mask(self, hours, day, size):
+        origin = day_bounds(day)[0].timestamp()
+        blocks = hours.get(day.weekday(), [])
+        if not blocks:
+            return np.zeros(size, dtype=bool)
+        # Only slots wholly inside a block count
+        first = [math.ceil((timezone.make_aware(datetime.combine(day, start)).timestamp() - origin) / self.slot_seconds)
+                 for start, _ in blocks]
+        last = [int((timezone.make_aware(datetime.combine(day, end)).timestamp() - origin) // self.slot_seconds)
+                for _, end in blocks]
+        return mark(size, np.clip(first, 0, size), np.clip(last, 0, size))
+
+    def booked_mask(self, schedule, size):
+        if not len(schedule):
+            return np.zeros(size, dtype=bool)
+        origin = schedule.window[0]
+        first = np.floor((np.asarray(schedule.starts) - origin) / self.slot_seconds).astype(np.int64)
+        last = np.ceil((np.asarray(schedule.ends) - origin) / self.slot_seconds).astype(np.int64)
+        return mark(size, np.clip(first, 0, size), np.clip(last, 0, size))
+
+    def bitmap(self, schedule, hours):
+        cached = getattr(schedule, 'free_bitmap', None)
+        if cached is not None and cached[0] == self.generation:
+            return cached[1]
+        size = self.slot_count(schedule.day)
+        bitmap = self.working_mask(hours, schedule.day, size) & ~self.booked_mask(schedule, size)
+        schedule.free_bitmap = (self.generation, bitmap)
+        return bitmap
+
+    def day_matrix(self, doctor_ids, day):
+        """(doctors x slots) free bitmap for ``day``, rows in ``doctor_ids`` order"""
+        hours = self.working_hours(doctor_ids)
+        schedules = self.schedules.get_many(doctor_ids, day)
+        return np.stack([self.bitmap(schedules[doctor_id], hours[doctor_id]) for doctor_id in doctor_ids])
+
+    # Search
+
+    def next_free_slots(self, doctor_ids, after, duration, limit=10, days=None, distinct_doctors=False):
+        """
+        Up to ``limit`` (doctor_id, start_at, end_at) free slots of ``duration``
+        starting at or after ``after``, earliest first (ties in ``doctor_ids``
+        order), looking ``days`` local days ahead. With ``distinct_doctors``
+        each doctor appears once, at their first free slot.
+        """
+        self.check_hours_version()
+        doctor_ids = list(dict.fromkeys(doctor_ids))
+        days = min(days or appointments_setting('SEARCH_DAYS'), appointments_setting('MAX_SEARCH_DAYS'))
+        need = max(1, math.ceil(duration.total_seconds() / self.slot_seconds))
+        first_day = timezone.localtime(after).date()
+        found = []
+
+        for offset in range(days):
+            if len(found) >= limit or not doctor_ids:
+                break
+            day = first_day + timedelta(days=offset)
+            matrix = self.day_matrix(doctor_ids, day)
+            size = matrix.shape[1]
+            if need > size:
+                continue
+
+            # runs[d, s]: slots s .. s + need - 1 are all free for doctor d
+            counts = np.zeros((matrix.shape[0], size + 1), dtype=np.int32)
+            np.cumsum(matrix, axis=1, out=counts[:, 1:])
+            runs = (counts[:, need:] - counts[:, :-need]) == need
+            origin = day_bounds(day)[0]
+            if offset == 0:
+                runs[:, :max(0, math.ceil((after - origin).total_seconds() / self.slot_seconds))] = False
+
+            if distinct_doctors:
+                rows = np.flatnonzero(runs.any(axis=1))
+                starts = runs[rows].argmax(axis=1)
+                order = np.lexsort((rows, starts))
+                picked = list(zip(rows[order].tolist(), starts[order].tolist()))
+            else:
+                slots, rows = np.nonzero(runs.T)
+                picked = list(zip(rows.tolist(), slots.tolist()))
+
+            for row, slot in picked[:limit - len(found)]:
+                start_at = origin + timedelta(seconds=slot * self.slot_seconds)
+                found.append((doctor_ids[row], start_at, start_at + duration))
+            if distinct_doctors:
+                taken = {doctor_ids[row] for row, _ in picked}
+                doctor_ids = [doctor_id for doctor_id in doctor_ids if doctor_id not in taken]
+        return found
+
+
+@lru_cache(maxsize=None)
+def get_availability():
+    """This process's Availability, over its ScheduleCache"""
+    return Availability()
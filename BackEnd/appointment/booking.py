@@ -0,0 +1,227 @@
+# appointment/booking.py
+"""
+Booking, holding and cancelling appointments.
+
+The database decides conflicts. On PostgreSQL the ``appointment_no_overlap``
+exclusion constraint (migration 0004) rejects an active appointment that
+overlaps another for the same doctor, so concurrent bookings of different
+slots never wait on each other and a losing insert fails with an
+IntegrityError. Other databases lock the doctor row and check for overlaps
+inside the transaction instead.
+
+A hold is an appointment with status 'held' and a ``hold_expires_at``: it
+takes the slot through the same constraint, so of many clients racing for
+one slot exactly one insert wins. The holder confirms it within
+HOLD_SECONDS or it lapses. A lapsed hold still occupies its row until it
+is reclaimed: the next insert that collides with it deletes it (locking
+with SKIP LOCKED, so concurrent reclaimers never queue behind each other)
+and retries, and the release_expired_holds job sweeps the rest. A client
+that loses the race is given a hold on the next free slot instead.
+
+The in-memory schedule (appointment.schedule) answers the common "already
+taken" case without a write and serves free-slot queries; it is refreshed
+on commit of every change.
+"""
+from datetime import timedelta
+
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from doctor.models import Doctor
+from .availability import get_availability
+from .models import Appointment
+from .schedule import appointments_setting, days_between, get_schedules, occupying
+
+OVERLAP_CONSTRAINT = 'appointment_no_overlap'
+
+
+class BookingError(ValueError):
+    pass
+
+
+class SlotUnavailable(BookingError):
+    def __init__(self, message="That time is no longer available", conflicts=()):
+        super().__init__(message)
+        self.conflicts = list(conflicts)
+
+
+def validate_interval(start_at, end_at):
+    if end_at <= start_at:
+        raise BookingError("end_at must be after start_at")
+    if end_at - start_at > timedelta(minutes=appointments_setting('MAX_DURATION_MINUTES')):
+        raise BookingError("Appointment is too long")
+
+
+def validate_time(doctor_id, start_at, end_at):
+    """The slot must be in the future and inside the doctor's working hours"""
+    if start_at <= timezone.now():
+        raise BookingError("Appointments must start in the future")
+    if not get_availability().within_hours(doctor_id, start_at, end_at):
+        raise BookingError("The doctor is not working at that time")
+
+
+def overlapping(doctor_id, start_at, end_at, exclude_id=None):
+    """Appointments of a doctor occupying any of [start_at, end_at)"""
+    appointments = occupying(Appointment.objects.filter(
+        doctor_id=doctor_id,
+        start_at__lt=end_at,
+        end_at__gt=start_at,
+    ))
+    if exclude_id is not None:
+        appointments = appointments.exclude(pk=exclude_id)
+    return appointments
+
+
+def schedule_conflicts(doctor_id, start_at, end_at):
+    schedules = get_schedules()
+    found = []
+    for day in days_between(start_at, end_at):
+        found += schedules.get(doctor_id, day).conflicts(start_at, end_at)
+    return found
+
+
+def is_overlap_violation(error):
+    constraint = getattr(getattr(error.__cause__, 'diag', None), 'constraint_name', None)
+    return constraint == OVERLAP_CONSTRAINT or OVERLAP_CONSTRAINT in str(error)
+
+
+def reclaim_lapsed_holds(doctor_id, start_at, end_at):
+    """Delete lapsed holds in [start_at, end_at) that no other transaction is reclaiming. Returns how many."""
+    lapsed = Appointment.objects.select_for_update(skip_locked=True).filter(
+        doctor_id=doctor_id, status='held', hold_expires_at__lte=timezone.now(),
+        start_at__lt=end_at, end_at__gt=start_at,
+    )
+    ids = list(lapsed.values_list('id', flat=True))
+    if ids:
+        Appointment.objects.filter(pk__in=ids).delete()
+    return len(ids)
+
+
+def insert_with_constraint(appointment):
+    """PostgreSQL: let the exclusion constraint reject overlaps, retrying once after reclaiming lapsed holds"""
+    for attempt in range(2):
+        try:
+            with transaction.atomic():
+                appointment.save()
+            return appointment
+        except IntegrityError as e:
+            if not is_overlap_violation(e):
+                raise
+            if attempt or not reclaim_lapsed_holds(appointment.doctor_id, appointment.start_at, appointment.end_at):
+                raise SlotUnavailable()
+
+
+def insert_appointment(appointment):
+    """Save ``appointment`` unless it overlaps an active one; call inside a transaction"""
+    if connection.vendor == 'postgresql':
+        return insert_with_constraint(appointment)
+
+    # No exclusion constraints here: serialize bookings per doctor
+    Doctor.objects.select_for_update().filter(pk=appointment.doctor_id).exists()
+    reclaim_lapsed_holds(appointment.doctor_id, appointment.start_at, appointment.end_at)
+    conflicts = list(overlapping(appointment.doctor_id, appointment.start_at, appointment.end_at,
+                                 exclude_id=appointment.pk).values_list('id', flat=True))
+    if conflicts:
+        raise SlotUnavailable(conflicts=conflicts)
+    appointment.save()
+    return appointment
+
+
+def book(patient, doctor_id, start_at, end_at, notes='', status='pending', hold_expires_at=None):
+    """Create an appointment, or raise SlotUnavailable if the doctor is busy then"""
+    validate_interval(start_at, end_at)
+    validate_time(doctor_id, start_at, end_at)
+    conflicts = schedule_conflicts(doctor_id, start_at, end_at)
+    if conflicts:
+        raise SlotUnavailable(conflicts=conflicts)
+
+    appointment = Appointment(
+        patient=patient, doctor_id=doctor_id, start_at=start_at, end_at=end_at, notes=notes, status=status,
+        hold_expires_at=hold_expires_at,
+    )
+    with transaction.atomic():
+        return insert_appointment(appointment)
+
+
+def hold(patient, doctor_id, start_at, end_at, seconds=None):
+    """Reserve a slot for ``seconds`` (HOLD_SECONDS); raise SlotUnavailable if it is taken"""
+    seconds = seconds or appointments_setting('HOLD_SECONDS')
+    return book(patient, doctor_id, start_at, end_at, status='held',
+                hold_expires_at=timezone.now() + timedelta(seconds=seconds))
+
+
+def hold_or_alternative(patient, doctor_id, start_at, end_at, attempts=3, seconds=None):
+    """
+    Hold the requested slot, or when another client got it first, the
+    doctor's next free slots of the same length in turn. Returns
+    (hold, retries), where retries counts the slots lost before it.
+    Raises SlotUnavailable when every attempt was lost or nothing is free.
+    """
+    validate_interval(start_at, end_at)
+    duration = end_at - start_at
+    try:
+        return hold(patient, doctor_id, start_at, end_at, seconds), 0
+    except SlotUnavailable:
+        pass
+    retries = 1
+    tried = {start_at}
+    while retries < attempts:
+        after = max(start_at, timezone.now())
+        candidates = [slot for _, slot, _ in get_availability().next_free_slots(
+            [doctor_id], after, duration, limit=attempts) if slot not in tried]
+        if not candidates:
+            break
+        for slot in candidates[:attempts - retries]:
+            tried.add(slot)
+            try:
+                return hold(patient, doctor_id, slot, slot + duration, seconds), retries
+            except SlotUnavailable:
+                retries += 1
+    raise SlotUnavailable("No free slot could be held")
+
+
+def confirm_hold(appointment_id, patient):
+    """Turn the patient's live hold into a pending appointment"""
+    with transaction.atomic():
+        appointment = Appointment.objects.select_for_update().filter(
+            pk=appointment_id, patient=patient, status='held'
+        ).first()
+        if appointment is None:
+            raise BookingError("Hold not found")
+        if appointment.is_hold_expired:
+            raise BookingError("Hold has expired")
+        appointment.status = 'pending'
+        appointment.hold_expires_at = None
+        appointment.save(update_fields=['status', 'hold_expires_at', 'updated_at'])
+    return appointment
+
+
+def release_hold(appointment_id, patient):
+    deleted, _ = Appointment.objects.filter(pk=appointment_id, patient=patient, status='held').delete()
+    if not deleted:
+        raise BookingError("Hold not found")
+
+
+def release_expired_holds():
+    """Delete lapsed holds. Returns how many."""
+    deleted, _ = Appointment.objects.filter(status='held', hold_expires_at__lte=timezone.now()).delete()
+    return deleted
+
+
+def reschedule(appointment, start_at, end_at):
+    validate_interval(start_at, end_at)
+    # Holds are confirmed or released, not moved
+    if appointment.status not in ('pending', 'confirmed'):
+        raise BookingError("Only pending or confirmed appointments can be rescheduled")
+    validate_time(appointment.doctor_id, start_at, end_at)
+    appointment.start_at, appointment.end_at = start_at, end_at
+    with transaction.atomic():
+        return insert_appointment(appointment)
+
+
+def cancel(appointment):
+    if not appointment.is_active:
+        raise BookingError("Appointment is not active")
+    appointment.status = 'cancelled'
+    appointment.save(update_fields=['status', 'updated_at'])
+    return appointment
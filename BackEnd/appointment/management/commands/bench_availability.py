@@ -0,0 +1,163 @@
+import random
+import time
+from datetime import datetime, time as day_time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from appointment.availability import Availability
+from appointment.models import Appointment
+from appointment.schedule import ScheduleCache, day_bounds
+from authentication.models import User
+from doctor.models import Doctor, Specialization, WorkingHours
+
+BENCH_DOMAIN = 'availability.bench.invalid'
+BENCH_SPECIALIZATION = 'Availability bench'
+BLOCKS = [(day_time(8), day_time(12)), (day_time(13), day_time(17))]
+SLOT = timedelta(minutes=15)
+
+
+def cleanup():
+    # Raw delete: cascading hundreds of thousands of appointments through the ORM loads each one
+    doctor_ids = Doctor.objects.filter(user__email__endswith=f"@{BENCH_DOMAIN}").values('id')
+    query, params = doctor_ids.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {Appointment._meta.db_table} WHERE doctor_id IN ({query})", params)
+    User.objects.filter(email__endswith=f"@{BENCH_DOMAIN}").delete()
+    Specialization.objects.filter(name__startswith=BENCH_SPECIALIZATION).delete()
+
+
+def naive_next_free_slots(doctor_ids, after, duration, limit, days, distinct_doctors=False):
+    """The loop this replaces: every doctor, every candidate start, every appointment, in Python"""
+    hours = {}
+    for doctor_id, weekday, start, end in WorkingHours.objects.filter(doctor_id__in=doctor_ids).values_list(
+            'doctor_id', 'weekday', 'start_time', 'end_time'):
+        hours.setdefault(doctor_id, {}).setdefault(weekday, []).append((start, end))
+    found, seen = [], set()
+    first_day = timezone.localtime(after).date()
+    for offset in range(days):
+        if len(found) >= limit:
+            break
+        day = first_day + timedelta(days=offset)
+        start, end = day_bounds(day)
+        booked = {}
+        for doctor_id, start_at, end_at in Appointment.objects.filter(
+                doctor_id__in=doctor_ids, status__in=Appointment.ACTIVE_STATUSES,
+                start_at__lt=end, end_at__gt=start).values_list('doctor_id', 'start_at', 'end_at'):
+            booked.setdefault(doctor_id, []).append((start_at, end_at))
+        candidates = []
+        for row, doctor_id in enumerate(doctor_ids):
+            if distinct_doctors and doctor_id in seen:
+                continue
+            for block_start, block_end in hours.get(doctor_id, {}).get(day.weekday(), []):
+                slot = timezone.make_aware(datetime.combine(day, block_start))
+                block_end = timezone.make_aware(datetime.combine(day, block_end))
+                while slot + duration <= block_end:
+                    if slot >= after and all(slot + duration <= s or slot >= e for s, e in booked.get(doctor_id, [])):
+                        candidates.append((slot, row, doctor_id))
+                        if distinct_doctors:
+                            break
+                    slot += SLOT
+                if distinct_doctors and candidates and candidates[-1][2] == doctor_id:
+                    break
+        for slot, _, doctor_id in sorted(candidates)[:limit - len(found)]:
+            found.append((doctor_id, slot, slot + duration))
+            seen.add(doctor_id)
+    return found
+
+
+class Command(BaseCommand):
+    help = ("Search next free slots across many doctors: a Python loop over doctors and appointments "
+            "versus NumPy day bitmaps, cold (loaded from the database) and warm (cached)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctors', type=int, default=500)
+        parser.add_argument('--days', type=int, default=90)
+        parser.add_argument('--specializations', type=int, default=5)
+        parser.add_argument('--fill', type=float, default=0.7, help="Share of 30 minute working slots booked")
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        cleanup()
+        try:
+            doctor_ids, specializations, after = self.populate(options)
+            cases = [
+                ("next 10 x 30min, one specialization", specializations[0], timedelta(minutes=30), 10, False),
+                ("next 50 x 60min, all doctors", None, timedelta(minutes=60), 50, False),
+                ("first 120min per doctor, all doctors", None, timedelta(minutes=120), len(doctor_ids), True),
+            ]
+            self.stdout.write(f"{'search':<40} {'naive ms':>9} {'cold ms':>9} {'warm ms':>9} {'speedup':>8}")
+            for label, specialization, duration, limit, distinct in cases:
+                ids = doctor_ids if specialization is None else list(
+                    Doctor.objects.filter(specialization=specialization).order_by('id').values_list('id', flat=True)
+                )
+                self.run_case(label, ids, after, duration, limit, distinct, options)
+        finally:
+            cleanup()
+
+    def populate(self, options):
+        rng = random.Random(0)
+        started = time.perf_counter()
+        specializations = [Specialization.objects.create(name=f"{BENCH_SPECIALIZATION} {i}")
+                           for i in range(options['specializations'])]
+        User.objects.bulk_create([
+            User(email=f"doctor-{i}@{BENCH_DOMAIN}", first_name='Bench', last_name=f"Doctor {i}", user_type='doctor')
+            for i in range(options['doctors'])
+        ])
+        users = list(User.objects.filter(email__endswith=f"@{BENCH_DOMAIN}").order_by('id'))
+        Doctor.objects.bulk_create([
+            Doctor(user=user, specialization=specializations[i % len(specializations)],
+                   license_number=f"AVAIL-{i}", consultation_fee=0)
+            for i, user in enumerate(users)
+        ])
+        doctor_ids = list(Doctor.objects.filter(user__in=users).order_by('id').values_list('id', flat=True))
+        WorkingHours.objects.bulk_create([
+            WorkingHours(doctor_id=doctor_id, weekday=weekday, start_time=start, end_time=end)
+            for doctor_id in doctor_ids for weekday in range(5) for start, end in BLOCKS
+        ])
+
+        patient = User.objects.create_user(
+            email=f"patient@{BENCH_DOMAIN}", password=None, first_name='Bench', last_name='Patient', user_type='patient',
+        )
+        today = timezone.localdate()
+        first_day = today + timedelta(days=7 - today.weekday())  # next Monday
+        appointments = []
+        for offset in range(options['days']):
+            day = first_day + timedelta(days=offset)
+            if day.weekday() >= 5:
+                continue
+            for doctor_id in doctor_ids:
+                for start, end in BLOCKS:
+                    slot = timezone.make_aware(datetime.combine(day, start))
+                    block_end = timezone.make_aware(datetime.combine(day, end))
+                    while slot < block_end:
+                        if rng.random() < options['fill']:
+                            appointments.append(Appointment(patient=patient, doctor_id=doctor_id, start_at=slot,
+                                                            end_at=slot + timedelta(minutes=30), status='confirmed'))
+                        slot += timedelta(minutes=30)
+        with transaction.atomic():
+            Appointment.objects.bulk_create(appointments, batch_size=5000)
+        self.stdout.write(f"{len(doctor_ids)} doctors x {options['days']} days, {len(appointments):,} appointments "
+                          f"({time.perf_counter() - started:.1f}s to load)")
+        return doctor_ids, specializations, timezone.make_aware(datetime.combine(first_day, day_time(8)))
+
+    def run_case(self, label, doctor_ids, after, duration, limit, distinct, options):
+        days = options['days']
+        started = time.perf_counter()
+        expected = naive_next_free_slots(doctor_ids, after, duration, limit, days, distinct)
+        naive_ms = (time.perf_counter() - started) * 1000
+
+        availability = Availability(schedules=ScheduleCache(max_windows=len(doctor_ids) * days))
+        started = time.perf_counter()
+        found = availability.next_free_slots(doctor_ids, after, duration, limit, days, distinct)
+        cold_ms = (time.perf_counter() - started) * 1000
+        if found != expected:
+            raise CommandError(f"{label}: bitmap search disagrees with the naive loop")
+
+        started = time.perf_counter()
+        for _ in range(options['repeat']):
+            availability.next_free_slots(doctor_ids, after, duration, limit, days, distinct)
+        warm_ms = (time.perf_counter() - started) * 1000 / options['repeat']
+        self.stdout.write(f"{label:<40} {naive_ms:>9.1f} {cold_ms:>9.1f} {warm_ms:>9.2f} "
+                          f"{naive_ms / warm_ms:>7.0f}x   ({len(found)} slots)")
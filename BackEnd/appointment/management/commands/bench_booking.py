@@ -0,0 +1,147 @@
+import random
+import threading
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connection
+from django.utils import timezone
+
+from appointment.booking import SlotUnavailable, book, overlapping
+from appointment.models import Appointment
+from appointment.schedule import appointments_setting, day_bounds, get_schedules
+from authentication.models import User
+from doctor.models import Doctor, Specialization
+
+BENCH_DOMAIN = 'booking.bench.invalid'
+BENCH_SPECIALIZATION = 'Booking bench'
+
+
+def cleanup():
+    User.objects.filter(email__endswith=f"@{BENCH_DOMAIN}").delete()
+    Specialization.objects.filter(name=BENCH_SPECIALIZATION).delete()
+
+
+def overlap_count(doctor_ids):
+    """Pairs of active appointments of the same doctor that overlap; must be 0"""
+    active = Appointment.objects.filter(doctor_id__in=doctor_ids, status__in=Appointment.ACTIVE_STATUSES)
+    rows = sorted(active.values_list('doctor_id', 'start_at', 'end_at'))
+    return sum(1 for a, b in zip(rows, rows[1:]) if a[0] == b[0] and b[1] < a[2])
+
+
+def retry_locked(attempt, locked, max_retries=50):
+    """
+    Run ``attempt()``, backing off and retrying while sqlite reports the
+    database is locked (its writers take turns; PostgreSQL never raises this).
+    Each retry adds one to ``locked[0]``.
+    """
+    for retry in range(max_retries + 1):
+        try:
+            return attempt()
+        except OperationalError as e:
+            if connection.vendor != 'sqlite' or 'locked' not in str(e) or retry == max_retries:
+                raise
+            locked[0] += 1
+            time.sleep(random.uniform(0.001, 0.01) * (retry + 1))
+
+
+class Command(BaseCommand):
+    help = ("Book random slots from concurrent threads on a few doctors; report bookings/s, rejected "
+            "conflicts and overlap check rates for the database versus the in-memory schedule")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctors', type=int, default=5)
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--attempts', type=int, default=200, help="Booking attempts per thread")
+        parser.add_argument('--checks', type=int, default=2000, help="Overlap checks per method")
+
+    def handle(self, *args, **options):
+        cleanup()
+        specialization = Specialization.objects.create(name=BENCH_SPECIALIZATION)
+        doctors = []
+        for i in range(options['doctors']):
+            user = User.objects.create_user(
+                email=f"doctor-{i}@{BENCH_DOMAIN}", password=None,
+                first_name='Bench', last_name=f"Doctor {i}", user_type='doctor',
+            )
+            doctors.append(Doctor.objects.create(
+                user=user, specialization=specialization, license_number=f"BENCH-{i}", consultation_fee=0,
+            ))
+        patient = User.objects.create_user(
+            email=f"patient@{BENCH_DOMAIN}", password=None, first_name='Bench', last_name='Patient', user_type='patient',
+        )
+        doctor_ids = [doctor.pk for doctor in doctors]
+        day = timezone.localdate() + timedelta(days=30)
+        while day.weekday() not in appointments_setting('WORKING_DAYS'):
+            day += timedelta(days=1)
+        day_start, _ = day_bounds(day)
+        # 15 minute grid over 08:00-17:00, 15-60 minute appointments that end by 17:00
+        starts = [day_start + timedelta(hours=8, minutes=15 * i) for i in range(33)]
+
+        try:
+            booked, conflicts, locked, elapsed = self.contend(patient, doctor_ids, starts, options)
+            overlaps = overlap_count(doctor_ids)
+            self.stdout.write(f"{connection.vendor}: {booked} booked, {conflicts} rejected as conflicts, "
+                              f"{(booked + conflicts) / elapsed:,.0f} attempts/s, {locked} lock retries, "
+                              f"overlaps in db: {overlaps}")
+            if overlaps:
+                raise CommandError(f"{overlaps} overlapping appointments were booked")
+
+            self.compare_checks(doctor_ids, day, starts, options['checks'])
+        finally:
+            cleanup()
+            get_schedules().clear()
+
+    def contend(self, patient, doctor_ids, starts, options):
+        booked = conflicts = locked = 0
+        lock = threading.Lock()
+
+        def worker(seed):
+            nonlocal booked, conflicts, locked
+            rng = random.Random(seed)
+            mine = [0, 0]
+            retries = [0]
+            try:
+                for _ in range(options['attempts']):
+                    start_at = rng.choice(starts)
+                    end_at = start_at + timedelta(minutes=15 * rng.randint(1, 4))
+                    doctor_id = rng.choice(doctor_ids)
+                    try:
+                        retry_locked(lambda: book(patient, doctor_id, start_at, end_at), retries)
+                        mine[0] += 1
+                    except SlotUnavailable:
+                        mine[1] += 1
+            finally:
+                close_old_connections()
+                connection.close()
+            with lock:
+                booked += mine[0]
+                conflicts += mine[1]
+                locked += retries[0]
+
+        threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(options['threads'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return booked, conflicts, locked, time.perf_counter() - started
+
+    def compare_checks(self, doctor_ids, day, starts, count):
+        rng = random.Random(0)
+        probes = [(rng.choice(doctor_ids), start) for start in (rng.choice(starts) for _ in range(count))]
+
+        started = time.perf_counter()
+        for doctor_id, start_at in probes:
+            overlapping(doctor_id, start_at, start_at + timedelta(minutes=30)).exists()
+        db_rate = count / (time.perf_counter() - started)
+
+        schedules = get_schedules()
+        schedules.get_many(doctor_ids, day)
+        started = time.perf_counter()
+        for doctor_id, start_at in probes:
+            schedules.get(doctor_id, day).is_free(start_at, start_at + timedelta(minutes=30))
+        memory_rate = count / (time.perf_counter() - started)
+
+        self.stdout.write(f"overlap checks: database {db_rate:,.0f}/s, schedule {memory_rate:,.0f}/s "
+                          f"({memory_rate / db_rate:.0f}x)")
@@ -0,0 +1,117 @@
+import random
+import threading
+import time
+from collections import Counter
+from datetime import datetime, time as day_time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+from appointment.booking import SlotUnavailable, confirm_hold, hold_or_alternative, overlapping
+from appointment.management.commands.bench_booking import (
+    BENCH_DOMAIN, BENCH_SPECIALIZATION, cleanup, overlap_count, retry_locked
+)
+from appointment.models import Appointment
+from appointment.schedule import get_schedules
+from authentication.models import User
+from doctor.models import Doctor, Specialization
+
+SLOT = timedelta(minutes=30)
+
+
+class Command(BaseCommand):
+    help = ("N clients race for M slots of one doctor at the same instant: naive check-then-insert "
+            "versus holds with alternates. Reports holds/s, retries and double bookings.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=50)
+        parser.add_argument('--slots', type=int, default=5, help="Distinct slots the clients ask for")
+        parser.add_argument('--attempts', type=int, default=5, help="Slots a client tries before giving up")
+
+    def handle(self, *args, **options):
+        cleanup()
+        get_schedules().clear()
+        try:
+            specialization = Specialization.objects.create(name=BENCH_SPECIALIZATION)
+            user = User.objects.create_user(email=f"doctor@{BENCH_DOMAIN}", password=None, first_name='Bench',
+                                            last_name='Doctor', user_type='doctor')
+            doctor = Doctor.objects.create(user=user, specialization=specialization, license_number='BENCH-HOLD',
+                                           consultation_fee=0)
+            patients = [
+                User.objects.create_user(email=f"patient-{i}@{BENCH_DOMAIN}", password=None, first_name='Bench',
+                                         last_name=f"Patient {i}", user_type='patient')
+                for i in range(options['clients'])
+            ]
+            today = timezone.localdate()
+            monday = today + timedelta(days=14 - today.weekday())
+            first = timezone.make_aware(datetime.combine(monday, day_time(8)))
+            wanted = [first + SLOT * i for i in range(options['slots'])]
+
+            self.stdout.write(f"{options['clients']} clients, {options['slots']} requested slots, {connection.vendor}")
+            self.stdout.write(f"{'strategy':<22} {'booked':>7} {'per s':>8} {'no slot':>8} {'double':>7} "
+                              f"{'locked':>7}  retries")
+            for label, attempt in [('check then insert', self.naive), ('hold + alternates', self.hold)]:
+                Appointment.objects.filter(doctor=doctor).delete()
+                get_schedules().clear()
+                results, locked, elapsed = self.race(patients, doctor, wanted, attempt, options)
+                booked = [retries for retries in results if retries is not None]
+                doubles = overlap_count([doctor.pk])
+                histogram = ', '.join(f"{retries}:{count}" for retries, count in sorted(Counter(booked).items()))
+                self.stdout.write(f"{label:<22} {len(booked):>7} {len(booked) / elapsed:>8,.0f} "
+                                  f"{len(results) - len(booked):>8} {doubles:>7} {locked:>7}  {histogram}")
+                if attempt == self.hold and doubles:
+                    raise CommandError(f"Holds double booked {doubles} slots")
+
+            # Confirming turns every hold into a pending appointment
+            started = time.perf_counter()
+            held = list(Appointment.objects.filter(doctor=doctor, status='held').values_list('id', 'patient_id'))
+            for appointment_id, patient_id in held:
+                confirm_hold(appointment_id, patient_id)
+            self.stdout.write(f"confirmed {len(held)} holds in {(time.perf_counter() - started) * 1000:.0f}ms")
+        finally:
+            cleanup()
+            get_schedules().clear()
+
+    def naive(self, patient, doctor, start_at, options):
+        if overlapping(doctor.pk, start_at, start_at + SLOT).exists():
+            return None
+        Appointment.objects.create(patient=patient, doctor=doctor, start_at=start_at, end_at=start_at + SLOT)
+        return 0
+
+    def hold(self, patient, doctor, start_at, options):
+        try:
+            _, retries = hold_or_alternative(patient, doctor.pk, start_at, start_at + SLOT,
+                                             attempts=options['attempts'])
+        except SlotUnavailable:
+            return None
+        return retries
+
+    def race(self, patients, doctor, wanted, attempt, options):
+        """
+        Every client asks for a random wanted slot at once. Returns ([retries
+        or None], sqlite lock retries, seconds); a lock retry counts as a retry.
+        """
+        barrier = threading.Barrier(len(patients) + 1)
+        results = [None] * len(patients)
+        locked = [[0] for _ in patients]
+        rng = random.Random(0)
+        choices = [rng.choice(wanted) for _ in patients]
+
+        def client(i):
+            try:
+                barrier.wait()
+                retries = retry_locked(lambda: attempt(patients[i], doctor, choices[i], options), locked[i])
+                results[i] = None if retries is None else retries + locked[i][0]
+            finally:
+                close_old_connections()
+                connection.close()
+
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(len(patients))]
+        for thread in threads:
+            thread.start()
+        barrier.wait()
+        started = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        return results, sum(count for count, in locked), time.perf_counter() - started
@@ -0,0 +1,34 @@
+from django.db import migrations
+
+# Kept in step with Appointment.ACTIVE_STATUSES
+CONSTRAINT = 'appointment_no_overlap'
+
+
+def add_exclusion_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        # Other databases rely on appointment.booking serializing bookings per doctor
+        return
+    # btree_gist lets the GiST index compare doctor_id with =
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+    schema_editor.execute(
+        f"ALTER TABLE appointment_appointment ADD CONSTRAINT {CONSTRAINT} EXCLUDE USING gist "
+        "(doctor_id WITH =, tstzrange(start_at, end_at, '[)') WITH &&) "
+        "WHERE (status IN ('pending', 'confirmed'))"
+    )
+
+
+def drop_exclusion_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f"ALTER TABLE appointment_appointment DROP CONSTRAINT IF EXISTS {CONSTRAINT}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointment', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_exclusion_constraint, drop_exclusion_constraint),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:49
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Kept in step with Appointment.ACTIVE_STATUSES: holds occupy the slot too
+CONSTRAINT = 'appointment_no_overlap'
+
+
+def set_exclusion_statuses(statuses):
+    def set_statuses(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        listed = ', '.join(f"'{status}'" for status in statuses)
+        schema_editor.execute(f"ALTER TABLE appointment_appointment DROP CONSTRAINT IF EXISTS {CONSTRAINT}")
+        schema_editor.execute(
+            f"ALTER TABLE appointment_appointment ADD CONSTRAINT {CONSTRAINT} EXCLUDE USING gist "
+            "(doctor_id WITH =, tstzrange(start_at, end_at, '[)') WITH &&) "
+            f"WHERE (status IN ({listed}))"
+        )
+    return set_statuses
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointment', '0003_appointment_no_overlap'),
+        ('doctor', '0002_working_hours'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='hold_expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='appointment',
+            name='status',
+            field=models.CharField(choices=[('held', 'Held'), ('pending', 'Pending'), ('confirmed', 'Confirmed'), ('completed', 'Completed'), ('cancelled', 'Cancelled')], default='pending', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(condition=models.Q(('status', 'held')), fields=['hold_expires_at'], name='appointment_hold_expiry_idx'),
+        ),
+        migrations.RunPython(
+            set_exclusion_statuses(('held', 'pending', 'confirmed')),
+            set_exclusion_statuses(('pending', 'confirmed')),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:56
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointment', '0004_appointment_holds'),
+        ('doctor', '0002_working_hours'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['start_at'], name='appointment_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['updated_at'], name='appointment_updated_idx'),
+        ),
+    ]
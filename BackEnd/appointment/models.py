@@ -1,23 +1,59 @@
-# # appointments/models.py
-# from django.db import models
-# from authentication.models import User
-# from doctor.models import Doctor
+# appointment/models.py
+from django.db import models
+from django.db.models import F, Q
+from django.utils import timezone
+from authentication.models import User
+from doctor.models import Doctor
 
-# class Appointment(models.Model):
-#     STATUS_CHOICES = [
-#         ('pending', 'Pending'),
-#         ('confirmed', 'Confirmed'),
-#         ('completed', 'Completed'),
-#         ('cancelled', 'Cancelled'),
-#     ]
+class Appointment(models.Model):
+    STATUS_CHOICES = [
+        ('held', 'Held'),
+        ('pending', 'Pending'),
+        ('confirmed', 'Confirmed'),
+        ('completed', 'Completed'),
+        ('cancelled', 'Cancelled'),
+    ]
+    # Statuses that occupy the doctor's time; see the exclusion constraint in migration 0004
+    ACTIVE_STATUSES = ('held', 'pending', 'confirmed')
     
-#     patient = models.ForeignKey(User, on_delete=models.CASCADE, limit_choices_to={'user_type': 'patient'})
-#     doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE)
-#     appointment_date = models.DateTimeField()
-#     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
-#     notes = models.TextField(blank=True)
-#     created_at = models.DateTimeField(auto_now_add=True)
-#     updated_at = models.DateTimeField(auto_now=True)
+    patient = models.ForeignKey(User, on_delete=models.CASCADE, limit_choices_to={'user_type': 'patient'})
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE)
+    # Half-open interval [start_at, end_at)
+    start_at = models.DateTimeField()
+    end_at = models.DateTimeField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    notes = models.TextField(blank=True)
+    # Set while status is 'held': a reservation that lapses unless confirmed (see appointment.booking)
+    hold_expires_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
-#     def __str__(self):
-#         return f"{self.patient.get_full_name()} - {self.doctor} on {self.appointment_date}"
\ No newline at end of file
+    class Meta:
+        ordering = ['start_at']
+        constraints = [
+            models.CheckConstraint(condition=Q(end_at__gt=F('start_at')), name='appointment_end_after_start'),
+        ]
+        indexes = [
+            # Day-window loads and overlap checks per doctor
+            models.Index(fields=['doctor', 'start_at'], name='appointment_doctor_start_idx'),
+            models.Index(fields=['patient', '-start_at'], name='appointment_patient_idx'),
+            models.Index(fields=['hold_expires_at'], condition=Q(status='held'), name='appointment_hold_expiry_idx'),
+            # Reminder scheduling: upcoming appointments by time, and changes since the last poll
+            models.Index(fields=['start_at'], name='appointment_start_idx'),
+            models.Index(fields=['updated_at'], name='appointment_updated_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.patient.get_full_name()} - {self.doctor} on {self.start_at}"
+    
+    @property
+    def appointment_date(self):
+        return self.start_at
+    
+    @property
+    def is_active(self):
+        return self.status in self.ACTIVE_STATUSES
+    
+    @property
+    def is_hold_expired(self):
+        return self.status == 'held' and self.hold_expires_at is not None and self.hold_expires_at <= timezone.now()
@@ -0,0 +1,246 @@
+# appointment/schedule.py
+"""
+In-memory per-doctor schedules for conflict and free-slot queries.
+
+A ``DaySchedule`` holds one doctor's active appointments overlapping one
+local day. Active appointments never overlap (the exclusion constraint,
+or booking's per-doctor lock elsewhere), so the intervals are disjoint:
+sorted by start they are also sorted by end, and the interval tree
+reduces to two parallel sorted arrays. An overlap query is one bisect and
+free gaps are a walk between neighbours.
+
+``ScheduleCache`` keeps up to MAX_WINDOWS of them per process, loaded from
+the database one (doctor, day) window at a time (several doctors share one
+query). Each window has a version in the shared cache that booking bumps
+on commit; a process re-checks a window's version at most every
+VERSION_CHECK_SECONDS and reloads it when it moved. Lapsed holds are left
+out, and a window is also reloaded when its earliest hold lapses.
+"""
+import threading
+import time
+from bisect import bisect_right
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import Appointment
+
+APPOINTMENTS_DEFAULTS = {
+    'SLOT_MINUTES': 15,
+    'DEFAULT_DURATION_MINUTES': 30,
+    'MAX_DURATION_MINUTES': 240,
+    'DAY_START': '08:00',
+    'DAY_END': '17:00',
+    # Weekdays (Monday is 0) a doctor without WorkingHours rows works DAY_START-DAY_END
+    'WORKING_DAYS': (0, 1, 2, 3, 4),
+    'SEARCH_DAYS': 7,
+    'MAX_SEARCH_DAYS': 90,
+    # Enough for 500 doctors x 90 days of availability search; an empty day is under 1 KB
+    'MAX_WINDOWS': 50000,
+    'VERSION_CHECK_SECONDS': 2,
+    # How long a hold reserves a slot before it lapses (see appointment.booking)
+    'HOLD_SECONDS': 300,
+}
+
+
+def appointments_setting(name):
+    return getattr(settings, 'APPOINTMENTS', {}).get(name, APPOINTMENTS_DEFAULTS[name])
+
+
+def day_bounds(day):
+    """[start, end) of a local calendar day as aware datetimes"""
+    start = timezone.make_aware(datetime.combine(day, datetime.min.time()))
+    return start, timezone.make_aware(datetime.combine(day + timedelta(days=1), datetime.min.time()))
+
+
+def days_between(start_at, end_at):
+    """Local days touched by [start_at, end_at)"""
+    day = timezone.localtime(start_at).date()
+    last = timezone.localtime(end_at - timedelta(microseconds=1)).date()
+    days = []
+    while day <= last:
+        days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def version_key(doctor_id, day):
+    return f"schedule:version:{doctor_id}:{day.isoformat()}"
+
+
+# A version that expires reads as None, which still differs from any cached one
+VERSION_TTL = 7 * 86400
+
+
+def bump_versions(doctor_id, days):
+    for day in days:
+        key = version_key(doctor_id, day)
+        if not cache.add(key, 1, VERSION_TTL):
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, 1, VERSION_TTL)
+
+
+class DaySchedule:
+    """Disjoint booked intervals of one doctor on one day, as epoch seconds"""
+
+    def __init__(self, doctor_id, day, intervals, version=None, expires_at=None):
+        self.doctor_id = doctor_id
+        self.day = day
+        self.version = version
+        # Earliest hold expiry among the intervals; the window is reloaded once it passes
+        self.expires_at = expires_at
+        self.window = tuple(moment.timestamp() for moment in day_bounds(day))
+        intervals = sorted(intervals, key=lambda interval: interval[1])
+        self.ids = [appointment_id for appointment_id, _, _ in intervals]
+        self.starts = [start.timestamp() for _, start, _ in intervals]
+        self.ends = [end.timestamp() for _, _, end in intervals]
+        self.checked_at = time.monotonic()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def conflicts(self, start_at, end_at):
+        """Ids of booked appointments overlapping [start_at, end_at)"""
+        start, end = start_at.timestamp(), end_at.timestamp()
+        # First interval ending after our start; later ones start later still
+        i = bisect_right(self.ends, start)
+        found = []
+        while i < len(self.starts) and self.starts[i] < end:
+            found.append(self.ids[i])
+            i += 1
+        return found
+
+    def is_free(self, start_at, end_at):
+        start = start_at.timestamp()
+        i = bisect_right(self.ends, start)
+        return i == len(self.starts) or self.starts[i] >= end_at.timestamp()
+
+    def gaps(self, window_start=None, window_end=None):
+        """Free (start, end) epoch-second intervals inside the window, in order"""
+        low = window_start.timestamp() if window_start else self.window[0]
+        high = window_end.timestamp() if window_end else self.window[1]
+        cursor = low
+        for i in range(bisect_right(self.ends, low), len(self.starts)):
+            if self.starts[i] >= high:
+                break
+            if self.starts[i] > cursor:
+                yield cursor, self.starts[i]
+            cursor = max(cursor, self.ends[i])
+        if cursor < high:
+            yield cursor, high
+
+    def free_slots(self, duration, window_start=None, window_end=None, step=None, limit=None):
+        """Start times of free [start, start + duration) slots aligned to ``step`` from the window start"""
+        step = (step or timedelta(minutes=appointments_setting('SLOT_MINUTES'))).total_seconds()
+        length = duration.total_seconds()
+        origin = window_start.timestamp() if window_start else self.window[0]
+        slots = []
+        for gap_start, gap_end in self.gaps(window_start, window_end):
+            # Round up to the slot grid
+            start = origin + -(-(gap_start - origin) // step) * step
+            while start + length <= gap_end:
+                slots.append(datetime.fromtimestamp(start, tz=timezone.get_current_timezone()))
+                if limit is not None and len(slots) >= limit:
+                    return slots
+                start += step
+        return slots
+
+
+def occupying(queryset, now=None):
+    """Appointments of ``queryset`` that occupy their slot: active, and not a lapsed hold"""
+    return queryset.filter(status__in=Appointment.ACTIVE_STATUSES).exclude(
+        status='held', hold_expires_at__lte=now or timezone.now()
+    )
+
+
+def load_windows(doctor_ids, day):
+    """Build DaySchedules for ``doctor_ids`` on ``day`` with one query"""
+    start, end = day_bounds(day)
+    intervals = {doctor_id: [] for doctor_id in doctor_ids}
+    expiries = {}
+    rows = occupying(Appointment.objects.filter(
+        doctor_id__in=doctor_ids,
+        start_at__lt=end,
+        end_at__gt=start,
+    )).values_list('doctor_id', 'id', 'start_at', 'end_at', 'hold_expires_at')
+    for doctor_id, appointment_id, start_at, end_at, hold_expires_at in rows.iterator(chunk_size=5000):
+        intervals[doctor_id].append((appointment_id, start_at, end_at))
+        if hold_expires_at is not None:
+            expiries[doctor_id] = min(hold_expires_at, expiries.get(doctor_id, hold_expires_at))
+    return {
+        doctor_id: DaySchedule(doctor_id, day, rows, expires_at=expiries.get(doctor_id))
+        for doctor_id, rows in intervals.items()
+    }
+
+
+class ScheduleCache:
+    def __init__(self, max_windows=None, version_check_seconds=None):
+        self.max_windows = max_windows or appointments_setting('MAX_WINDOWS')
+        self.version_check_seconds = (
+            appointments_setting('VERSION_CHECK_SECONDS') if version_check_seconds is None else version_check_seconds
+        )
+        self.windows = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, doctor_id, day):
+        return self.get_many([doctor_id], day)[doctor_id]
+
+    def get_many(self, doctor_ids, day):
+        """{doctor_id: DaySchedule} for one day, loading missing or stale windows together"""
+        now = time.monotonic()
+        wall_now = timezone.now()
+        found, stale = {}, []
+        with self._lock:
+            for doctor_id in doctor_ids:
+                schedule = self.windows.get((doctor_id, day))
+                if schedule is None or (schedule.expires_at is not None and schedule.expires_at <= wall_now):
+                    stale.append(doctor_id)
+                else:
+                    self.windows.move_to_end((doctor_id, day))
+                    found[doctor_id] = schedule
+
+        due = [doctor_id for doctor_id, schedule in found.items() if now - schedule.checked_at >= self.version_check_seconds]
+        if due:
+            versions = cache.get_many([version_key(doctor_id, day) for doctor_id in due])
+            for doctor_id in due:
+                if versions.get(version_key(doctor_id, day)) != found[doctor_id].version:
+                    stale.append(doctor_id)
+                    del found[doctor_id]
+                else:
+                    found[doctor_id].checked_at = now
+
+        if stale:
+            # Read versions before the rows so a concurrent booking can only make us reload again
+            versions = cache.get_many([version_key(doctor_id, day) for doctor_id in stale])
+            loaded = load_windows(stale, day)
+            with self._lock:
+                for doctor_id, schedule in loaded.items():
+                    schedule.version = versions.get(version_key(doctor_id, day))
+                    self.windows[(doctor_id, day)] = schedule
+                while len(self.windows) > self.max_windows:
+                    self.windows.popitem(last=False)
+            found.update(loaded)
+        return found
+
+    def invalidate(self, doctor_id, days):
+        """Drop windows locally and bump their shared versions so other processes reload them"""
+        with self._lock:
+            for day in days:
+                self.windows.pop((doctor_id, day), None)
+        bump_versions(doctor_id, days)
+
+    def clear(self):
+        with self._lock:
+            self.windows.clear()
+
+
+@lru_cache(maxsize=None)
+def get_schedules():
+    """This process's ScheduleCache"""
+    return ScheduleCache()
@@ -0,0 +1,66 @@
+# appointment/serializers.py
+from datetime import timedelta
+
+from rest_framework import serializers
+
+from doctor.models import Doctor, Specialization
+from .models import Appointment
+from .schedule import appointments_setting
+
+
+class AppointmentSerializer(serializers.ModelSerializer):
+    patient_name = serializers.CharField(source='patient.get_full_name', read_only=True)
+    doctor_name = serializers.CharField(source='doctor.user.get_full_name', read_only=True)
+
+    class Meta:
+        model = Appointment
+        fields = [
+            'id', 'patient', 'patient_name', 'doctor', 'doctor_name',
+            'start_at', 'end_at', 'status', 'hold_expires_at', 'notes', 'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
+
+
+class BookAppointmentSerializer(serializers.Serializer):
+    doctor = serializers.PrimaryKeyRelatedField(queryset=Doctor.objects.filter(is_available=True))
+    start_at = serializers.DateTimeField()
+    end_at = serializers.DateTimeField(required=False)
+    duration_minutes = serializers.IntegerField(
+        required=False, min_value=1, max_value=appointments_setting('MAX_DURATION_MINUTES')
+    )
+    notes = serializers.CharField(required=False, allow_blank=True, default='')
+
+    def validate(self, data):
+        if 'end_at' not in data:
+            minutes = data.get('duration_minutes') or appointments_setting('DEFAULT_DURATION_MINUTES')
+            try:
+                data['end_at'] = data['start_at'] + timedelta(minutes=minutes)
+            except OverflowError:
+                raise serializers.ValidationError("start_at is out of range.")
+        if data['end_at'] <= data['start_at']:
+            raise serializers.ValidationError("end_at must be after start_at.")
+        if data['end_at'] - data['start_at'] > timedelta(minutes=appointments_setting('MAX_DURATION_MINUTES')):
+            raise serializers.ValidationError("Appointment is too long.")
+        return data
+
+
+class AvailabilityQuerySerializer(serializers.Serializer):
+    specialization = serializers.PrimaryKeyRelatedField(queryset=Specialization.objects.all(), required=False)
+    after = serializers.DateTimeField(required=False)
+    duration = serializers.IntegerField(
+        required=False, min_value=1, max_value=appointments_setting('MAX_DURATION_MINUTES')
+    )
+    limit = serializers.IntegerField(required=False, min_value=1, max_value=100, default=10)
+    days = serializers.IntegerField(required=False, min_value=1, max_value=appointments_setting('MAX_SEARCH_DAYS'))
+    distinct_doctors = serializers.BooleanField(required=False, default=False)
+
+
+class FreeSlotsQuerySerializer(serializers.Serializer):
+    date = serializers.DateField()
+    duration = serializers.IntegerField(
+        required=False, min_value=1, max_value=appointments_setting('MAX_DURATION_MINUTES')
+    )
+    # Minutes between offered start times; at most one a day
+    step = serializers.IntegerField(required=False, min_value=1, max_value=24 * 60)
+    start = serializers.TimeField(required=False)
+    end = serializers.TimeField(required=False)
@@ -0,0 +1,55 @@
+# appointment/signals.py
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from doctor.models import WorkingHours
+from .availability import bump_hours_version
+from .models import Appointment
+from .schedule import days_between, get_schedules
+
+
+def scheduled_days(doctor_id, start_at, end_at):
+    if doctor_id is None or start_at is None or end_at is None:
+        return set()
+    return {(doctor_id, day) for day in days_between(start_at, end_at)}
+
+
+def invalidate_on_commit(windows):
+    def invalidate():
+        schedules = get_schedules()
+        for doctor_id, day in windows:
+            schedules.invalidate(doctor_id, [day])
+    if windows:
+        transaction.on_commit(invalidate)
+
+
+# Remember the interval as loaded so a reschedule also refreshes the days it left.
+# __dict__ is read directly so deferred fields stay unloaded.
+
+def loaded_days(instance):
+    values = instance.__dict__
+    return scheduled_days(values.get('doctor_id'), values.get('start_at'), values.get('end_at'))
+
+
+@receiver(post_init, sender=Appointment)
+def remember_interval(sender, instance, **kwargs):
+    instance._scheduled_days = loaded_days(instance)
+
+
+@receiver(post_save, sender=Appointment)
+def refresh_saved_schedule(sender, instance, **kwargs):
+    current = loaded_days(instance) or instance._scheduled_days
+    invalidate_on_commit(instance._scheduled_days | current)
+    instance._scheduled_days = current
+
+
+@receiver(post_delete, sender=Appointment)
+def refresh_deleted_schedule(sender, instance, **kwargs):
+    invalidate_on_commit(instance._scheduled_days)
+
+
+@receiver(post_save, sender=WorkingHours)
+@receiver(post_delete, sender=WorkingHours)
+def refresh_working_hours(sender, **kwargs):
+    transaction.on_commit(bump_hours_version)
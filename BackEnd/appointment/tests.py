@@ -1,3 +1,117 @@
+from datetime import datetime, time, timedelta
+
+from django.core.cache import cache
 from django.test import TestCase
+from django.utils import timezone
+
+from authentication.models import User
+from doctor.models import Doctor, Specialization
+from .availability import get_availability
+from .booking import BookingError, SlotUnavailable, book, hold, hold_or_alternative, release_expired_holds
+from .models import Appointment
+from .schedule import get_schedules
+
+
+def next_weekday(days_ahead=2):
+    day = timezone.localdate() + timedelta(days=days_ahead)
+    while day.weekday() >= 5:
+        day += timedelta(days=1)
+    return day
+
+
+class BookingTests(TestCase):
+    def setUp(self):
+        # Process-wide caches outlive each test's rolled-back transaction
+        cache.clear()
+        get_schedules().clear()
+        get_availability.cache_clear()
+        specialization = Specialization.objects.create(name='General Medicine')
+        self.doctor = self.make_doctor('doctor@example.com', 'LIC-1', specialization)
+        self.other_doctor = self.make_doctor('other@example.com', 'LIC-2', specialization)
+        self.patient = User.objects.create_user(email='patient@example.com', password=None, first_name='Pat',
+                                                last_name='Ient', user_type='patient')
+        self.start = timezone.make_aware(datetime.combine(next_weekday(), time(9)))
+        self.end = self.start + timedelta(minutes=30)
+
+    def make_doctor(self, email, license_number, specialization):
+        user = User.objects.create_user(email=email, password=None, first_name='Doc', last_name='Tor',
+                                        user_type='doctor')
+        return Doctor.objects.create(user=user, specialization=specialization, license_number=license_number,
+                                     consultation_fee=0)
+
+    def book(self, start_at, end_at, doctor=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            return book(self.patient, (doctor or self.doctor).pk, start_at, end_at)
+
+    def test_overlapping_booking_is_rejected(self):
+        self.book(self.start, self.end)
+        for start_at, end_at in [
+            (self.start, self.end),
+            (self.start + timedelta(minutes=15), self.end + timedelta(minutes=15)),
+            (self.start - timedelta(minutes=15), self.start + timedelta(minutes=1)),
+        ]:
+            with self.assertRaises(SlotUnavailable):
+                self.book(start_at, end_at)
+        self.assertEqual(Appointment.objects.count(), 1)
+
+    def test_overlap_is_checked_in_the_database_too(self):
+        # Booked behind the schedule cache's back: the insert still refuses it
+        book(self.patient, self.doctor.pk, self.start, self.end)
+        with self.assertRaises(SlotUnavailable):
+            book(self.patient, self.doctor.pk, self.start, self.end)
+
+    def test_adjacent_and_other_doctor_slots_are_free(self):
+        self.book(self.start, self.end)
+        self.book(self.end, self.end + timedelta(minutes=30))
+        self.book(self.start, self.end, doctor=self.other_doctor)
+        self.assertEqual(Appointment.objects.count(), 3)
+
+    def test_cancelled_appointment_frees_the_slot(self):
+        appointment = self.book(self.start, self.end)
+        with self.captureOnCommitCallbacks(execute=True):
+            appointment.status = 'cancelled'
+            appointment.save()
+        self.book(self.start, self.end)
+
+    def test_past_or_outside_hours_is_rejected(self):
+        past = timezone.now() - timedelta(days=1)
+        night = timezone.make_aware(datetime.combine(next_weekday(), time(22)))
+        for start_at in [past, night]:
+            with self.assertRaises(BookingError):
+                self.book(start_at, start_at + timedelta(minutes=30))
+        with self.assertRaises(BookingError):
+            self.book(self.end, self.start)
+
+    def test_lost_hold_gets_an_alternative(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            hold(self.patient, self.doctor.pk, self.start, self.end)
+        with self.captureOnCommitCallbacks(execute=True):
+            alternative, retries = hold_or_alternative(self.patient, self.doctor.pk, self.start, self.end)
+        self.assertGreaterEqual(retries, 1)
+        self.assertEqual(alternative.status, 'held')
+        self.assertGreaterEqual(alternative.start_at, self.end)
+        self.assertEqual(alternative.end_at - alternative.start_at, self.end - self.start)
+
+    def test_lapsed_hold_is_reclaimed_by_the_next_booking(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            lapsed = hold(self.patient, self.doctor.pk, self.start, self.end)
+        Appointment.objects.filter(pk=lapsed.pk).update(hold_expires_at=timezone.now() - timedelta(seconds=1))
+        # The schedule leaves lapsed holds out on its next load
+        get_schedules().clear()
+
+        appointment = self.book(self.start, self.end)
+        self.assertEqual(appointment.status, 'pending')
+        self.assertFalse(Appointment.objects.filter(pk=lapsed.pk).exists())
+
+    def test_live_hold_blocks_the_slot(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            hold(self.patient, self.doctor.pk, self.start, self.end)
+        with self.assertRaises(SlotUnavailable):
+            self.book(self.start, self.end)
 
-# Create your tests here.
+    def test_release_expired_holds(self):
+        live = hold(self.patient, self.doctor.pk, self.start, self.end)
+        lapsed = hold(self.patient, self.doctor.pk, self.end, self.end + timedelta(minutes=30))
+        Appointment.objects.filter(pk=lapsed.pk).update(hold_expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(release_expired_holds(), 1)
+        self.assertEqual(list(Appointment.objects.values_list('pk', flat=True)), [live.pk])
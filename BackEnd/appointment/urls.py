@@ -0,0 +1,14 @@
+# appointment/urls.py
+from django.urls import path
+from . import views
+
+app_name = 'appointment'
+
+urlpatterns = [
+    path('appointments/', views.appointments, name='appointments'),
+    path('appointments/holds/', views.hold_slot, name='hold_slot'),
+    path('appointments/holds/<int:appointment_id>/', views.confirm_or_release_hold, name='confirm_or_release_hold'),
+    path('appointments/<int:appointment_id>/cancel/', views.cancel_appointment, name='cancel_appointment'),
+    path('availability/', views.availability, name='availability'),
+    path('doctors/<int:doctor_id>/free-slots/', views.doctor_free_slots, name='doctor_free_slots'),
+]
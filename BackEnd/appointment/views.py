@@ -1,3 +1,306 @@
-from django.shortcuts import render
+# appointment/views.py
+from datetime import datetime, timedelta
 
-# Create your views here.
+from rest_framework import status, permissions
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+from django.utils import timezone
+
+from authentication.models import User
+from doctor.models import Doctor
+from management.activity_log import log_activity
+from Core.pagination import InvalidCursor, KeysetPaginator, with_next_link
+from .availability import get_availability
+from .booking import (
+    BookingError, SlotUnavailable, book, cancel, confirm_hold, hold_or_alternative, release_hold
+)
+from .models import Appointment
+from .schedule import appointments_setting, get_schedules
+from .serializers import (
+    AppointmentSerializer, BookAppointmentSerializer, FreeSlotsQuerySerializer, AvailabilityQuerySerializer
+)
+
+APPOINTMENTS = KeysetPaginator(('-start_at', '-id'), max_limit=100)
+
+
+def visible_appointments(user):
+    """Patients see their own appointments, doctors theirs, staff and admins all"""
+    appointments = Appointment.objects.select_related('patient', 'doctor__user')
+    if user.is_patient():
+        return appointments.filter(patient=user)
+    if user.is_doctor():
+        return appointments.filter(doctor__user=user)
+    return appointments
+
+
+def day_time(day, value):
+    return timezone.make_aware(datetime.combine(day, value))
+
+
+@api_view(['GET', 'POST'])
+@permission_classes([permissions.IsAuthenticated])
+def appointments(request):
+    """List visible appointments, latest first (?cursor=, ?limit=, ?status=), or book one"""
+    if request.method == 'POST':
+        return book_appointment(request)
+
+    queryset = visible_appointments(request.user)
+    if request.GET.get('status'):
+        queryset = queryset.filter(status=request.GET['status'])
+    try:
+        rows, next_cursor = APPOINTMENTS.paginate(queryset, request.GET)
+    except InvalidCursor as e:
+        return Response({
+            'success': False,
+            'message': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    serializer = AppointmentSerializer(rows, many=True)
+    return with_next_link(request, Response(serializer.data), next_cursor)
+
+
+def booking_patient(request):
+    """Patients book for themselves; staff and admins name the patient. None if there is none."""
+    if request.user.is_patient():
+        return request.user
+    if request.user.is_doctor():
+        return None
+    return User.objects.filter(pk=request.data.get('patient'), user_type='patient').first()
+
+
+def book_appointment(request):
+    """Book a slot with a doctor; patients book for themselves, staff may pass ``patient``"""
+    serializer = BookAppointmentSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response({
+            'success': False,
+            'errors': serializer.errors
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    patient = booking_patient(request)
+    if patient is None:
+        return Response({
+            'success': False,
+            'message': 'A patient is required to book an appointment'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    data = serializer.validated_data
+    try:
+        appointment = book(patient, data['doctor'].pk, data['start_at'], data['end_at'], notes=data['notes'])
+    except SlotUnavailable as e:
+        return Response({
+            'success': False,
+            'message': str(e),
+            'conflicts': e.conflicts
+        }, status=status.HTTP_409_CONFLICT)
+    except BookingError as e:
+        return Response({
+            'success': False,
+            'message': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    log_activity(
+        activity_type='appointment_created',
+        description=f"Appointment booked with {data['doctor']} at {appointment.start_at.isoformat()}",
+        user=request.user,
+        metadata={'appointment_id': appointment.pk, 'doctor_id': appointment.doctor_id}
+    )
+    return Response({
+        'success': True,
+        'message': 'Appointment booked successfully',
+        'appointment': AppointmentSerializer(appointment).data
+    }, status=status.HTTP_201_CREATED)
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def hold_slot(request):
+    """
+    Hold a slot for HOLD_SECONDS until it is confirmed. If another client
+    took it first, the doctor's next free slot is held instead (``alternate``).
+    """
+    serializer = BookAppointmentSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response({
+            'success': False,
+            'errors': serializer.errors
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    patient = booking_patient(request)
+    if patient is None:
+        return Response({
+            'success': False,
+            'message': 'A patient is required to book an appointment'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    data = serializer.validated_data
+    try:
+        held, retries = hold_or_alternative(patient, data['doctor'].pk, data['start_at'], data['end_at'])
+    except SlotUnavailable as e:
+        return Response({
+            'success': False,
+            'message': str(e)
+        }, status=status.HTTP_409_CONFLICT)
+    except BookingError as e:
+        return Response({
+            'success': False,
+            'message': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({
+        'success': True,
+        'alternate': held.start_at != data['start_at'],
+        'retries': retries,
+        'hold': AppointmentSerializer(held).data
+    }, status=status.HTTP_201_CREATED)
+
+
+@api_view(['POST', 'DELETE'])
+@permission_classes([permissions.IsAuthenticated])
+def confirm_or_release_hold(request, appointment_id):
+    """POST confirms the hold as a pending appointment; DELETE gives the slot back"""
+    holder = visible_appointments(request.user).filter(pk=appointment_id, status='held').values_list(
+        'patient_id', flat=True
+    ).first()
+    if holder is None:
+        return Response({
+            'success': False,
+            'message': 'Hold not found'
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    try:
+        if request.method == 'DELETE':
+            release_hold(appointment_id, holder)
+            return Response({
+                'success': True,
+                'message': 'Hold released'
+            })
+        appointment = confirm_hold(appointment_id, holder)
+    except BookingError as e:
+        return Response({
+            'success': False,
+            'message': str(e)
+        }, status=status.HTTP_409_CONFLICT)
+
+    log_activity(
+        activity_type='appointment_created',
+        description=f"Appointment booked with {appointment.doctor} at {appointment.start_at.isoformat()}",
+        user=request.user,
+        metadata={'appointment_id': appointment.pk, 'doctor_id': appointment.doctor_id}
+    )
+    return Response({
+        'success': True,
+        'message': 'Appointment booked successfully',
+        'appointment': AppointmentSerializer(appointment).data
+    })
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def cancel_appointment(request, appointment_id):
+    """Cancel a pending or confirmed appointment, freeing its slot"""
+    appointment = visible_appointments(request.user).filter(pk=appointment_id).first()
+    if appointment is None:
+        return Response({
+            'success': False,
+            'message': 'Appointment not found'
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    try:
+        cancel(appointment)
+    except BookingError as e:
+        return Response({
+            'success': False,
+            'message': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    log_activity(
+        activity_type='appointment_cancelled',
+        description=f"Appointment {appointment.pk} with {appointment.doctor} cancelled",
+        user=request.user,
+        metadata={'appointment_id': appointment.pk, 'doctor_id': appointment.doctor_id}
+    )
+    return Response({
+        'success': True,
+        'message': 'Appointment cancelled successfully'
+    })
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def doctor_free_slots(request, doctor_id):
+    """Free start times for a doctor on ?date= (?duration= and ?step= in minutes, ?start=/?end= times of day)"""
+    query = FreeSlotsQuerySerializer(data=request.GET)
+    if not query.is_valid():
+        return Response({
+            'success': False,
+            'errors': query.errors
+        }, status=status.HTTP_400_BAD_REQUEST)
+    if not Doctor.objects.filter(pk=doctor_id).exists():
+        return Response({
+            'success': False,
+            'message': 'Doctor not found'
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    params = query.validated_data
+    day = params['date']
+    duration = timedelta(minutes=params.get('duration') or appointments_setting('DEFAULT_DURATION_MINUTES'))
+    step = timedelta(minutes=params['step']) if params.get('step') else None
+
+    # Search the doctor's working blocks that day, narrowed to ?start=/?end=
+    schedule = get_schedules().get(doctor_id, day)
+    slots = []
+    for window_start, window_end in get_availability().working_windows(doctor_id, day):
+        if params.get('start'):
+            window_start = max(window_start, day_time(day, params['start']))
+        if params.get('end'):
+            window_end = min(window_end, day_time(day, params['end']))
+        if window_start < window_end:
+            slots += schedule.free_slots(duration, window_start, window_end, step=step)
+
+    now = timezone.now()
+    return Response({
+        'doctor': doctor_id,
+        'date': day,
+        'duration_minutes': int(duration.total_seconds() // 60),
+        'slots': [slot for slot in slots if slot >= now],
+    })
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def availability(request):
+    """
+    Earliest free slots across available doctors (?specialization=, ?after=,
+    ?duration= minutes, ?limit=, ?days= ahead, ?distinct_doctors=true for one per doctor)
+    """
+    query = AvailabilityQuerySerializer(data=request.GET)
+    if not query.is_valid():
+        return Response({
+            'success': False,
+            'errors': query.errors
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    params = query.validated_data
+    doctors = Doctor.objects.filter(is_available=True)
+    if params.get('specialization'):
+        doctors = doctors.filter(specialization=params['specialization'])
+    doctor_ids = list(doctors.order_by('id').values_list('id', flat=True))
+
+    now = timezone.now()
+    slots = get_availability().next_free_slots(
+        doctor_ids,
+        max(params.get('after') or now, now),
+        timedelta(minutes=params.get('duration') or appointments_setting('DEFAULT_DURATION_MINUTES')),
+        limit=params['limit'],
+        days=params.get('days'),
+        distinct_doctors=params['distinct_doctors'],
+    )
+    names = {
+        doctor.pk: str(doctor)
+        for doctor in Doctor.objects.filter(pk__in={doctor_id for doctor_id, _, _ in slots}).select_related('user')
+    }
+    return Response([
+        {'doctor': doctor_id, 'doctor_name': names[doctor_id], 'start_at': start_at, 'end_at': end_at}
+        for doctor_id, start_at, end_at in slots
+    ])
@@ -0,0 +1,66 @@
+# authentication/authentication.py
+import copy
+
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import User
+from .user_cache import VERSION_CLAIM, shared_token_version, token_version, user_cache
+
+# Token claims that are enough to build request.user without a query
+CLAIM_FIELDS = ('email', 'user_type')
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that does not query Postgres on every request.
+
+    request.user comes from the per-process user cache when it holds a copy
+    matching the token's version claim. Otherwise, if the user's version in
+    the shared cache still matches the token (so the account is as active as
+    when the token was issued), it is a User built from the token claims
+    alone; its other fields are deferred and the first access to one loads
+    the full row through the cache (see User.refresh_from_db). Failing both,
+    the user is loaded from the database.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = User._meta.pk.to_python(validated_token[api_settings.USER_ID_CLAIM])
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        version = validated_token.get(VERSION_CLAIM)
+        user = user_cache.get(user_id)
+
+        if (user is None and version is not None and all(claim in validated_token for claim in CLAIM_FIELDS)
+                and shared_token_version(user_id) == version):
+            return self.user_from_claims(user_id, validated_token)
+
+        if user is None or (version is not None and token_version(user) != version):
+            # Cache miss for an old-style token, or the cached copy disagrees with the token
+            try:
+                user = user_cache.load(user_id)
+            except User.DoesNotExist:
+                user_cache.evict(user_id)
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            if version is not None and token_version(user) != version:
+                raise AuthenticationFailed(_("Token is no longer valid for this user"), code="token_not_valid")
+
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        return copy.copy(user)
+
+    @staticmethod
+    def user_from_claims(user_id, validated_token):
+        # Only called while the shared token_version matches, which covers is_active
+        claims = {'id': user_id, 'is_active': True, **{claim: validated_token[claim] for claim in CLAIM_FIELDS}}
+        # from_db expects values in concrete field order; everything else stays deferred
+        field_names = [field.attname for field in User._meta.concrete_fields if field.attname in claims]
+        user = User.from_db(DEFAULT_DB_ALIAS, field_names, [claims[name] for name in field_names])
+        user._token_claims_only = True
+        return user
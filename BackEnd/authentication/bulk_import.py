@@ -0,0 +1,376 @@
+# authentication/bulk_import.py
+"""
+Bulk patient import for onboarding partner clinics.
+
+Rows are streamed from CSV or JSONL and handled in chunks:
+
+1. validate each row and drop duplicates within the chunk
+2. drop emails that already have an account (one ``email__in`` query)
+3. resolve every province/city in the chunk from the in-memory gazetteer
+   and ``bulk_create`` the missing ones
+4. hash passwords across a process pool (PBKDF2 is CPU bound)
+5. ``bulk_create`` Address rows, then User rows, in one transaction
+
+Used by ``manage.py import_patients`` and the admin import API. The API
+only stores the upload as a PatientImport (``queue_import``); the
+``run_patient_imports`` worker claims queued imports (``claim_import``) and
+runs them (``run_import``), so no import or process pool runs inside a web
+worker. Uploads go to default storage, which the worker nodes must share.
+"""
+import csv
+import io
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import DataError, IntegrityError, transaction
+from django.utils import timezone
+
+from addresses.gazetteer import bump_version, get_gazetteer, normalize_name
+from addresses.models import Address, CityMunicipality, Province
+from management import counters
+from management.activity_log import log_activity
+from .models import PatientImport, User
+
+logger = logging.getLogger(__name__)
+REQUIRED_FIELDS = [
+    'email', 'first_name', 'last_name', 'contact_number', 'sex', 'date_of_birth',
+    'street', 'barangay', 'city_municipality', 'province',
+]
+# Cap on errors kept in memory; the count is always exact
+MAX_REPORTED_ERRORS = 1000
+
+# Import column -> the model field it is stored in, for max_length checks
+STORED_FIELDS = {
+    'email': (User, 'email'),
+    'first_name': (User, 'first_name'),
+    'middle_name': (User, 'middle_name'),
+    'last_name': (User, 'last_name'),
+    'contact_number': (User, 'contact_number'),
+    'street': (Address, 'street'),
+    'barangay': (Address, 'barangay'),
+    'city_municipality': (CityMunicipality, 'name'),
+    'zip_code': (CityMunicipality, 'zip_code'),
+    'province': (Province, 'name'),
+}
+
+
+def max_lengths():
+    return {column: model._meta.get_field(field).max_length for column, (model, field) in STORED_FIELDS.items()}
+
+
+def _init_hash_worker():
+    import django
+    django.setup()
+
+
+def iter_rows(stream, file_format):
+    """Yield (row_number, dict) from a text stream of CSV or JSONL"""
+    if file_format == 'csv':
+        for number, row in enumerate(csv.DictReader(stream), start=2):
+            yield number, row
+    elif file_format == 'jsonl':
+        for number, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield number, json.loads(line)
+            except ValueError:
+                yield number, None
+    else:
+        raise ValueError(f"Unsupported format {file_format!r}; use csv or jsonl")
+
+
+def detect_format(filename):
+    return 'jsonl' if filename.lower().endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+def text_stream(binary_file):
+    return io.TextIOWrapper(binary_file, encoding='utf-8-sig', newline='')
+
+
+class ImportReport:
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.error_count = 0
+        self.errors = []
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def error(self, row_number, email, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row_number, 'email': email, 'error': message})
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.started
+        return self
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self):
+        return {
+            'rows': self.rows,
+            'created': self.created,
+            'errors': self.error_count,
+            'elapsed_seconds': round(self.elapsed, 3),
+            'rows_per_second': round(self.rows_per_second, 1),
+            'error_details': self.errors,
+        }
+
+
+class PatientImporter:
+    def __init__(self, chunk_size=1000, workers=None, dry_run=False):
+        self.chunk_size = chunk_size
+        self.workers = workers or os.cpu_count() or 1
+        self.dry_run = dry_run
+        self.report = ImportReport()
+        self.max_lengths = max_lengths()
+        self._executor = None
+
+    def run(self, rows):
+        """Import an iterable of (row_number, dict). Returns the ImportReport."""
+        try:
+            chunk = []
+            for row_number, row in rows:
+                self.report.rows += 1
+                chunk.append((row_number, row))
+                if len(chunk) >= self.chunk_size:
+                    self.import_chunk(chunk)
+                    chunk = []
+            if chunk:
+                self.import_chunk(chunk)
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown()
+        return self.report.finish()
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Core.settings')
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_hash_worker)
+        return self._executor
+
+    def clean_row(self, row):
+        """Return the normalized row or raise ValueError with a readable message"""
+        if not isinstance(row, dict):
+            raise ValueError("Malformed row")
+        row = {key.strip(): (value.strip() if isinstance(value, str) else value) for key, value in row.items() if key}
+
+        missing = [field for field in REQUIRED_FIELDS if not row.get(field)]
+        if missing:
+            raise ValueError(f"Missing required fields: {', '.join(missing)}")
+
+        # Too long for its column: PostgreSQL would reject the whole chunk with a DataError
+        too_long = [
+            f"{column} (max {limit})" for column, limit in self.max_lengths.items()
+            if row.get(column) and len(str(row[column])) > limit
+        ]
+        if too_long:
+            raise ValueError(f"Too long: {', '.join(too_long)}")
+
+        row['email'] = User.objects.normalize_email(row['email']).lower()
+        try:
+            validate_email(row['email'])
+        except ValidationError:
+            raise ValueError("Invalid email address")
+
+        # Hashed in the pool, where a bad type would abort the whole import
+        if row.get('password') is not None and not isinstance(row['password'], str):
+            raise ValueError("Password must be a string")
+
+        row['sex'] = str(row['sex']).upper()[:1]
+        if row['sex'] not in ('M', 'F'):
+            raise ValueError("Sex must be M or F")
+
+        try:
+            row['date_of_birth'] = datetime.strptime(str(row['date_of_birth']), "%Y-%m-%d").date()
+        except ValueError:
+            raise ValueError("Invalid date format for date of birth. Use YYYY-MM-DD format.")
+
+        return row
+
+    def resolve_cities(self, rows):
+        """Map (province, city) name pairs to CityMunicipality ids, creating missing ones in bulk"""
+        gazetteer = get_gazetteer()
+        pairs = {(row['province'], row['city_municipality']): row.get('zip_code') or '' for row in rows}
+
+        provinces = {}
+        new_provinces = {}
+        for province, _ in pairs:
+            key = normalize_name(province)
+            provinces[key] = gazetteer.province_id(province)
+            if provinces[key] is None:
+                new_provinces.setdefault(key, Province(name=province))
+        if new_provinces:
+            Province.objects.bulk_create(list(new_provinces.values()))
+            for key, province in new_provinces.items():
+                provinces[key] = province.pk
+
+        city_ids = {}
+        new_cities = {}
+        for (province, city), zip_code in pairs.items():
+            province_id = provinces[normalize_name(province)]
+            city_id = gazetteer.city_id(province_id, city)
+            if city_id is None:
+                new_cities.setdefault(
+                    (province_id, normalize_name(city)),
+                    CityMunicipality(name=city, province_id=province_id, zip_code=zip_code),
+                )
+            city_ids[(province, city)] = city_id
+        if new_cities:
+            CityMunicipality.objects.bulk_create(list(new_cities.values()))
+            for pair, city_id in city_ids.items():
+                if city_id is None:
+                    key = (provinces[normalize_name(pair[0])], normalize_name(pair[1]))
+                    city_ids[pair] = new_cities[key].pk
+
+        if new_provinces or new_cities:
+            # bulk_create sends no signals
+            transaction.on_commit(bump_version)
+        return city_ids
+
+    def import_chunk(self, chunk):
+        valid = []
+        seen = set()
+        for row_number, row in chunk:
+            try:
+                row = self.clean_row(row)
+            except ValueError as e:
+                self.report.error(row_number, row.get('email') if isinstance(row, dict) else None, str(e))
+                continue
+            if row['email'] in seen:
+                self.report.error(row_number, row['email'], "Duplicate email in import file")
+                continue
+            seen.add(row['email'])
+            valid.append((row_number, row))
+
+        valid = self.drop_existing(valid)
+
+        if not valid or self.dry_run:
+            return
+
+        # Rows without a password get an unusable one and must reset it
+        passwords = [row.get('password') or None for _, row in valid]
+        to_hash = [password for password in passwords if password]
+        hashed = iter(self.executor.map(make_password, to_hash, chunksize=max(1, len(to_hash) // (self.workers * 4))))
+        encoded = [next(hashed) if password else make_password(None) for password in passwords]
+
+        try:
+            self.insert(valid, encoded)
+        except IntegrityError:
+            # Someone signed up with one of these emails (or added one of these locations)
+            # mid-import; drop them, reload the gazetteer and retry once
+            bump_version()
+            remaining = self.drop_existing(valid)
+            remaining_numbers = {number for number, _ in remaining}
+            encoded = [password for (number, _), password in zip(valid, encoded) if number in remaining_numbers]
+            valid = remaining
+            try:
+                self.insert(valid, encoded)
+            except IntegrityError as e:
+                for row_number, row in valid:
+                    self.report.error(row_number, row['email'], f"Chunk rolled back: {str(e)}")
+                return
+        except DataError as e:
+            # A value the checks in clean_row did not catch; report the chunk instead of aborting the import
+            for row_number, row in valid:
+                self.report.error(row_number, row['email'], f"Chunk rolled back: {str(e)}")
+            return
+
+        self.report.created += len(valid)
+
+    def drop_existing(self, valid):
+        """Remove rows whose email already has an account, with one set-based query"""
+        existing = set(User.objects.filter(email__in=[row['email'] for _, row in valid]).values_list('email', flat=True))
+        if not existing:
+            return valid
+        for row_number, row in valid:
+            if row['email'] in existing:
+                self.report.error(row_number, row['email'], "User with this email already exists")
+        return [(number, row) for number, row in valid if row['email'] not in existing]
+
+    def insert(self, valid, encoded):
+        with transaction.atomic():
+            city_ids = self.resolve_cities([row for _, row in valid])
+            addresses = Address.objects.bulk_create([
+                Address(
+                    street=row['street'],
+                    barangay=row['barangay'],
+                    city_municipality_id=city_ids[(row['province'], row['city_municipality'])],
+                )
+                for _, row in valid
+            ])
+            User.objects.bulk_create([
+                User(
+                    email=row['email'],
+                    password=password,
+                    first_name=row['first_name'],
+                    middle_name=row.get('middle_name') or None,
+                    last_name=row['last_name'],
+                    contact_number=row['contact_number'],
+                    sex=row['sex'],
+                    date_of_birth=row['date_of_birth'],
+                    address=address,
+                    user_type='patient',
+                )
+                for (_, row), password, address in zip(valid, encoded, addresses)
+            ])
+            # bulk_create sends no signals, so count the new patients here
+            counters.increment(counters.user_key('patient'), len(valid))
+
+
+def queue_import(upload, file_format, dry_run, requested_by):
+    """Store an uploaded file as a pending PatientImport for the run_patient_imports worker"""
+    return PatientImport.objects.create(
+        file=upload, file_name=upload.name, file_format=file_format, dry_run=dry_run, requested_by=requested_by,
+    )
+
+
+def claim_import():
+    """Mark the oldest pending import running and return it, or None; skips imports another worker holds"""
+    with transaction.atomic():
+        job = (PatientImport.objects.select_for_update(skip_locked=True)
+               .filter(status='pending').order_by('created_at').first())
+        if job is not None:
+            job.status = 'running'
+            job.started_at = timezone.now()
+            job.save(update_fields=['status', 'started_at'])
+    return job
+
+
+def run_import(job, **importer_options):
+    """Run a claimed PatientImport, store its report and delete the upload"""
+    importer = PatientImporter(dry_run=job.dry_run, **importer_options)
+    try:
+        with job.file.open('rb') as upload:
+            report = importer.run(iter_rows(text_stream(upload), job.file_format))
+    except Exception as e:
+        logger.exception(f"Patient import {job.pk} failed")
+        job.status = 'failed'
+        job.error = str(e)
+    else:
+        job.status = 'done'
+        job.report = report.as_dict()
+        if report.created:
+            log_activity(
+                activity_type='user_registered',
+                description=f"Imported {report.created} patients from {job.file_name}",
+                user=job.requested_by,
+                metadata={'file': job.file_name, 'created': report.created, 'errors': report.error_count}
+            )
+    job.finished_at = timezone.now()
+    job.file.delete(save=False)
+    job.save()
+    return job
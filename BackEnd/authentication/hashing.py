@@ -0,0 +1,109 @@
+# authentication/hashing.py
+"""
+Bounded executor for password hashing on the async login path.
+
+PBKDF2 pins a CPU for tens of milliseconds per check. Under ASGI the async
+login view hands every check to a fixed-size executor instead of running it on
+the event loop, and admits callers through a FIFO gate so a login burst queues
+fairly behind the executor instead of starving other endpoints. When the queue
+is full callers are rejected right away with ``LoginQueueFull``.
+"""
+import asyncio
+import os
+import threading
+import weakref
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password, verify_password
+
+LOGIN_HASHING_DEFAULTS = {
+    'EXECUTOR': 'thread',
+    'WORKERS': os.cpu_count() or 2,
+    'MAX_QUEUE': 64,
+    'QUEUE_TIMEOUT_SECONDS': 5,
+}
+
+
+class LoginQueueFull(Exception):
+    """Raised when too many login attempts are already waiting for a hashing slot"""
+
+
+def login_hashing_setting(name):
+    return getattr(settings, 'LOGIN_HASHING', {}).get(name, LOGIN_HASHING_DEFAULTS[name])
+
+
+def _init_process_worker():
+    import django
+    django.setup()
+
+
+_executor = None
+_executor_lock = threading.Lock()
+_gates = weakref.WeakKeyDictionary()
+
+
+def get_executor():
+    """Process-wide executor shared by every event loop"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = login_hashing_setting('WORKERS')
+            if login_hashing_setting('EXECUTOR') == 'process':
+                os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Core.settings')
+                _executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_process_worker)
+            else:
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        return _executor
+
+
+class HashingGate:
+    """FIFO admission to the executor for one event loop"""
+
+    def __init__(self, slots, max_queue):
+        # asyncio.Semaphore wakes waiters in arrival order
+        self.semaphore = asyncio.Semaphore(slots)
+        self.max_queue = max_queue
+        self.waiting = 0
+
+    async def run(self, func, *args):
+        if self.semaphore.locked() and self.waiting >= self.max_queue:
+            raise LoginQueueFull()
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self.semaphore.acquire(), login_hashing_setting('QUEUE_TIMEOUT_SECONDS'))
+        except asyncio.TimeoutError:
+            raise LoginQueueFull()
+        finally:
+            self.waiting -= 1
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(get_executor(), func, *args)
+        finally:
+            self.semaphore.release()
+
+
+def get_gate():
+    loop = asyncio.get_running_loop()
+    gate = _gates.get(loop)
+    if gate is None:
+        gate = _gates[loop] = HashingGate(
+            slots=login_hashing_setting('WORKERS'),
+            max_queue=login_hashing_setting('MAX_QUEUE'),
+        )
+    return gate
+
+
+async def averify_password(password, encoded):
+    """Return (is_correct, must_update) without blocking the event loop.
+
+    Pass ``encoded=None`` for unknown users; Django still runs one hash so the
+    response time does not reveal whether the account exists.
+    """
+    return await get_gate().run(verify_password, password, encoded)
+
+
+async def amake_password(password):
+    """Hash ``password`` with the preferred hasher (first entry of PASSWORD_HASHERS)"""
+    return await get_gate().run(make_password, password)
@@ -0,0 +1,77 @@
+import asyncio
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from authentication.models import User
+
+BENCH_EMAIL = 'login-storm@bench.invalid'
+BENCH_PASSWORD = 'Bench-password-123'
+
+
+def percentile(samples, pct):
+    return statistics.quantiles(samples, n=100, method='inclusive')[pct - 1] if len(samples) > 1 else samples[0]
+
+
+class Command(BaseCommand):
+    help = ("Measure p50/p99 of a non-login endpoint (auth/user/) while a login storm hits "
+            "the sync login/ view versus the async login/async/ view, in one ASGI process")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=32, help="Concurrent login clients")
+        parser.add_argument('--probes', type=int, default=100, help="Requests to the non-login endpoint")
+        parser.add_argument('--probe-interval', type=float, default=0.01)
+
+    def handle(self, *args, **options):
+        User.objects.filter(email=BENCH_EMAIL).delete()
+        user = User.objects.create_user(
+            email=BENCH_EMAIL, password=BENCH_PASSWORD,
+            first_name='Bench', last_name='User', user_type='patient',
+        )
+        access = str(RefreshToken.for_user(user).access_token)
+
+        self.stdout.write(f"{'scenario':>14} {'p50 ms':>9} {'p99 ms':>9} {'logins/s':>9}")
+        try:
+            for scenario, login_path in [('idle', None),
+                                         ('sync login', '/api/v1/auth/login/'),
+                                         ('async login', '/api/v1/auth/login/async/')]:
+                latencies, logins_per_second = asyncio.run(self.run_scenario(login_path, access, options))
+                self.stdout.write(f"{scenario:>14} {percentile(latencies, 50):>9.2f} "
+                                  f"{percentile(latencies, 99):>9.2f} {logins_per_second:>9.1f}")
+        finally:
+            User.objects.filter(email=BENCH_EMAIL).delete()
+
+    async def run_scenario(self, login_path, access, options):
+        client = AsyncClient()
+        stop = asyncio.Event()
+        logins = 0
+
+        async def storm():
+            nonlocal logins
+            body = json.dumps({'email': BENCH_EMAIL, 'password': BENCH_PASSWORD})
+            while not stop.is_set():
+                response = await client.post(login_path, body, content_type='application/json')
+                if response.status_code == 200:
+                    logins += 1
+
+        async def probe():
+            latencies = []
+            for _ in range(options['probes']):
+                started = time.perf_counter()
+                response = await client.get('/api/v1/auth/user/', headers={'Authorization': f'Bearer {access}'})
+                latencies.append((time.perf_counter() - started) * 1000)
+                assert response.status_code == 200, response.status_code
+                await asyncio.sleep(options['probe_interval'])
+            return latencies
+
+        storm_tasks = [asyncio.create_task(storm()) for _ in range(options['concurrency'] if login_path else 0)]
+        started = time.perf_counter()
+        latencies = await probe()
+        stop.set()
+        # In-flight logins still finish, so count them against the full run
+        await asyncio.gather(*storm_tasks)
+        return latencies, logins / (time.perf_counter() - started)
@@ -0,0 +1,94 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
+
+from authentication.models import OTPVerification
+from authentication.views import SendOTPView
+from notification.models import OutboundEmail
+from notification.outbox import OutboxWorkerPool
+from notification.smtp_sink import SMTPSink
+
+BENCH_DOMAIN = 'otp-bench.invalid'
+
+
+def inline_send_otp(email):
+    """The pre-outbox request path: write the OTP, then talk to SMTP before responding"""
+    OTPVerification.objects.filter(email=email, is_used=False).update(is_used=True)
+    otp_code = OTPVerification.generate_otp()
+    OTPVerification.objects.create(
+        email=email,
+        otp_code=otp_code,
+        expires_at=timezone.now() + timezone.timedelta(minutes=10)
+    )
+    send_mail(
+        subject="Your OTP Code - BukCare",
+        message=f"Your OTP code is {otp_code}. It will expire in 10 minutes.",
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        recipient_list=[email],
+        fail_silently=False,
+    )
+
+
+def percentile(samples, pct):
+    return statistics.quantiles(samples, n=100, method='inclusive')[pct - 1] if len(samples) > 1 else samples[0]
+
+
+class Command(BaseCommand):
+    help = "Compare send-otp request latency with inline SMTP versus the email outbox, against a local SMTP sink"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50)
+        parser.add_argument('--latencies', default='0,0.05,0.2',
+                            help="Comma separated per-reply SMTP delays in seconds")
+        parser.add_argument('--workers', type=int, default=4)
+
+    def handle(self, *args, **options):
+        count = options['requests']
+        latencies = [float(value) for value in options['latencies'].split(',')]
+        factory = APIRequestFactory()
+        view = SendOTPView.as_view()
+
+        self.stdout.write(f"{'smtp delay':>10} {'mode':>8} {'p50 ms':>9} {'p99 ms':>9} {'drain msg/s':>12}")
+        try:
+            for latency in latencies:
+                with SMTPSink(latency=latency) as sink, override_settings(**sink.email_settings()):
+                    inline = []
+                    for i in range(count):
+                        started = time.perf_counter()
+                        inline_send_otp(f"inline-{i}@{BENCH_DOMAIN}")
+                        inline.append((time.perf_counter() - started) * 1000)
+
+                    outbox = []
+                    for i in range(count):
+                        request = factory.post('/api/v1/auth/send-otp/', {'email': f"outbox-{i}@{BENCH_DOMAIN}"},
+                                               format='json')
+                        started = time.perf_counter()
+                        response = view(request)
+                        outbox.append((time.perf_counter() - started) * 1000)
+                        if response.status_code != 200:
+                            raise RuntimeError(f"send-otp returned {response.status_code}: {response.data}")
+
+                    started = time.perf_counter()
+                    with OutboxWorkerPool(workers=options['workers'], poll_interval=0.01):
+                        while OutboundEmail.objects.filter(recipient__endswith=BENCH_DOMAIN).exclude(
+                                status__in=['sent', 'failed']).exists():
+                            time.sleep(0.01)
+                    drain_rate = count / (time.perf_counter() - started)
+
+                    self.stdout.write(f"{latency * 1000:>8.0f}ms {'inline':>8} {percentile(inline, 50):>9.2f} "
+                                      f"{percentile(inline, 99):>9.2f} {'-':>12}")
+                    self.stdout.write(f"{latency * 1000:>8.0f}ms {'outbox':>8} {percentile(outbox, 50):>9.2f} "
+                                      f"{percentile(outbox, 99):>9.2f} {drain_rate:>12.1f}")
+                    self.cleanup()
+        finally:
+            self.cleanup()
+
+    def cleanup(self):
+        OTPVerification.objects.filter(email__endswith=BENCH_DOMAIN).delete()
+        OutboundEmail.objects.filter(recipient__endswith=BENCH_DOMAIN).delete()
@@ -0,0 +1,44 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from authentication.bulk_import import PatientImporter, detect_format, iter_rows
+
+
+class Command(BaseCommand):
+    help = "Bulk import patient accounts from a CSV or JSONL file"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV (with header) or JSONL file")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="Default: from the file extension")
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--workers', type=int, help="Password hashing processes (default: CPU count)")
+        parser.add_argument('--dry-run', action='store_true', help="Validate and dedupe only")
+        parser.add_argument('--errors', help="Write per-row errors to this JSONL file")
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or detect_format(options['path'])
+        importer = PatientImporter(
+            chunk_size=options['chunk_size'],
+            workers=options['workers'],
+            dry_run=options['dry_run'],
+        )
+
+        try:
+            with open(options['path'], encoding='utf-8-sig', newline='') as stream:
+                report = importer.run(iter_rows(stream, file_format))
+        except OSError as e:
+            raise CommandError(str(e))
+
+        if options['errors']:
+            with open(options['errors'], 'w') as errors_file:
+                for error in report.errors:
+                    errors_file.write(json.dumps(error) + "\n")
+        else:
+            for error in report.errors[:20]:
+                self.stderr.write(f"row {error['row']} ({error['email']}): {error['error']}")
+
+        self.stdout.write(
+            f"{report.rows} rows, {report.created} created, {report.error_count} errors "
+            f"in {report.elapsed:.1f}s ({report.rows_per_second:.0f} rows/s)"
+        )
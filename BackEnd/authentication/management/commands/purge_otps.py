@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from authentication.otp_store import get_otp_store
+
+
+class Command(BaseCommand):
+    help = "Delete expired and stale OTP state from the configured OTP store"
+
+    def handle(self, *args, **options):
+        store = get_otp_store()
+        removed = store.purge()
+        self.stdout.write(f"{type(store).__name__}: purged {removed} OTP entries")
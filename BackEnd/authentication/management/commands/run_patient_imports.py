@@ -0,0 +1,36 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from authentication.bulk_import import claim_import, run_import
+
+
+class Command(BaseCommand):
+    help = "Run patient imports queued by the admin import API until interrupted"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--poll-seconds', type=int, default=10, help="How often to look for queued imports")
+        parser.add_argument('--workers', type=int, help="Password hashing processes (default: CPU count)")
+        parser.add_argument('--once', action='store_true', help="Run the queued imports, then exit")
+
+    def handle(self, *args, **options):
+        stopping = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+        try:
+            while not stopping.is_set():
+                job = claim_import()
+                if job is None:
+                    if options['once']:
+                        break
+                    stopping.wait(options['poll_seconds'])
+                    continue
+                self.stdout.write(f"Importing {job.file_name} ({job.pk})")
+                job = run_import(job, workers=options['workers'])
+                if job.status == 'failed':
+                    self.stderr.write(f"Import {job.pk} failed: {job.error}")
+                else:
+                    self.stdout.write(f"Import {job.pk}: {job.report['rows']} rows, {job.report['created']} created, "
+                                      f"{job.report['errors']} errors")
+        except KeyboardInterrupt:
+            pass
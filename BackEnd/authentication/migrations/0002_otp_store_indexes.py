@@ -0,0 +1,30 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='otpverification',
+            name='verified_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='otpverification',
+            index=models.Index(fields=['email', 'is_used', '-created_at'], name='otp_email_unused_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='otpverification',
+            index=models.Index(fields=['email', 'verified_at'], name='otp_email_verified_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='otpverification',
+            index=models.Index(fields=['expires_at'], name='otp_expires_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+from django.db import migrations
+
+# Kept in step with management.user_search.SEARCH_DOCUMENT
+SEARCH_DOCUMENT = "lower(first_name || ' ' || coalesce(middle_name, '') || ' ' || last_name || ' ' || email)"
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        # Other databases use the in-memory n-gram index
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    schema_editor.execute(
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS user_search_trgm_idx "
+        f"ON authentication_user USING gin (({SEARCH_DOCUMENT}) gin_trgm_ops)"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("DROP INDEX CONCURRENTLY IF EXISTS user_search_trgm_idx")
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('authentication', '0003_revoked_token'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -1,9 +1,11 @@
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.utils import timezone
-import random
-import string
 from addresses.models import Province, CityMunicipality, Address
+from notification.compose import MessageTemplate
+from .otp_store import get_otp_store
 
 
 class UserManager(BaseUserManager):
@@ -92,20 +94,41 @@ class User(AbstractUser):
     def is_patient(self):
         return self.user_type == 'patient'
     
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        if getattr(self, '_token_claims_only', False):
+            # Built from JWT claims by ClaimsJWTAuthentication: fill every deferred
+            # field at once from the per-process user cache instead of one query per field
+            from rest_framework.exceptions import AuthenticationFailed
+            from .user_cache import user_cache
+            try:
+                full_user = user_cache.get(self.pk) or user_cache.load(self.pk)
+            except User.DoesNotExist:
+                # Token outlived the account
+                raise AuthenticationFailed("User not found", code="user_not_found")
+            deferred = self.get_deferred_fields()
+            for field in self._meta.concrete_fields:
+                if field.attname in deferred:
+                    self.__dict__[field.attname] = full_user.__dict__[field.attname]
+            self._token_claims_only = False
+            return
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+    
     def __str__(self):
         return f"{self.get_full_name()} ({self.get_user_type_display()})"
 
 
 class OTPVerification(models.Model):
+    """Backing table for DatabaseOTPStore; go through authentication.otp_store instead of querying it"""
     email = models.EmailField()
     otp_code = models.CharField(max_length=6)
     created_at = models.DateTimeField(auto_now_add=True)
     is_used = models.BooleanField(default=False)
     expires_at = models.DateTimeField()
+    verified_at = models.DateTimeField(null=True, blank=True)
     
     def save(self, *args, **kwargs):
         if not self.expires_at:
-            self.expires_at = timezone.now() + timezone.timedelta(minutes=10)
+            self.expires_at = get_otp_store().expiry_from_now()
         super().save(*args, **kwargs)
     
     def is_expired(self):
@@ -113,33 +136,84 @@ class OTPVerification(models.Model):
     
     @staticmethod
     def generate_otp():
-        return ''.join(random.choices(string.digits, k=6))
+        return get_otp_store().generate_code()
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['email', 'is_used', '-created_at'], name='otp_email_unused_idx'),
+            models.Index(fields=['email', 'verified_at'], name='otp_email_verified_idx'),
+            models.Index(fields=['expires_at'], name='otp_expires_idx'),
+        ]
 
 
-def send_otp(email):
-    """Send OTP to email address"""
-    # Invalidate old OTPs for this email
-    OTPVerification.objects.filter(email=email, is_used=False).update(is_used=True)
-    
-    # Generate a new OTP
-    otp_code = OTPVerification.generate_otp()
-    otp = OTPVerification.objects.create(
-        email=email,
-        otp_code=otp_code,
-        expires_at=timezone.now() + timezone.timedelta(minutes=10)
-    )
+class RevokedToken(models.Model):
+    """Authoritative revocation list for refresh tokens; see authentication.revocation"""
+    jti = models.CharField(max_length=255, primary_key=True)
+    expires_at = models.DateTimeField(db_index=True)
+    revoked_at = models.DateTimeField(default=timezone.now, db_index=True)
     
-    # Send OTP via email
-    from django.core.mail import send_mail
-    from django.conf import settings
-    send_mail(
-        subject="Your OTP Code - BukCare",
-        message=f"Your OTP code is {otp_code}. It will expire in 10 minutes.",
-        from_email=settings.DEFAULT_FROM_EMAIL,
-        recipient_list=[email],
-    )
+    def __str__(self):
+        return f"Revoked token {self.jti}"
+
+
+class PatientImport(models.Model):
+    """An uploaded patient import, queued by the admin API and run by ``manage.py run_patient_imports``"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    # Deleted once the import has run
+    file = models.FileField(upload_to='imports/')
+    file_name = models.CharField(max_length=255)
+    file_format = models.CharField(max_length=10)
+    dry_run = models.BooleanField(default=False)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    requested_by = models.ForeignKey('User', on_delete=models.SET_NULL, null=True, blank=True,
+                                     related_name='patient_imports')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    report = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='patient_import_queue_idx'),
+        ]
     
-    return otp
\ No newline at end of file
+    def __str__(self):
+        return f"Patient import {self.file_name} ({self.status})"
+
+
+OTP_EMAIL = MessageTemplate('emails/otp', "Your OTP Code - {site_name}", variables=('otp_code',))
+
+
+def send_otp(email):
+    """Issue a new OTP and queue its email; delivery happens in the email outbox"""
+    from django.db import transaction
+    from notification.outbox import enqueue_email
+
+    with transaction.atomic():
+        otp_code = get_otp_store().issue(email)
+        subject, body, html_body = OTP_EMAIL.render({
+            'site_name': 'BukCare',
+            'expires_in_minutes': get_otp_store().ttl_seconds // 60,
+            'otp_code': otp_code,
+        })
+
+        # Queue the email in the same transaction so the code and its mail commit together
+        enqueue_email(
+            recipient=email,
+            subject=subject,
+            body=body,
+            html_body=html_body,
+            category='otp',
+        )
+
+    return otp_code
@@ -0,0 +1,163 @@
+# authentication/otp_store.py
+"""
+Pluggable OTP storage.
+
+Views and helpers never touch OTPVerification directly; they call
+``get_otp_store()`` which returns the backend named in ``settings.OTP_STORE``:
+
+- ``CacheOTPStore`` keeps one code per email in the shared cache (Redis in
+  production) and lets the cache expire it. Issue and verify are single key
+  operations and work across every node behind Nginx.
+- ``DatabaseOTPStore`` keeps codes in OTPVerification, reads them through a
+  composite index and relies on ``purge()`` (``manage.py purge_otps``) to keep
+  the table small.
+"""
+import hmac
+import secrets
+import string
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+VERIFIED = 'verified'
+INVALID = 'invalid'
+EXPIRED = 'expired'
+
+
+class BaseOTPStore:
+    code_length = 6
+
+    def __init__(self, ttl_seconds=600, verified_ttl_seconds=1800, **options):
+        self.ttl_seconds = ttl_seconds
+        self.verified_ttl_seconds = verified_ttl_seconds
+
+    @staticmethod
+    def normalize_email(email):
+        return (email or '').strip().lower()
+
+    def generate_code(self):
+        return ''.join(secrets.choice(string.digits) for _ in range(self.code_length))
+
+    def expiry_from_now(self):
+        return timezone.now() + timezone.timedelta(seconds=self.ttl_seconds)
+
+    def issue(self, email):
+        """Create a new code for ``email``, replacing any outstanding one. Returns the code."""
+        raise NotImplementedError
+
+    def verify(self, email, code):
+        """Consume ``code`` and return VERIFIED, INVALID or EXPIRED"""
+        raise NotImplementedError
+
+    def is_verified(self, email):
+        """True if ``email`` passed OTP verification within VERIFIED_TTL_SECONDS"""
+        raise NotImplementedError
+
+    def clear(self, email):
+        """Forget every code and verification for ``email`` (after signup)"""
+        raise NotImplementedError
+
+    def purge(self):
+        """Remove expired state. Returns the number of entries removed."""
+        return 0
+
+
+class CacheOTPStore(BaseOTPStore):
+    # Keep expired codes around briefly so users get "expired" instead of "invalid"
+    expired_grace_seconds = 300
+
+    def __init__(self, cache_alias='default', key_prefix='otp', **options):
+        super().__init__(**options)
+        self.cache = caches[cache_alias]
+        self.key_prefix = key_prefix
+
+    def code_key(self, email):
+        return f"{self.key_prefix}:code:{self.normalize_email(email)}"
+
+    def verified_key(self, email):
+        return f"{self.key_prefix}:verified:{self.normalize_email(email)}"
+
+    def issue(self, email):
+        code = self.generate_code()
+        self.cache.set(
+            self.code_key(email),
+            {'code': code, 'expires_at': self.expiry_from_now().timestamp()},
+            timeout=self.ttl_seconds + self.expired_grace_seconds,
+        )
+        return code
+
+    def verify(self, email, code):
+        key = self.code_key(email)
+        entry = self.cache.get(key)
+        if not entry or not hmac.compare_digest(entry['code'], str(code)):
+            return INVALID
+        if timezone.now().timestamp() > entry['expires_at']:
+            return EXPIRED
+        # delete() reports whether the key existed, so only one concurrent verify wins
+        if not self.cache.delete(key):
+            return INVALID
+        self.cache.set(self.verified_key(email), True, timeout=self.verified_ttl_seconds)
+        return VERIFIED
+
+    def is_verified(self, email):
+        return bool(self.cache.get(self.verified_key(email)))
+
+    def clear(self, email):
+        self.cache.delete_many([self.code_key(email), self.verified_key(email)])
+
+
+class DatabaseOTPStore(BaseOTPStore):
+
+    @property
+    def model(self):
+        from .models import OTPVerification
+        return OTPVerification
+
+    def issue(self, email):
+        email = self.normalize_email(email)
+        code = self.generate_code()
+        # Invalidate old OTPs for this email (index: email, is_used)
+        self.model.objects.filter(email=email, is_used=False).update(is_used=True)
+        self.model.objects.create(email=email, otp_code=code, expires_at=self.expiry_from_now())
+        return code
+
+    def verify(self, email, code):
+        email = self.normalize_email(email)
+        otp = self.model.objects.filter(email=email, is_used=False).order_by('-created_at').first()
+        if otp is None or not hmac.compare_digest(otp.otp_code, str(code)):
+            return INVALID
+        if otp.is_expired():
+            return EXPIRED
+        # Conditional update so only one concurrent verify wins
+        consumed = self.model.objects.filter(pk=otp.pk, is_used=False).update(
+            is_used=True,
+            verified_at=timezone.now(),
+        )
+        return VERIFIED if consumed else INVALID
+
+    def is_verified(self, email):
+        since = timezone.now() - timezone.timedelta(seconds=self.verified_ttl_seconds)
+        return self.model.objects.filter(email=self.normalize_email(email), verified_at__gte=since).exists()
+
+    def clear(self, email):
+        self.model.objects.filter(email=self.normalize_email(email)).delete()
+
+    def purge(self):
+        now = timezone.now()
+        deleted, _ = self.model.objects.filter(
+            Q(verified_at__isnull=True, expires_at__lt=now) |
+            Q(verified_at__lt=now - timezone.timedelta(seconds=self.verified_ttl_seconds))
+        ).delete()
+        return deleted
+
+
+@lru_cache(maxsize=None)
+def get_otp_store():
+    """Return the configured OTP store (one instance per process)"""
+    options = dict(getattr(settings, 'OTP_STORE', {}))
+    backend = options.pop('BACKEND', 'authentication.otp_store.DatabaseOTPStore')
+    return import_string(backend)(**{key.lower(): value for key, value in options.items()})
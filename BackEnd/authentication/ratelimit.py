@@ -0,0 +1,225 @@
+# authentication/ratelimit.py
+"""
+Sliding-window rate limiting for the unauthenticated auth endpoints.
+
+Counters live in the shared cache (Redis in production), so every node behind
+Nginx spends from the same budget. Each rule keeps one counter per fixed
+window and estimates the sliding window as
+
+    previous_window * (1 - elapsed_fraction) + current_window
+
+which costs O(1) memory and cache work per key. A check increments the
+current windows first and judges the values ``incr`` returns, so concurrent
+bursts cannot all pass on the same stale read; a rejected hit is taken back
+off the counters. A throttled request costs a few cache round trips and no
+DB or SMTP work.
+
+Rules are configured per scope in ``settings.RATE_LIMITS``. Enforcement comes
+from ``RateLimitMiddleware`` (scopes picked by URL name through
+``settings.RATE_LIMIT_VIEWS``) or from ``SlidingWindowThrottle`` on a DRF view
+with ``throttle_scope``. A request checked by the middleware is not counted
+again by the throttle.
+"""
+import hashlib
+import json
+import math
+import re
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import JsonResponse
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+RATE_RE = re.compile(r'^\s*(\d+)\s*/\s*(\d*)\s*([smhd])[a-z]*\s*$')
+
+
+def parse_rate(rate):
+    """'10/h' -> (10, 3600); '10/15m' -> (10, 900)"""
+    match = RATE_RE.match(rate)
+    if not match:
+        raise ValueError(f"Invalid rate {rate!r}")
+    limit, multiplier, unit = match.groups()
+    return int(limit), int(multiplier or 1) * PERIODS[unit]
+
+
+def client_ip(request):
+    """
+    Client address. X-Forwarded-For is only trusted when
+    REST_FRAMEWORK['NUM_PROXIES'] says how many proxies set it; otherwise a
+    client could pick a fresh address (and budget) per request.
+    """
+    xff = request.META.get('HTTP_X_FORWARDED_FOR')
+    remote_addr = request.META.get('REMOTE_ADDR')
+    num_proxies = getattr(settings, 'REST_FRAMEWORK', {}).get('NUM_PROXIES')
+
+    if not num_proxies or xff is None:
+        return remote_addr
+    addrs = xff.split(',')
+    return addrs[-min(num_proxies, len(addrs))].strip()
+
+
+class RateLimitExceeded(Exception):
+    def __init__(self, scope, retry_after):
+        super().__init__(f"Rate limit exceeded for {scope}")
+        self.scope = scope
+        self.retry_after = retry_after
+
+
+class SlidingWindowLimiter:
+    def __init__(self, rules=None, cache_alias=None):
+        rules = getattr(settings, 'RATE_LIMITS', {}) if rules is None else rules
+        self.rules = {
+            scope: {key_type: parse_rate(rate) for key_type, rate in scope_rules.items()}
+            for scope, scope_rules in rules.items()
+        }
+        self.cache = caches[cache_alias or getattr(settings, 'RATE_LIMIT_CACHE', 'default')]
+
+    @staticmethod
+    def _digest(value):
+        return hashlib.blake2b(value.encode(), digest_size=8).hexdigest()
+
+    def _keys(self, scope, key_type, ident, window, now):
+        index = int(now // window)
+        base = f"rl:{scope}:{key_type}:{self._digest(ident)}"
+        return f"{base}:{index - 1}", f"{base}:{index}", (now % window) / window
+
+    def check(self, scope, idents, now=None):
+        """
+        Count one hit against every rule of ``scope`` whose key is present in
+        ``idents`` (e.g. {'ip': '1.2.3.4', 'email': 'a@b.c'}). Raises
+        RateLimitExceeded, with the hit taken back off, if any rule is over budget.
+        """
+        rules = self.rules.get(scope)
+        if not rules:
+            return
+        now = time.time() if now is None else now
+
+        plan = []
+        for key_type, (limit, window) in rules.items():
+            ident = idents.get(key_type)
+            if ident:
+                previous_key, current_key, elapsed = self._keys(scope, key_type, ident, window, now)
+                plan.append((limit, window, previous_key, current_key, elapsed))
+        if not plan:
+            return
+
+        # Count first: each concurrent hit gets its own value back from incr
+        previous_counts = self.cache.get_many([entry[2] for entry in plan])
+        counted = []
+        retry_after = None
+        for limit, window, previous_key, current_key, elapsed in plan:
+            current = self._incr(current_key, window)
+            counted.append(current_key)
+            previous = previous_counts.get(previous_key, 0)
+            if previous * (1 - elapsed) + current > limit:
+                retry_after = max(retry_after or 0, self._retry_after(limit, window, previous, current - 1, elapsed))
+
+        if retry_after is not None:
+            # A rejected hit does not spend budget
+            for key in counted:
+                try:
+                    self.cache.decr(key)
+                except ValueError:
+                    pass
+            raise RateLimitExceeded(scope, retry_after)
+
+    def _incr(self, key, window):
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            # First hit in this window; the counter must outlive the next window too
+            if self.cache.add(key, 1, timeout=2 * window):
+                return 1
+            return self.cache.incr(key)
+
+    @staticmethod
+    def _retry_after(limit, window, previous, current, elapsed):
+        remaining = window * (1 - elapsed)
+        if current + 1 > limit or not previous:
+            # Wait for the next window, where the current count becomes the (decaying) previous one
+            return max(1, math.ceil(remaining))
+        # Within this window the previous count decays linearly
+        needed_elapsed = 1 - (limit - current - 1) / previous
+        return max(1, math.ceil((needed_elapsed - elapsed) * window))
+
+
+_limiter = None
+
+
+def get_limiter():
+    global _limiter
+    if _limiter is None:
+        _limiter = SlidingWindowLimiter()
+    return _limiter
+
+
+def request_idents(request, data=None):
+    idents = {'ip': client_ip(request)}
+    email = (data or {}).get('email')
+    if isinstance(email, str) and email.strip():
+        idents['email'] = email.strip().lower()
+    return idents
+
+
+def throttled_response(exc):
+    return JsonResponse(
+        {"detail": f"Request was throttled. Expected available in {exc.retry_after} seconds."},
+        status=429,
+        headers={'Retry-After': str(exc.retry_after)},
+    )
+
+
+class RateLimitMiddleware:
+    """Rejects over-budget requests to the scopes in RATE_LIMIT_VIEWS before the view runs"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.views = getattr(settings, 'RATE_LIMIT_VIEWS', {})
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        match = request.resolver_match
+        scope = self.views.get(match.url_name) if match else None
+        if scope is None or request.method != 'POST':
+            return None
+
+        data = None
+        if request.content_type == 'application/json':
+            try:
+                data = json.loads(request.body or b'{}')
+            except ValueError:
+                data = None
+        elif request.content_type in ('application/x-www-form-urlencoded', 'multipart/form-data'):
+            data = request.POST
+        if not hasattr(data, 'get'):
+            data = None
+
+        try:
+            get_limiter().check(scope, request_idents(request, data))
+        except RateLimitExceeded as exc:
+            return throttled_response(exc)
+
+        request._rate_limit_checked = scope
+        return None
+
+
+class SlidingWindowThrottle(BaseThrottle):
+    """DRF throttle for views that set ``throttle_scope``"""
+
+    def allow_request(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        if scope is None or getattr(request._request, '_rate_limit_checked', None) == scope:
+            return True
+        try:
+            get_limiter().check(scope, request_idents(request, request.data))
+        except RateLimitExceeded as exc:
+            self.retry_after = exc.retry_after
+            return False
+        return True
+
+    def wait(self):
+        return getattr(self, 'retry_after', None)
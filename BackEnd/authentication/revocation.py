@@ -0,0 +1,147 @@
+# authentication/revocation.py
+"""
+Refresh-token revocation keyed by ``jti``.
+
+RevokedToken is the authoritative list; each row lives until the token it
+revokes would have expired anyway. Every process keeps a Bloom filter of the
+revoked jtis in front of it, so the common case, a token that was never
+revoked, is answered from memory. Only Bloom hits (real revocations plus the
+configured false positive rate) touch the database.
+
+Each process pulls revocations made on other nodes every SYNC_SECONDS, and
+once every COMPACT_SECONDS it deletes expired rows and rebuilds its filter
+without them. The filter is sized for the revocations expected over one
+REFRESH_TOKEN_LIFETIME, since no entry outlives that.
+"""
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import RevokedToken
+
+REVOCATION_DEFAULTS = {
+    'EXPECTED_REVOCATIONS_PER_DAY': 20000,
+    'FALSE_POSITIVE_RATE': 0.001,
+    'SYNC_SECONDS': 5,
+    'COMPACT_SECONDS': 3600,
+}
+
+# Re-read a little before the last seen revocation so rows from transactions
+# that committed out of order are not missed; re-adding to a Bloom filter is harmless
+SYNC_OVERLAP = timezone.timedelta(seconds=30)
+
+
+def revocation_setting(name):
+    return getattr(settings, 'TOKEN_REVOCATION', {}).get(name, REVOCATION_DEFAULTS[name])
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate):
+        self.capacity = max(int(capacity), 1)
+        self.error_rate = error_rate
+        self.size = max(8, int(math.ceil(-self.capacity * math.log(error_rate) / (math.log(2) ** 2))))
+        self.hash_count = max(1, int(round(self.size / self.capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hash_count)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class RevocationStore:
+    def __init__(self):
+        lifetime_days = settings.SIMPLE_JWT['REFRESH_TOKEN_LIFETIME'].total_seconds() / 86400
+        self.capacity = max(1, math.ceil(revocation_setting('EXPECTED_REVOCATIONS_PER_DAY') * max(lifetime_days, 1)))
+        self.error_rate = revocation_setting('FALSE_POSITIVE_RATE')
+        self.sync_seconds = revocation_setting('SYNC_SECONDS')
+        self.compact_seconds = revocation_setting('COMPACT_SECONDS')
+        self.bloom = None
+        self._high_water = None
+        self._synced_at = 0.0
+        self._compacted_at = 0.0
+        self._lock = threading.Lock()
+
+    def _rebuild(self):
+        now = timezone.now()
+        rows = RevokedToken.objects.filter(expires_at__gt=now).values_list('jti', flat=True)
+        # Grow instead of degrading when revocations outpace the estimate
+        bloom = BloomFilter(max(self.capacity, rows.count() * 2), self.error_rate)
+        for jti in rows.iterator(chunk_size=5000):
+            bloom.add(jti)
+        self.bloom = bloom
+        self._high_water = now
+
+    def _sync(self):
+        since = self._high_water - SYNC_OVERLAP
+        for jti, revoked_at in RevokedToken.objects.filter(revoked_at__gt=since).values_list('jti', 'revoked_at'):
+            self.bloom.add(jti)
+            self._high_water = max(self._high_water, revoked_at)
+
+    def _compact(self):
+        deleted, _ = RevokedToken.objects.filter(expires_at__lte=timezone.now()).delete()
+        self._rebuild()
+        self._synced_at = self._compacted_at = time.monotonic()
+        return deleted
+
+    def compact(self):
+        """Delete expired rows and rebuild the filter without them. Returns rows deleted."""
+        with self._lock:
+            return self._compact()
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self.bloom is not None and now - self._synced_at < self.sync_seconds:
+            return
+        with self._lock:
+            if self.bloom is None or now - self._compacted_at >= self.compact_seconds:
+                self._compact()
+            elif now - self._synced_at >= self.sync_seconds:
+                self._sync()
+                self._synced_at = now
+
+    def is_revoked(self, jti):
+        self._refresh()
+        if jti not in self.bloom:
+            return False
+        # Bloom hit: confirm against the authoritative list
+        return RevokedToken.objects.filter(jti=jti, expires_at__gt=timezone.now()).exists()
+
+    def revoke(self, jti, exp):
+        """Revoke ``jti`` until ``exp`` (unix timestamp). Returns False if it was already revoked."""
+        self._refresh()
+        expires_at = datetime.fromtimestamp(exp, tz=dt_timezone.utc)
+        try:
+            with transaction.atomic():
+                RevokedToken.objects.create(jti=jti, expires_at=expires_at)
+        except IntegrityError:
+            return False
+        with self._lock:
+            self.bloom.add(jti)
+        return True
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_revocation_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = RevocationStore()
+        return _store
@@ -1,7 +1,13 @@
 from rest_framework import serializers
 from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
-from .models import User, OTPVerification
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from .models import User
+from .otp_store import get_otp_store, VERIFIED, EXPIRED
+from .revocation import get_revocation_store
+from .user_cache import VERSION_CLAIM, token_version, user_cache
 
 class SendOTPSerializer(serializers.Serializer):
     email = serializers.EmailField()
@@ -20,17 +26,10 @@ class VerifyOTPSerializer(serializers.Serializer):
         email = data.get('email')
         otp = data.get('otp')
         
-        try:    
-            otp_record = OTPVerification.objects.filter(
-                email=email,
-                otp_code=otp,
-                is_used=False
-            ).latest('created_at')
-            
-            if otp_record.is_expired():
-                raise serializers.ValidationError("OTP has expired.")
-                
-        except OTPVerification.DoesNotExist:
+        result = get_otp_store().verify(email, otp)
+        if result == EXPIRED:
+            raise serializers.ValidationError("OTP has expired.")
+        if result != VERIFIED:
             raise serializers.ValidationError("Invalid OTP.")
         
         return data
@@ -50,7 +49,7 @@ class CompleteSignupSerializer(serializers.ModelSerializer):
     
     def validate_email(self, value):
         # Check if OTP was verified for this email
-        if not OTPVerification.objects.filter(email=value, is_used=True).exists():
+        if not get_otp_store().is_verified(value):
             raise serializers.ValidationError("Email not verified. Please verify your email first.")
         return value
     
@@ -88,4 +87,43 @@ class LoginSerializer(serializers.Serializer):
             raise serializers.ValidationError("Invalid email or password.")
         
         data['user'] = user
-        return data
\ No newline at end of file
+        return data
+
+class RevocableTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    token/refresh/ with rotation enforced by authentication.revocation instead
+    of simplejwt's token_blacklist app. The revocation check is served from the
+    in-memory Bloom filter, and the user from the JWT user cache.
+    """
+    
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+        jti = refresh[jwt_settings.JTI_CLAIM]
+        store = get_revocation_store()
+        
+        if store.is_revoked(jti):
+            raise InvalidToken("Token has been revoked.")
+        
+        user_id = refresh.payload.get(jwt_settings.USER_ID_CLAIM)
+        if user_id:
+            try:
+                user = user_cache.get(user_id) or user_cache.load(user_id)
+            except User.DoesNotExist:
+                user = None
+            version = refresh.payload.get(VERSION_CLAIM)
+            if not jwt_settings.USER_AUTHENTICATION_RULE(user) or (version and token_version(user) != version):
+                raise AuthenticationFailed(self.error_messages["no_active_account"], "no_active_account")
+        
+        data = {"access": str(refresh.access_token)}
+        
+        if jwt_settings.ROTATE_REFRESH_TOKENS:
+            # Revoking is the atomic step: of two concurrent refreshes with the same token only one wins
+            if jwt_settings.BLACKLIST_AFTER_ROTATION and not store.revoke(jti, refresh["exp"]):
+                raise InvalidToken("Token has been revoked.")
+            
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data["refresh"] = str(refresh)
+        
+        return data
@@ -0,0 +1,34 @@
+# authentication/signals.py
+import copy
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import User
+from .user_cache import forget, user_cache
+
+
+@receiver(post_save, sender=User)
+def refresh_cached_user(sender, instance, update_fields=None, **kwargs):
+    """Keep the JWT user caches in step with saved users, once the save commits"""
+    user_id = instance.pk
+    partial = instance.get_deferred_fields() or getattr(instance, '_token_claims_only', False)
+    saved = None if partial else copy.copy(instance)
+
+    def refresh():
+        version = forget(user_id)
+        if saved is None:
+            # Partial instance; reload lazily on the next request
+            user_cache.evict(user_id)
+        else:
+            # Cache the new state so tokens carrying an outdated version claim are rejected
+            user_cache.put(saved, version)
+    transaction.on_commit(refresh)
+
+
+@receiver(post_delete, sender=User)
+def evict_deleted_user(sender, instance, **kwargs):
+    user_id = instance.pk
+    user_cache.evict(user_id)
+    transaction.on_commit(lambda: forget(user_id))
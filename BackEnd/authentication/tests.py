@@ -1,4 +1,118 @@
+from django.core.cache import cache
 from django.test import TestCase
+from rest_framework.test import APIClient
 
-# Create your tests here.
-    
\ No newline at end of file
+from .models import User
+from .otp_store import EXPIRED, INVALID, VERIFIED, CacheOTPStore, DatabaseOTPStore
+from .user_cache import user_cache
+from .views import CustomTokenObtainPairSerializer
+
+
+class OTPStoreTests:
+    """Run against every store by mixing into a TestCase that defines make_store()"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_verify_consumes_the_code(self):
+        store = self.make_store()
+        code = store.issue('Someone@Example.com')
+        self.assertFalse(store.is_verified('someone@example.com'))
+        self.assertEqual(store.verify('someone@example.com', code), VERIFIED)
+        self.assertTrue(store.is_verified('SOMEONE@example.com'))
+        # A code works once
+        self.assertEqual(store.verify('someone@example.com', code), INVALID)
+
+    def test_wrong_code_is_invalid(self):
+        store = self.make_store()
+        code = store.issue('someone@example.com')
+        wrong = '0' * len(code) if code != '0' * len(code) else '1' * len(code)
+        self.assertEqual(store.verify('someone@example.com', wrong), INVALID)
+        self.assertEqual(store.verify('other@example.com', code), INVALID)
+        self.assertFalse(store.is_verified('someone@example.com'))
+
+    def test_reissue_replaces_the_old_code(self):
+        store = self.make_store()
+        old = store.issue('someone@example.com')
+        new = store.issue('someone@example.com')
+        if old != new:
+            self.assertEqual(store.verify('someone@example.com', old), INVALID)
+        self.assertEqual(store.verify('someone@example.com', new), VERIFIED)
+
+    def test_expired_code(self):
+        store = self.make_store(ttl_seconds=-1)
+        code = store.issue('someone@example.com')
+        self.assertEqual(store.verify('someone@example.com', code), EXPIRED)
+        self.assertFalse(store.is_verified('someone@example.com'))
+
+    def test_clear_forgets_verification(self):
+        store = self.make_store()
+        store.verify('someone@example.com', store.issue('someone@example.com'))
+        store.clear('someone@example.com')
+        self.assertFalse(store.is_verified('someone@example.com'))
+
+
+class DatabaseOTPStoreTests(OTPStoreTests, TestCase):
+    def make_store(self, **options):
+        return DatabaseOTPStore(**options)
+
+
+class CacheOTPStoreTests(OTPStoreTests, TestCase):
+    def make_store(self, **options):
+        return CacheOTPStore(key_prefix='otp-test', **options)
+
+
+class RefreshTokenTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        # Per-process; the test transaction rolls back without its on-commit refresh
+        user_cache.clear()
+        self.user = User.objects.create_user(email='patient@example.com', password='a-long-password',
+                                             first_name='Pat', last_name='Ient', user_type='patient')
+        self.client = APIClient()
+
+    def refresh(self, token):
+        return self.client.post('/api/v1/auth/token/refresh/', {'refresh': token}, format='json')
+
+    def test_rotated_refresh_token_cannot_be_replayed(self):
+        token = str(CustomTokenObtainPairSerializer.get_token(self.user))
+        first = self.refresh(token)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('access', first.data)
+        self.assertEqual(self.refresh(token).status_code, 401)
+        # The rotated token is still good, once
+        self.assertEqual(self.refresh(first.data['refresh']).status_code, 200)
+
+    def test_refresh_rejected_after_password_change(self):
+        token = str(CustomTokenObtainPairSerializer.get_token(self.user))
+        self.user.set_password('another-long-password')
+        self.user.save()
+        self.assertEqual(self.refresh(token).status_code, 401)
+
+
+class RateLimitTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def send_otp(self, email, **extra):
+        return self.client.post('/api/v1/auth/send-otp/', {'email': email}, format='json', **extra)
+
+    def test_per_email_limit(self):
+        # RATE_LIMITS['send-otp']: 5 per email per hour
+        for _ in range(5):
+            self.assertEqual(self.send_otp('someone@example.com').status_code, 200)
+        response = self.send_otp('someone@example.com')
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+        # Other addresses have their own budget
+        self.assertEqual(self.send_otp('other@example.com').status_code, 200)
+
+    def test_per_ip_limit_ignores_forwarded_for(self):
+        # RATE_LIMITS['send-otp']: 10 per IP per hour; without NUM_PROXIES a new
+        # X-Forwarded-For value must not buy a fresh budget
+        for i in range(10):
+            response = self.send_otp(f"user{i}@example.com", HTTP_X_FORWARDED_FOR=f"10.0.0.{i}")
+            self.assertEqual(response.status_code, 200)
+        response = self.send_otp('user10@example.com', HTTP_X_FORWARDED_FOR='10.0.0.10')
+        self.assertEqual(response.status_code, 429)
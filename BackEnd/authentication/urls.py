@@ -9,6 +9,7 @@ urlpatterns = [
     path('verify-otp/', views.VerifyOTPView.as_view(), name='verify_otp'),
     path('complete-signup/', views.CompleteSignupView.as_view(), name='complete_signup'),
     path('login/', views.LoginView.as_view(), name='login'),
+    path('login/async/', views.async_login, name='login_async'),
     path('token/', views.CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     
@@ -0,0 +1,132 @@
+# authentication/user_cache.py
+"""
+Per-process LRU of full User objects for JWT request authentication.
+
+Two shared-cache keys per user keep every process in step. The
+post_save/post_delete handlers in ``authentication.signals`` update both
+once the change commits (``forget``):
+
+- a version counter. Each cached copy remembers the version it was loaded
+  at and re-checks it at most every JWT_USER_VERSION_CHECK_SECONDS, so an
+  edit made by another process is picked up within that interval.
+- the user's ``token_version``, set whenever a process loads the user and
+  deleted on every change. ClaimsJWTAuthentication only trusts a token's
+  claims (is_active included) while it matches the token's version claim;
+  otherwise the user is loaded from the database.
+
+Entries are also checked against the token's version claim, so a password,
+role, email or is_active change makes older tokens fail everywhere within
+the check interval. Writes that bypass signals (``QuerySet.update``) are
+only seen once the copy falls out of the LRU, or for claims-only users once
+the token_version key expires (the cache's default timeout).
+"""
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+# Claim added to every token by CustomTokenObtainPairSerializer.get_token
+VERSION_CLAIM = 'ver'
+
+
+def token_version(user):
+    """Short digest of the fields that must invalidate outstanding tokens when they change"""
+    raw = f"{user.pk}:{user.password}:{user.email}:{user.user_type}:{user.is_active}"
+    return hashlib.sha256(raw.encode()).hexdigest()[:16]
+
+
+def version_key(user_id):
+    return f"jwt_user:version:{user_id}"
+
+
+def token_key(user_id):
+    return f"jwt_user:token:{user_id}"
+
+
+def bump_version(user_id):
+    key = version_key(user_id)
+    if cache.add(key, 1, None):
+        return 1
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+        return 1
+
+
+def forget(user_id):
+    """After a user changes: other processes reload their copies and stop trusting token claims. Returns the new version."""
+    cache.delete(token_key(user_id))
+    return bump_version(user_id)
+
+
+def shared_token_version(user_id):
+    """The user's token_version as last loaded by any process, or None"""
+    return cache.get(token_key(user_id))
+
+
+class UserCache:
+    def __init__(self, max_size=10000, version_check_seconds=5):
+        self.max_size = max_size
+        self.version_check_seconds = version_check_seconds
+        # user_id -> [user, shared version when loaded, monotonic time of the last check]
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is None:
+                return None
+            self._users.move_to_end(user_id)
+            user, version, checked_at = entry
+        now = time.monotonic()
+        if now - checked_at >= self.version_check_seconds:
+            if cache.get(version_key(user_id)) != version:
+                # Changed in another process since we loaded it
+                self.evict(user_id)
+                return None
+            entry[2] = now
+        return user
+
+    def put(self, user, version=None):
+        # Keep a private copy so request code mutating request.user cannot touch the cache
+        user = copy.copy(user)
+        if version is None:
+            version = cache.get(version_key(user.pk))
+        with self._lock:
+            self._users[user.pk] = [user, version, time.monotonic()]
+            self._users.move_to_end(user.pk)
+            while len(self._users) > self.max_size:
+                self._users.popitem(last=False)
+
+    def evict(self, user_id):
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+
+    def load(self, user_id):
+        """Fetch the full user from the database and cache it. Raises User.DoesNotExist."""
+        from .models import User
+        # Read the version first: a change committed after it is caught by the next check
+        version = cache.get(version_key(user_id))
+        user = User.objects.get(pk=user_id)
+        self.put(user, version)
+        cache.set(token_key(user_id), token_version(user))
+        return user
+
+    def __len__(self):
+        return len(self._users)
+
+
+user_cache = UserCache(
+    max_size=getattr(settings, 'JWT_USER_CACHE_SIZE', 10000),
+    version_check_seconds=getattr(settings, 'JWT_USER_VERSION_CHECK_SECONDS', 5),
+)
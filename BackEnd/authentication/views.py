@@ -6,54 +6,31 @@ from rest_framework.permissions import AllowAny
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.decorators import api_view, permission_classes
 from .serializers import LoginSerializer
 from django.utils import timezone
 from django.db import transaction
-from django.core.mail import send_mail
-from django.conf import settings
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from datetime import datetime
-import random
-import string
+import json
+import logging
 
 from addresses.models import Address, CityMunicipality, Province
 from addresses.serializers import AddressCreateSerializer
-from .models import OTPVerification, User
+from .hashing import LoginQueueFull, amake_password, averify_password
+from .models import User, send_otp
+from .otp_store import get_otp_store, VERIFIED, EXPIRED
+from .ratelimit import SlidingWindowThrottle
+from .user_cache import VERSION_CLAIM, token_version
 
-def send_otp(email):
-    """
-    Send OTP to the given email address
-    """
-    try:
-        # Invalidate old OTPs for this email
-        OTPVerification.objects.filter(email=email, is_used=False).update(is_used=True)
-        
-        # Generate a new OTP
-        otp_code = OTPVerification.generate_otp()
-        otp = OTPVerification.objects.create(
-            email=email,
-            otp_code=otp_code,
-            expires_at=timezone.now() + timezone.timedelta(minutes=10)
-        )
-        
-        # Send OTP via email
-        send_mail(
-            subject="Your OTP Code - BukCare",
-            message=f"Your OTP code is {otp_code}. It will expire in 10 minutes.",
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[email],
-            fail_silently=False,
-        )
-        
-        return otp
-        
-    except Exception as e:
-        print(f"Error in send_otp function: {str(e)}")
-        raise e
+logger = logging.getLogger(__name__)
 
 class SendOTPView(APIView):
     permission_classes = [AllowAny] 
+    throttle_classes = [SlidingWindowThrottle]
+    throttle_scope = 'send-otp'
     
     def post(self, request):
         email = request.data.get("email")
@@ -66,36 +43,19 @@ class SendOTPView(APIView):
             return Response({"error": "User with this email already exists"}, status=status.HTTP_400_BAD_REQUEST)
         
         try:
-            # Generate OTP code
-            otp_code = ''.join(random.choices(string.digits, k=6))
-            
-            # Invalidate old OTPs for this email
-            OTPVerification.objects.filter(email=email, is_used=False).update(is_used=True)
-            
-            # Create new OTP record
-            otp_record = OTPVerification.objects.create(
-                email=email,
-                otp_code=otp_code,
-                expires_at=timezone.now() + timezone.timedelta(minutes=10)
-            )
-            
-            # Send OTP via email
-            send_mail(
-                subject="Your OTP Code - BukCare",
-                message=f"Your OTP code is {otp_code}. It will expire in 10 minutes.",
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[email],
-                fail_silently=False,
-            )
-            
+            # Store the OTP and queue its email; the outbox workers deliver it
+            send_otp(email)
+
             return Response({"message": "OTP sent successfully"}, status=status.HTTP_200_OK)
             
         except Exception as e:
-            print(f"Email sending error: {str(e)}")
+            logger.error(f"OTP issue error: {str(e)}")
             return Response({"error": "Failed to send OTP"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 class VerifyOTPView(APIView):
     permission_classes = [AllowAny] 
+    throttle_classes = [SlidingWindowThrottle]
+    throttle_scope = 'verify-otp'
     
     def post(self, request):
         email = request.data.get("email")
@@ -104,22 +64,12 @@ class VerifyOTPView(APIView):
         if not email or not otp_code:
             return Response({"error": "Email and OTP are required"}, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            otp = OTPVerification.objects.filter(
-                email=email,
-                otp_code=otp_code,
-                is_used=False
-            ).latest("created_at")
-        except OTPVerification.DoesNotExist:
-            return Response({"error": "Invalid OTP"}, status=status.HTTP_400_BAD_REQUEST)
+        result = get_otp_store().verify(email, otp_code)
 
-        # Check expiration
-        if otp.is_expired():
+        if result == EXPIRED:
             return Response({"error": "OTP expired"}, status=status.HTTP_400_BAD_REQUEST)
-
-        # Mark as used
-        otp.is_used = True
-        otp.save()
+        if result != VERIFIED:
+            return Response({"error": "Invalid OTP"}, status=status.HTTP_400_BAD_REQUEST)
 
         return Response({"message": "OTP verified successfully"}, status=status.HTTP_200_OK)
 
@@ -174,7 +124,7 @@ class CompleteSignupView(APIView):
                 }, status=status.HTTP_400_BAD_REQUEST)
             
             # Rest of validation (OTP check, user exists check, etc.)
-            if not OTPVerification.objects.filter(email=email, is_used=True).exists():
+            if not get_otp_store().is_verified(email):
                 return Response({
                     "error": "Email not verified. Please verify your email first."
                 }, status=status.HTTP_400_BAD_REQUEST)
@@ -213,7 +163,7 @@ class CompleteSignupView(APIView):
                 )
                 
                 # Invalidate all OTP records
-                OTPVerification.objects.filter(email=email).update(is_used=True)
+                get_otp_store().clear(email)
                 
             return Response({
                 "message": "Patient account created successfully",
@@ -230,32 +180,78 @@ class CompleteSignupView(APIView):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def login_response_data(user, refresh):
+    """Tokens plus the user summary returned by every login endpoint"""
+    return {
+        "refresh": str(refresh),
+        "access": str(refresh.access_token),
+        "user": {
+            "id": user.id,
+            "email": user.email,
+            "first_name": user.first_name,
+            "middle_name": user.middle_name,
+            "last_name": user.last_name,
+            "user_type": user.user_type,
+            "is_email_verified": user.is_email_verified,
+            "full_name": user.get_full_name(),
+        }
+    }
+
 class LoginView(APIView):
     permission_classes = [AllowAny]
+    throttle_classes = [SlidingWindowThrottle]
+    throttle_scope = 'login'
     
     def post(self, request):
         serializer = LoginSerializer(data=request.data)
         if serializer.is_valid():
             user = serializer.validated_data["user"]
-            refresh = RefreshToken.for_user(user)
+            refresh = CustomTokenObtainPairSerializer.get_token(user)
             
             # Return user data along with tokens
-            return Response({
-                "refresh": str(refresh),
-                "access": str(refresh.access_token),
-                "user": {
-                    "id": user.id,
-                    "email": user.email,
-                    "first_name": user.first_name,
-                    "middle_name": user.middle_name,
-                    "last_name": user.last_name,
-                    "user_type": user.user_type,
-                    "is_email_verified": user.is_email_verified,
-                    "full_name": user.get_full_name(),
-                }
-            }, status=status.HTTP_200_OK)
+            return Response(login_response_data(user, refresh), status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+@csrf_exempt
+@require_POST
+async def async_login(request):
+    """
+    Login for ASGI deployments. Same contract as LoginView, but the password
+    check runs in the bounded hashing executor so a login burst queues there
+    instead of blocking the event loop.
+    """
+    try:
+        data = json.loads(request.body or b"{}")
+    except ValueError:
+        return JsonResponse({"error": "Invalid JSON body"}, status=status.HTTP_400_BAD_REQUEST)
+
+    email = data.get("email")
+    password = data.get("password")
+    errors = {field: ["This field is required."] for field in ("email", "password") if not data.get(field)}
+    if errors:
+        return JsonResponse(errors, status=status.HTTP_400_BAD_REQUEST)
+
+    user = await User.objects.filter(email=email).afirst()
+    try:
+        # Unknown users still cost one hash so timing does not leak account existence
+        is_correct, must_update = await averify_password(password, user.password if user else None)
+        if user and is_correct and must_update:
+            # Upgrade the stored hash to the preferred PASSWORD_HASHERS entry
+            user.password = await amake_password(password)
+            await User.objects.filter(pk=user.pk).aupdate(password=user.password)
+    except LoginQueueFull:
+        return JsonResponse(
+            {"error": "Too many login attempts right now. Please try again shortly."},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            headers={"Retry-After": "1"},
+        )
+
+    if not (user and is_correct and user.is_active):
+        return JsonResponse({"non_field_errors": ["Invalid email or password."]}, status=status.HTTP_400_BAD_REQUEST)
+
+    refresh = CustomTokenObtainPairSerializer.get_token(user)
+    return JsonResponse(login_response_data(user, refresh), status=status.HTTP_200_OK)
+
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     @classmethod
     def get_token(cls, user):
@@ -264,6 +260,8 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         token['email'] = user.email
         token['user_type'] = user.user_type
         token['user_id'] = user.id
+        # Lets ClaimsJWTAuthentication spot tokens issued before a password/role/status change
+        token[VERSION_CLAIM] = token_version(user)
         return token
 
     def validate(self, attrs):
@@ -285,6 +283,8 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
 
 class CustomTokenObtainPairView(TokenObtainPairView):
     permission_classes = (permissions.AllowAny,)
+    throttle_classes = [SlidingWindowThrottle]
+    throttle_scope = 'login'
     serializer_class = CustomTokenObtainPairSerializer
 
 # Add a user profile endpoint to get current user data
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('addresses', '0002_unique_location_names'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Specialization',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('description', models.TextField(blank=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Doctor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('license_number', models.CharField(max_length=50, unique=True)),
+                ('consultation_fee', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('is_available', models.BooleanField(default=True)),
+                ('clinic_address', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='addresses.address')),
+                ('user', models.OneToOneField(limit_choices_to={'user_type': 'doctor'}, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                ('specialization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='doctor.specialization')),
+            ],
+        ),
+    ]
@@ -1,22 +1,49 @@
-# # doctors/models.py
-# from django.db import models
-# from authentication.models import User
-# from addresses.models import Address
+# doctor/models.py
+from django.db import models
+from authentication.models import User
+from addresses.models import Address
 
-# class Specialization(models.Model):
-#     name = models.CharField(max_length=100)
-#     description = models.TextField(blank=True)
+class Specialization(models.Model):
+    name = models.CharField(max_length=100)
+    description = models.TextField(blank=True)
     
-#     def __str__(self):
-#         return self.name
+    def __str__(self):
+        return self.name
 
-# class Doctor(models.Model):
-#     user = models.OneToOneField(User, on_delete=models.CASCADE, limit_choices_to={'user_type': 'doctor'})
-#     specialization = models.ForeignKey(Specialization, on_delete=models.CASCADE)
-#     license_number = models.CharField(max_length=50, unique=True)
-#     clinic_address = models.ForeignKey(Address, on_delete=models.SET_NULL, null=True, blank=True)
-#     consultation_fee = models.DecimalField(max_digits=10, decimal_places=2)
-#     is_available = models.BooleanField(default=True)
+class Doctor(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE, limit_choices_to={'user_type': 'doctor'})
+    specialization = models.ForeignKey(Specialization, on_delete=models.CASCADE)
+    license_number = models.CharField(max_length=50, unique=True)
+    clinic_address = models.ForeignKey(Address, on_delete=models.SET_NULL, null=True, blank=True)
+    consultation_fee = models.DecimalField(max_digits=10, decimal_places=2)
+    is_available = models.BooleanField(default=True)
     
-#     def __str__(self):
-#         return f"Dr. {self.user.get_full_name()}"
\ No newline at end of file
+    def __str__(self):
+        return f"Dr. {self.user.get_full_name()}"
+
+class WorkingHours(models.Model):
+    WEEKDAY_CHOICES = [
+        (0, 'Monday'),
+        (1, 'Tuesday'),
+        (2, 'Wednesday'),
+        (3, 'Thursday'),
+        (4, 'Friday'),
+        (5, 'Saturday'),
+        (6, 'Sunday'),
+    ]
+    
+    # A weekday may have several blocks (e.g. morning and afternoon clinics)
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='working_hours')
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAY_CHOICES)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    
+    class Meta:
+        ordering = ['doctor', 'weekday', 'start_time']
+        constraints = [
+            models.CheckConstraint(condition=models.Q(end_time__gt=models.F('start_time')),
+                                   name='working_hours_end_after_start'),
+        ]
+    
+    def __str__(self):
+        return f"{self.doctor} {self.get_weekday_display()} {self.start_time}-{self.end_time}"
@@ -0,0 +1,233 @@
+# management/activity_log.py
+"""
+Write-behind logging of SystemActivity rows.
+
+``log_activity()`` appends the event to a bounded in-process buffer once
+the caller's transaction commits, and a background thread writes the
+buffer with ``bulk_create`` when BATCH_SIZE events are waiting or every
+FLUSH_SECONDS, whichever comes first. The buffer is flushed at worker
+exit. When the buffer is full new events are dropped and counted rather
+than blocking the request.
+
+An event is stamped with ``created_at`` when it is handed over at commit,
+but from a buffer it reaches the table up to FLUSH_SECONDS later, so rows
+do not arrive in created_at order across processes. The feed therefore
+only shows rows older than SETTLE_SECONDS (see management.activity_feed);
+a poller's cursor can then never pass an event still waiting in a buffer.
+Events held back longer than that, by a failed flush, can still be missed.
+
+MODE 'sync' writes each event immediately (tests, management commands).
+``stats()`` reports this process's buffer depth and the drop/failure
+counts of every process (kept in the shared cache); dashboard_stats shows
+them.
+"""
+import atexit
+import logging
+import os
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, close_old_connections, transaction
+from django.utils import timezone
+
+from .models import SystemActivity
+
+logger = logging.getLogger(__name__)
+
+ACTIVITY_LOG_DEFAULTS = {
+    'MODE': 'buffered',
+    'BUFFER_SIZE': 10000,
+    'BATCH_SIZE': 500,
+    'FLUSH_SECONDS': 1.0,
+    # Feed rows younger than this may still be overtaken by buffered events; keep it above FLUSH_SECONDS
+    'SETTLE_SECONDS': 5.0,
+}
+
+DROPPED_KEY = 'activity_log:dropped'
+FAILED_FLUSHES_KEY = 'activity_log:failed_flushes'
+
+
+def activity_log_setting(name):
+    return getattr(settings, 'ACTIVITY_LOG', {}).get(name, ACTIVITY_LOG_DEFAULTS[name])
+
+
+def add_shared(key, delta):
+    """Add to a process-wide total in the shared cache; never raises, the flusher must keep running"""
+    try:
+        if not cache.add(key, delta, None):
+            cache.incr(key, delta)
+    except ValueError:
+        cache.set(key, delta, None)
+    except Exception as e:
+        logger.warning(f"Could not record {key} in the cache: {str(e)}")
+
+
+class ActivityBuffer:
+    def __init__(self, capacity, batch_size, flush_seconds):
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.events = deque()
+        self.condition = threading.Condition()
+        self.flush_lock = threading.Lock()
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed_flushes = 0
+        self.last_flush_at = None
+        self._reported_drops = 0
+        self._reported_failures = 0
+        self._thread = None
+        self._stopping = False
+
+    def put(self, activity):
+        with self.condition:
+            if len(self.events) >= self.capacity:
+                self.dropped += 1
+                return False
+            self.events.append(activity)
+            self.enqueued += 1
+            if self._thread is None:
+                self._start()
+            if len(self.events) >= self.batch_size:
+                self.condition.notify()
+        return True
+
+    def _start(self):
+        self._thread = threading.Thread(target=self._run, name='activity-log-flusher', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                if not self._stopping and len(self.events) < self.batch_size:
+                    self.condition.wait(self.flush_seconds)
+                stopping = self._stopping
+            self.flush()
+            close_old_connections()
+            if stopping:
+                return
+
+    def flush(self):
+        """Write everything buffered so far. Returns the number of rows written."""
+        with self.flush_lock:
+            written = 0
+            while True:
+                with self.condition:
+                    batch = [self.events.popleft() for _ in range(min(self.batch_size, len(self.events)))]
+                if not batch:
+                    break
+                try:
+                    SystemActivity.objects.bulk_create(batch)
+                except DatabaseError as e:
+                    self.failed_flushes += 1
+                    logger.error(f"Failed to write {len(batch)} activities: {str(e)}")
+                    self._requeue(batch)
+                    break
+                written += len(batch)
+            self.written += written
+            self.last_flush_at = timezone.now()
+
+        dropped, failed = self.dropped, self.failed_flushes
+        if dropped > self._reported_drops:
+            logger.warning(f"Activity log buffer full: dropped {dropped - self._reported_drops} events")
+            add_shared(DROPPED_KEY, dropped - self._reported_drops)
+            self._reported_drops = dropped
+        if failed > self._reported_failures:
+            add_shared(FAILED_FLUSHES_KEY, failed - self._reported_failures)
+            self._reported_failures = failed
+        return written
+
+    def _requeue(self, batch):
+        """Put a failed batch back in front for the next flush, dropping what no longer fits"""
+        with self.condition:
+            room = max(self.capacity - len(self.events), 0)
+            self.dropped += max(len(batch) - room, 0)
+            self.events.extendleft(reversed(batch[:room]))
+
+    def stop(self, timeout=10):
+        """Flush and stop the flusher thread (worker exit)"""
+        with self.condition:
+            self._stopping = True
+            self.condition.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        else:
+            self.flush()
+
+    def stats(self):
+        with self.condition:
+            depth = len(self.events)
+        return {
+            'mode': 'buffered',
+            'depth': depth,
+            'capacity': self.capacity,
+            'enqueued': self.enqueued,
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed_flushes': self.failed_flushes,
+            'last_flush_at': self.last_flush_at,
+        }
+
+
+_buffer = None
+_buffer_pid = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    """This process's buffer; a forked worker gets a fresh one"""
+    global _buffer, _buffer_pid
+    with _buffer_lock:
+        if _buffer is None or _buffer_pid != os.getpid():
+            _buffer = ActivityBuffer(
+                capacity=activity_log_setting('BUFFER_SIZE'),
+                batch_size=activity_log_setting('BATCH_SIZE'),
+                flush_seconds=activity_log_setting('FLUSH_SECONDS'),
+            )
+            _buffer_pid = os.getpid()
+            atexit.register(_buffer.stop)
+        return _buffer
+
+
+def log_activity(activity_type, description, user=None, metadata=None):
+    """Record a SystemActivity once the current transaction commits"""
+    activity = SystemActivity(
+        activity_type=activity_type,
+        description=description,
+        user_id=getattr(user, 'pk', user),
+        metadata=metadata or {},
+        created_at=timezone.now(),
+    )
+    sync = activity_log_setting('MODE') == 'sync'
+
+    def commit():
+        # Stamped at hand-over so a long transaction cannot push a row behind the feed's settle window
+        activity.created_at = timezone.now()
+        if sync:
+            activity.save()
+        else:
+            get_buffer().put(activity)
+
+    transaction.on_commit(commit)
+    return activity
+
+
+def flush():
+    """Write buffered activities now (tests, before reading the feed in scripts)"""
+    return get_buffer().flush() if _buffer is not None else 0
+
+
+def stats():
+    """This process's buffer, plus drops and failed flushes summed over every process"""
+    shared = cache.get_many([DROPPED_KEY, FAILED_FLUSHES_KEY])
+    totals = {
+        'dropped_total': shared.get(DROPPED_KEY, 0),
+        'failed_flushes_total': shared.get(FAILED_FLUSHES_KEY, 0),
+    }
+    if activity_log_setting('MODE') == 'sync':
+        return {'mode': 'sync', **totals}
+    return {**get_buffer().stats(), **totals}
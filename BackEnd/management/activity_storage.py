@@ -0,0 +1,239 @@
+# management/activity_storage.py
+"""
+Storage lifecycle for SystemActivity.
+
+On PostgreSQL the table is range-partitioned by month on created_at
+(migration 0006). ``ensure_partitions()`` creates the current and next
+MONTHS_AHEAD monthly partitions; anything outside them lands in the
+DEFAULT partition, and creating a partition later moves its rows out of it.
+
+``rollup()`` aggregates counts per day, activity type and user into
+ActivityRollup; ``daily_summary()`` reads those and only counts raw rows
+for days the last rollup has not covered yet.
+
+``apply_retention()`` keeps KEEP_MONTHS whole months of raw activity. Older
+partitions are rolled up, optionally archived to ARCHIVE_DIR as gzipped
+COPY output, then detached and dropped in one transaction. Other databases delete the old rows
+instead.
+
+All three run from ``manage.py maintain_activity_storage``.
+"""
+import gzip
+import logging
+import os
+import re
+from datetime import date, datetime, time, timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Max, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import ActivityRollup, SystemActivity
+
+logger = logging.getLogger(__name__)
+
+ACTIVITY_STORAGE_DEFAULTS = {
+    'MONTHS_AHEAD': 3,
+    'KEEP_MONTHS': 12,
+    'ARCHIVE_DIR': None,
+}
+
+PARENT = SystemActivity._meta.db_table
+DEFAULT_PARTITION = f"{PARENT}_default"
+PARTITION_RE = re.compile(rf"^{PARENT}_p(\d{{4}})(\d{{2}})$")
+
+
+def storage_setting(name):
+    return getattr(settings, 'ACTIVITY_STORAGE', {}).get(name, ACTIVITY_STORAGE_DEFAULTS[name])
+
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_bounds(month):
+    """[start, end) of a month as aware datetimes in the current timezone"""
+    start = timezone.make_aware(datetime.combine(month, time.min))
+    return start, timezone.make_aware(datetime.combine(add_months(month, 1), time.min))
+
+
+def partition_name(month):
+    return f"{PARENT}_p{month:%Y%m}"
+
+
+def is_partitioned():
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = %s",
+            [PARENT],
+        )
+        return cursor.fetchone() is not None
+
+
+def existing_partitions():
+    """Months that have their own partition, oldest first"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = %s",
+            [PARENT],
+        )
+        months = []
+        for (name,) in cursor.fetchall():
+            match = PARTITION_RE.match(name)
+            if match:
+                months.append(date(int(match.group(1)), int(match.group(2)), 1))
+    return sorted(months)
+
+
+def create_partition(month):
+    """Create and attach one monthly partition, moving any of its rows out of the DEFAULT partition"""
+    name = partition_name(month)
+    start, end = month_bounds(month)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'CREATE TABLE "{name}" (LIKE "{PARENT}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+        cursor.execute(
+            f'WITH moved AS (DELETE FROM "{DEFAULT_PARTITION}" WHERE created_at >= %s AND created_at < %s RETURNING *) '
+            f'INSERT INTO "{name}" SELECT * FROM moved',
+            [start, end],
+        )
+        cursor.execute(f'ALTER TABLE "{PARENT}" ATTACH PARTITION "{name}" FOR VALUES FROM (%s) TO (%s)', [start, end])
+    logger.info(f"Created activity partition {name}")
+
+
+def ensure_partitions(months_ahead=None):
+    """Create missing partitions for this month and the next ``months_ahead``. Returns months created."""
+    if not is_partitioned():
+        return []
+    months_ahead = storage_setting('MONTHS_AHEAD') if months_ahead is None else months_ahead
+    existing = set(existing_partitions())
+    current = month_start(timezone.localdate())
+    created = []
+    for offset in range(months_ahead + 1):
+        month = add_months(current, offset)
+        if month not in existing:
+            create_partition(month)
+            created.append(month)
+    return created
+
+
+def rollup(since=None, until=None):
+    """
+    Recompute ActivityRollup for the days in [since, until). By default this
+    starts the day before the newest rolled-up day, which catches late writes,
+    and runs through today. Returns the number of rollup rows written.
+    """
+    if since is None:
+        latest = ActivityRollup.objects.aggregate(latest=Max('day'))['latest']
+        since = latest - timedelta(days=1) if latest else None
+    until = until or timezone.localdate() + timedelta(days=1)
+
+    activities = SystemActivity.objects.filter(created_at__lt=timezone.make_aware(datetime.combine(until, time.min)))
+    if since is not None:
+        activities = activities.filter(created_at__gte=timezone.make_aware(datetime.combine(since, time.min)))
+    rows = (
+        activities.annotate(day=TruncDate('created_at'))
+        .values('day', 'activity_type', 'user_id')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+
+    with transaction.atomic():
+        stale = ActivityRollup.objects.filter(day__lt=until)
+        if since is not None:
+            stale = stale.filter(day__gte=since)
+        stale.delete()
+        created = ActivityRollup.objects.bulk_create(
+            [ActivityRollup(day=row['day'], activity_type=row['activity_type'], user_id=row['user_id'],
+                            count=row['count']) for row in rows.iterator(chunk_size=5000)],
+            batch_size=5000,
+        )
+    return len(created)
+
+
+def archive_partition(name, archive_dir):
+    path = os.path.join(archive_dir, f"{name}.csv.gz")
+    os.makedirs(archive_dir, exist_ok=True)
+    try:
+        with gzip.open(path, 'wb') as archive, connection.cursor() as cursor:
+            cursor.copy_expert(f'COPY "{name}" TO STDOUT WITH (FORMAT csv, HEADER)', archive)
+    except Exception:
+        # Leave no truncated archive behind for the retry
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    return path
+
+
+def apply_retention(keep_months=None, archive_dir=None):
+    """Roll up and remove raw activity older than ``keep_months`` whole months. Returns what was removed."""
+    keep_months = storage_setting('KEEP_MONTHS') if keep_months is None else keep_months
+    archive_dir = archive_dir or storage_setting('ARCHIVE_DIR')
+    cutoff = add_months(month_start(timezone.localdate()), -keep_months)
+    cutoff_at = month_bounds(cutoff)[0]
+
+    # Make sure the rollups cover everything about to go
+    oldest = SystemActivity.objects.filter(created_at__lt=cutoff_at).order_by('created_at').first()
+    if oldest is not None:
+        rollup(since=timezone.localdate(oldest.created_at), until=cutoff)
+
+    if not is_partitioned():
+        deleted, _ = SystemActivity.objects.filter(created_at__lt=cutoff_at).delete()
+        return {'deleted_rows': deleted}
+
+    removed = []
+    for month in existing_partitions():
+        if month >= cutoff:
+            break
+        name = partition_name(month)
+        # Archive while still attached: if the COPY fails, the rows stay visible
+        # through the parent and the next run tries again
+        if archive_dir:
+            logger.info(f"Archived {name} to {archive_partition(name, archive_dir)}")
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'ALTER TABLE "{PARENT}" DETACH PARTITION "{name}"')
+            cursor.execute(f'DROP TABLE "{name}"')
+        removed.append(name)
+
+    # Old rows that landed in the DEFAULT partition are rolled up already
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM "{DEFAULT_PARTITION}" WHERE created_at < %s', [cutoff_at])
+        stray = cursor.rowcount
+    return {'dropped_partitions': removed, 'deleted_rows': stray}
+
+
+def daily_summary(days=30, activity_type=None):
+    """Counts per day and activity type for the last ``days`` days, from rollups"""
+    since = timezone.localdate() - timedelta(days=days - 1)
+    rollups = ActivityRollup.objects.filter(day__gte=since)
+    if activity_type:
+        rollups = rollups.filter(activity_type=activity_type)
+    # The newest rolled-up day was probably still in progress, so it and any
+    # later days are counted live; normally that is just today
+    latest = ActivityRollup.objects.aggregate(latest=Max('day'))['latest']
+    live_since = max(since, latest) if latest else since
+    summary = {
+        (row['day'], row['activity_type']): row['total']
+        for row in rollups.filter(day__lt=live_since).values('day', 'activity_type').annotate(total=Sum('count')).order_by()
+    }
+
+    live = SystemActivity.objects.filter(created_at__gte=timezone.make_aware(datetime.combine(live_since, time.min)))
+    if activity_type:
+        live = live.filter(activity_type=activity_type)
+    for row in live.annotate(day=TruncDate('created_at')).values('day', 'activity_type').annotate(total=Count('id')).order_by():
+        summary[(row['day'], row['activity_type'])] = row['total']
+
+    return [
+        {'day': day, 'activity_type': kind, 'count': total}
+        for (day, kind), total in sorted(summary.items())
+    ]
@@ -0,0 +1,103 @@
+# management/counters.py
+"""
+Dashboard statistics kept in the DashboardCounter table.
+
+Writes adjust a counter with an ``F()`` increment inside the transaction
+that changed the counted row (see management.signals), so a rollback
+undoes both. ``dashboard_stats`` then reads every counter with one
+primary-key scan of a table of a few rows instead of a COUNT(*) per
+statistic.
+
+``reconcile()`` recounts everything from the source tables and fixes any
+drift (raw SQL, ``QuerySet.update()``, rows written before the counters
+existed). Run it periodically with ``manage.py reconcile_dashboard_counters``.
+Active sessions expire by time rather than by a write, so that counter is
+only refreshed by reconciliation.
+"""
+import logging
+
+from django.apps import apps
+from django.contrib.sessions.models import Session
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from authentication.models import User
+from .models import DashboardCounter, UserInvitation
+
+logger = logging.getLogger(__name__)
+
+APPOINTMENTS = 'appointments'
+ACTIVE_SESSIONS = 'sessions:active'
+
+
+def user_key(user_type):
+    return f"users:{user_type}"
+
+
+def invitation_key(status):
+    return f"invitations:{status}"
+
+
+ALL_KEYS = (
+    [user_key(user_type) for user_type, _ in User.USER_TYPE_CHOICES]
+    + [invitation_key(status) for status, _ in UserInvitation.STATUS_CHOICES]
+    + [APPOINTMENTS, ACTIVE_SESSIONS]
+)
+
+
+def appointment_model():
+    try:
+        return apps.get_model('appointment', 'Appointment')
+    except LookupError:
+        return None
+
+
+def increment(key, delta=1):
+    if not delta:
+        return
+    updated = DashboardCounter.objects.filter(key=key).update(value=F('value') + delta, updated_at=timezone.now())
+    if not updated:
+        # First write for this key; the next reconcile corrects any race on creation
+        DashboardCounter.objects.get_or_create(key=key, defaults={'value': max(delta, 0)})
+
+
+def read_counters():
+    """All counters in one query; keys without a row read as 0"""
+    values = dict.fromkeys(ALL_KEYS, 0)
+    values.update(DashboardCounter.objects.values_list('key', 'value'))
+    return values
+
+
+def true_counts():
+    counts = dict.fromkeys(ALL_KEYS, 0)
+    for user_type, total in User.objects.values_list('user_type').annotate(total=Count('id')).order_by():
+        counts[user_key(user_type)] = total
+    for status, total in UserInvitation.objects.values_list('status').annotate(total=Count('id')).order_by():
+        counts[invitation_key(status)] = total
+    appointment = appointment_model()
+    if appointment is not None:
+        counts[APPOINTMENTS] = appointment.objects.exclude(status='held').count()
+    counts[ACTIVE_SESSIONS] = Session.objects.filter(expire_date__gte=timezone.now()).count()
+    return counts
+
+
+def reconcile():
+    """Recount from the source tables and overwrite drifted counters. Returns {key: (old, new)}."""
+    for key in ALL_KEYS:
+        DashboardCounter.objects.get_or_create(key=key)
+
+    with transaction.atomic():
+        # Lock first, then count: increments committed while we wait are
+        # included in the count, later ones queue behind our update
+        stored = dict(DashboardCounter.objects.select_for_update().values_list('key', 'value'))
+        counts = true_counts()
+        drift = {key: (stored.get(key, 0), value) for key, value in counts.items() if stored.get(key, 0) != value}
+        now = timezone.now()
+        for key, (_, value) in drift.items():
+            DashboardCounter.objects.filter(key=key).update(value=value, updated_at=now)
+
+    for key, (old, new) in drift.items():
+        if key != ACTIVE_SESSIONS:
+            logger.warning(f"Dashboard counter {key} drifted: {old} -> {new}")
+    return drift
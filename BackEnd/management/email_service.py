@@ -1,43 +1,53 @@
 # management/email_service.py
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
 from django.conf import settings
-from django.urls import reverse
 import logging
 
+from notification.compose import MessageTemplate, send_batch
+
 logger = logging.getLogger(__name__)
 
+SITE_NAME = 'BukCare'
+
+# Role is the static part of an invitation; the address and link vary per message
+INVITATION_EMAIL = MessageTemplate(
+    'emails/invitation',
+    "You're invited to join {site_name} as a {role_title}",
+    variables=('email', 'invitation_url'),
+)
+WELCOME_EMAIL = MessageTemplate('emails/welcome', "Welcome to {site_name}!", variables=('name',))
+
 class EmailService:
+    @staticmethod
+    def invitation_context(invitation):
+        return {
+            'site_name': SITE_NAME,
+            'role_title': invitation.role.title(),
+            'expires_in_days': 7,
+            'email': invitation.email,
+            'invitation_url': f"{settings.FRONTEND_URL}/invitation/{invitation.id}/",
+        }
+
+    @staticmethod
+    def render_invitation_email(invitation):
+        """Return (subject, plain_message, html_message) for an invitation"""
+        return INVITATION_EMAIL.render(EmailService.invitation_context(invitation))
+
+    @staticmethod
+    def send_invitation_emails(invitations):
+        """Send invitation emails over one SMTP connection; returns the number sent"""
+        messages = [
+            INVITATION_EMAIL.build(invitation.email, EmailService.invitation_context(invitation))
+            for invitation in invitations
+        ]
+        sent = send_batch(messages)
+        logger.info(f"Sent {sent} invitation emails")
+        return sent
+
     @staticmethod
     def send_invitation_email(invitation):
         """Send invitation email to the user"""
         try:
-            # Create invitation link
-            invitation_url = f"{settings.FRONTEND_URL}/invitation/{invitation.id}/"
-            
-            # Email context
-            context = {
-                'invitation': invitation,
-                'invitation_url': invitation_url,
-                'site_name': 'BukCare',
-                'expires_in_days': 1,
-            }
-            
-            # Render email templates
-            subject = f"You're invited to join BukCare as a {invitation.role.title()}"
-            html_message = render_to_string('emails/invitation.html', context)
-            plain_message = render_to_string('emails/invitation.txt', context)
-            
-            # Send email
-            send_mail(
-                subject=subject,
-                message=plain_message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[invitation.email],
-                html_message=html_message,
-                fail_silently=False,
-            )
-            
+            EmailService.send_invitation_emails([invitation])
             logger.info(f"Invitation email sent to {invitation.email}")
             return True
             
@@ -50,27 +60,15 @@ class EmailService:
         """Send welcome email after user accepts invitation"""
         try:
             context = {
-                'user': user,
-                'site_name': 'BukCare',
+                'site_name': SITE_NAME,
                 'login_url': f"{settings.FRONTEND_URL}/login/",
+                'name': user.get_full_name(),
             }
-            
-            subject = "Welcome to BukCare!"
-            html_message = render_to_string('emails/welcome.html', context)
-            plain_message = render_to_string('emails/welcome.txt', context)
-            
-            send_mail(
-                subject=subject,
-                message=plain_message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[user.email],
-                html_message=html_message,
-                fail_silently=False,
-            )
+            send_batch([WELCOME_EMAIL.build(user.email, context)])
             
             logger.info(f"Welcome email sent to {user.email}")
             return True
             
         except Exception as e:
             logger.error(f"Failed to send welcome email to {user.email}: {str(e)}")
-            return False
\ No newline at end of file
+            return False
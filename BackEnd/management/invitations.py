@@ -0,0 +1,113 @@
+# management/invitations.py
+"""
+Batch invitations.
+
+``invite_many()`` checks every address against existing users and existing
+invitations with one query each, creates the new invitations with a single
+``bulk_create`` (re-opening expired ones for the same role), and queues
+their emails in the notification outbox in the same transaction. The
+outbox workers deliver them over long-lived SMTP connections, so the
+request never waits on the relay.
+"""
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from authentication.models import User
+from notification.outbox import enqueue_emails
+
+from . import counters
+from .email_service import EmailService
+from .models import UserInvitation
+
+MAX_BATCH = 500
+
+# Per-address outcomes
+INVITED = 'invited'
+REINVITED = 'reinvited'
+INVALID = 'invalid_email'
+DUPLICATE = 'duplicate'
+USER_EXISTS = 'user_exists'
+ALREADY_INVITED = 'already_invited'
+
+
+def invite_many(emails, role, invited_by):
+    """Invite every address in ``emails`` as ``role``. Returns one {'email', 'status'[, 'invitation']} per input."""
+    results = []
+    candidates = {}
+    for raw in emails:
+        email = User.objects.normalize_email(str(raw).strip())
+        result = {'email': email, 'status': None}
+        results.append(result)
+        try:
+            validate_email(email)
+        except ValidationError:
+            result['status'] = INVALID
+            continue
+        if email.lower() in candidates:
+            result['status'] = DUPLICATE
+            continue
+        candidates[email.lower()] = result
+
+    if not candidates:
+        return results
+
+    # Addresses are matched case-insensitively: Foo@x.com and foo@x.com are one person
+    keys = list(candidates)
+    registered = {
+        email.lower()
+        for email in User.objects.alias(email_lower=Lower('email')).filter(email_lower__in=keys)
+        .values_list('email', flat=True)
+    }
+    existing = {}
+    matching = UserInvitation.objects.alias(email_lower=Lower('email')).filter(email_lower__in=keys)
+    for invitation in matching.only('id', 'email', 'role', 'status'):
+        existing.setdefault(invitation.email.lower(), []).append(invitation)
+
+    expires_at = timezone.now() + timezone.timedelta(days=7)
+    new, reopened, reopened_from = [], [], {}
+    for key, result in candidates.items():
+        if key in registered:
+            result['status'] = USER_EXISTS
+            continue
+        invitations = existing.get(key, [])
+        if any(invitation.status == 'pending' for invitation in invitations):
+            result['status'] = ALREADY_INVITED
+            continue
+        same_role = next((invitation for invitation in invitations if invitation.role == role), None)
+        if same_role is not None:
+            # (email, role) is unique, so an expired invitation is re-opened instead
+            reopened_from[same_role.status] = reopened_from.get(same_role.status, 0) + 1
+            same_role.email = result['email']
+            reopened.append(same_role)
+            result['status'] = REINVITED
+            result['invitation'] = str(same_role.pk)
+            continue
+        invitation = UserInvitation(email=result['email'], role=role, invited_by=invited_by, expires_at=expires_at)
+        new.append(invitation)
+        result['status'] = INVITED
+        result['invitation'] = str(invitation.pk)
+
+    invitations = new + reopened
+    if not invitations:
+        return results
+
+    # Render before writing so a template error leaves nothing behind
+    messages = [(invitation.email, *EmailService.render_invitation_email(invitation)) for invitation in invitations]
+
+    with transaction.atomic():
+        UserInvitation.objects.bulk_create(new)
+        if reopened:
+            UserInvitation.objects.filter(pk__in=[invitation.pk for invitation in reopened]).update(
+                status='pending', invited_by=invited_by, expires_at=expires_at, accepted_at=None, accepted_by=None,
+            )
+        enqueue_emails(messages, category='invitation')
+
+        # Neither bulk_create nor update() sends the signals that keep the counters
+        counters.increment(counters.invitation_key('pending'), len(invitations))
+        for old_status, count in reopened_from.items():
+            counters.increment(counters.invitation_key(old_status), -count)
+
+    return results
@@ -0,0 +1,71 @@
+# management/jobs.py
+"""
+Maintenance jobs run by management.scheduler.
+
+Each job is set-based (one UPDATE or DELETE per table, never a loop over
+rows) and returns a dict of rows touched per kind.
+"""
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.db import transaction
+from django.utils import timezone
+
+from appointment import booking
+from notification import unread
+from authentication.otp_store import get_otp_store
+from . import activity_storage, counters
+from .models import UserInvitation
+
+DATABASE_SESSION_ENGINES = ('django.contrib.sessions.backends.db', 'django.contrib.sessions.backends.cached_db')
+
+
+def expire_invitations():
+    """Flip pending invitations past expires_at to 'expired'"""
+    with transaction.atomic():
+        expired = UserInvitation.objects.filter(status='pending', expires_at__lt=timezone.now()).update(status='expired')
+        # update() sends no signals, so move the dashboard counts here
+        counters.increment(counters.invitation_key('pending'), -expired)
+        counters.increment(counters.invitation_key('expired'), expired)
+    return {'invitations_expired': expired}
+
+
+def purge_otps():
+    """Delete used and expired OTP state"""
+    return {'otps_purged': get_otp_store().purge()}
+
+
+def clear_sessions():
+    """Delete expired sessions"""
+    if settings.SESSION_ENGINE in DATABASE_SESSION_ENGINES:
+        deleted, _ = Session.objects.filter(expire_date__lt=timezone.now()).delete()
+        return {'sessions_deleted': deleted}
+    # Cache and signed-cookie sessions expire on their own
+    import_module(settings.SESSION_ENGINE).SessionStore.clear_expired()
+    return {'sessions_deleted': 0}
+
+
+def release_expired_holds():
+    """Delete slot holds that lapsed without being confirmed"""
+    return {'holds_released': booking.release_expired_holds()}
+
+
+def reconcile_dashboard_counters():
+    return {'counters_corrected': len(counters.reconcile())}
+
+
+def reconcile_unread_counters():
+    return {'unread_counters_corrected': len(unread.reconcile())}
+
+
+def maintain_activity_storage():
+    created = activity_storage.ensure_partitions()
+    rolled_up = activity_storage.rollup()
+    removed = activity_storage.apply_retention()
+    return {
+        'partitions_created': len(created),
+        'rollup_rows': rolled_up,
+        'partitions_dropped': len(removed.get('dropped_partitions', [])),
+        'activities_deleted': removed['deleted_rows'],
+    }
@@ -0,0 +1,144 @@
+import random
+import resource
+import statistics
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from authentication.models import User
+from management.user_search import NGramIndex, NGramUserSearch, PostgresUserSearch
+
+FIRST_NAMES = [
+    'Juan', 'Maria', 'Jose', 'Ana', 'Mark', 'Kristine', 'John Paul', 'Angelica', 'Carlo', 'Princess',
+    'Miguel', 'Andrea', 'Rafael', 'Camille', 'Paolo', 'Patricia', 'Gabriel', 'Nicole', 'Joshua', 'Bea',
+]
+LAST_NAMES = [
+    'Dela Cruz', 'Santos', 'Reyes', 'Garcia', 'Mendoza', 'Bautista', 'Ocampo', 'Villanueva', 'Ramos', 'Aquino',
+    'Castillo', 'Rivera', 'Flores', 'Gonzales', 'Torres', 'Navarro', 'Soriano', 'Pascual', 'Manalo', 'Dizon',
+]
+ROLES = ['patient'] * 17 + ['doctor', 'staff', 'admin']
+
+
+def synthetic_users(count, seed=7):
+    """(first, middle, last, email, role) rows with realistic name collisions"""
+    rng = random.Random(seed)
+    for i in range(count):
+        first = rng.choice(FIRST_NAMES)
+        last = rng.choice(LAST_NAMES)
+        middle = rng.choice(LAST_NAMES) if rng.random() < 0.6 else None
+        email = f"{first}.{last}{i}".lower().replace(' ', '') + "@bench.invalid"
+        yield first, middle, last, email, rng.choice(ROLES)
+
+
+class Command(BaseCommand):
+    help = "Benchmark user search over synthetic users (in-memory n-gram index, or PostgreSQL with --backend postgres)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1_000_000)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--backend', choices=['memory', 'postgres'], default='memory')
+        parser.add_argument('--populate', action='store_true', help="Insert the synthetic users first (postgres)")
+        parser.add_argument('--cleanup', action='store_true', help="Delete the synthetic users afterwards (postgres)")
+
+    def handle(self, *args, **options):
+        rng = random.Random(11)
+        queries = []
+        for _ in range(options['queries']):
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            queries.append(rng.choice([
+                first[:3],                                # typeahead
+                f"{first} {last}",                        # full name
+                last[:-1] + 'x',                          # typo
+                f"{first}.{last}{rng.randrange(options['users'])}".lower().replace(' ', ''),  # email
+            ]))
+
+        if options['backend'] == 'memory':
+            search = self.memory_backend(options['users'])
+        else:
+            search = self.postgres_backend(options)
+
+        first_page, third_page = [], []
+        for query in queries:
+            started = time.perf_counter()
+            users, cursor = search.search(query, limit=10)
+            first_page.append((time.perf_counter() - started) * 1000)
+            for _ in range(2):
+                if cursor:
+                    started = time.perf_counter()
+                    users, cursor = search.search(query, cursor=cursor, limit=10)
+            if cursor:
+                third_page.append((time.perf_counter() - started) * 1000)
+
+        self.report("first page", first_page)
+        self.report("third page", third_page)
+
+        if options['backend'] == 'postgres':
+            legacy = []
+            for query in queries[:50]:
+                started = time.perf_counter()
+                list(User.objects.filter(
+                    Q(first_name__icontains=query) | Q(last_name__icontains=query) | Q(email__icontains=query)
+                )[:10])
+                legacy.append((time.perf_counter() - started) * 1000)
+            self.report("old icontains", legacy)
+            if options['cleanup']:
+                deleted, _ = User.objects.filter(email__endswith='@bench.invalid').delete()
+                self.stdout.write(f"Deleted {deleted} synthetic users")
+
+    def memory_backend(self, count):
+        index = NGramIndex()
+        started = time.perf_counter()
+        for user_id, (first, middle, last, email, role) in enumerate(synthetic_users(count), start=1):
+            index.add(user_id, NGramIndex.document(first, middle, last, email), role)
+        self.stdout.write(
+            f"Indexed {count} users in {time.perf_counter() - started:.1f}s, "
+            f"{len(index.postings)} trigrams, peak RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024}MB"
+        )
+
+        # Rank and page against the index alone; the per-page in_bulk fetch is left out
+        search = NGramUserSearch()
+        search.index = index
+        search._refresh = lambda: None
+
+        def page(text, after, limit, role):
+            return [_Hit(user_id, rank) for rank, user_id in index.search(text, after, limit, role, search.min_similarity)]
+        search.page = page
+        return search
+
+    def postgres_backend(self, options):
+        from django.db import connection
+        if connection.vendor != 'postgresql':
+            raise CommandError("--backend postgres needs a PostgreSQL database")
+        if options['populate']:
+            password = make_password(None)
+            batch = []
+            started = time.perf_counter()
+            for first, middle, last, email, role in synthetic_users(options['users']):
+                batch.append(User(email=email, password=password, first_name=first, middle_name=middle,
+                                  last_name=last, user_type=role))
+                if len(batch) == 10000:
+                    User.objects.bulk_create(batch)
+                    batch = []
+            if batch:
+                User.objects.bulk_create(batch)
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE authentication_user")
+            self.stdout.write(f"Inserted {options['users']} users in {time.perf_counter() - started:.1f}s")
+        return PostgresUserSearch()
+
+    def report(self, label, timings):
+        if not timings:
+            return
+        timings.sort()
+        self.stdout.write(
+            f"{label:>14}: {len(timings)} queries  p50 {statistics.median(timings):.2f}ms  "
+            f"p95 {timings[int(len(timings) * 0.95)]:.2f}ms  max {timings[-1]:.2f}ms"
+        )
+
+
+class _Hit:
+    def __init__(self, pk, search_rank):
+        self.pk = pk
+        self.search_rank = search_rank
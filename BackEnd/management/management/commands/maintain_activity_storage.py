@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from management import activity_storage
+
+
+class Command(BaseCommand):
+    help = "Create upcoming SystemActivity partitions, refresh activity rollups and apply retention (run daily from cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, help="Partitions to keep ready past this month")
+        parser.add_argument('--keep-months', type=int, help="Whole months of raw activity to keep")
+        parser.add_argument('--archive-dir', help="Write dropped partitions here as gzipped CSV")
+        parser.add_argument('--no-retention', action='store_true', help="Only create partitions and roll up")
+
+    def handle(self, *args, **options):
+        for month in activity_storage.ensure_partitions(options['months_ahead']):
+            self.stdout.write(f"Created partition {activity_storage.partition_name(month)}")
+
+        rows = activity_storage.rollup()
+        self.stdout.write(f"Rolled up activity into {rows} rows")
+
+        if not options['no_retention']:
+            removed = activity_storage.apply_retention(options['keep_months'], options['archive_dir'])
+            for name in removed.get('dropped_partitions', []):
+                self.stdout.write(f"Dropped partition {name}")
+            self.stdout.write(f"Deleted {removed['deleted_rows']} expired activities")
+
+        self.stdout.write(self.style.SUCCESS("Activity storage maintained"))
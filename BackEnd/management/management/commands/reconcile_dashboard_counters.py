@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from management.counters import reconcile
+
+
+class Command(BaseCommand):
+    help = "Recount dashboard statistics from the source tables and fix drifted counters (run from cron)"
+
+    def handle(self, *args, **options):
+        drift = reconcile()
+        for key, (old, new) in sorted(drift.items()):
+            self.stdout.write(f"{key}: {old} -> {new}")
+        self.stdout.write(self.style.SUCCESS(f"Reconciled dashboard counters ({len(drift)} corrected)"))
@@ -0,0 +1,54 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+
+from management.scheduler import configured_jobs, run_due_jobs, run_forever, run_job
+
+
+class Command(BaseCommand):
+    help = "Run scheduled maintenance jobs (invitation expiry, OTP and session purges, ...) until interrupted"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Run the jobs that are due, then exit (for cron)")
+        parser.add_argument('--job', action='append', help="Run this job now regardless of its schedule (repeatable)")
+        parser.add_argument('--list', action='store_true', help="List the configured jobs")
+
+    def handle(self, *args, **options):
+        jobs = configured_jobs()
+        if options['list']:
+            for name, (task, every) in jobs.items():
+                self.stdout.write(f"{name:<30} every {every:>6}s  {task}")
+            return
+
+        if options['job']:
+            for name in options['job']:
+                if name not in jobs:
+                    raise CommandError(f"Unknown maintenance job {name!r}")
+                run = run_job(name, jobs[name][0])
+                if run is None:
+                    self.stdout.write(f"{name}: running on another node, skipped")
+                else:
+                    self.report(run)
+            return
+
+        if options['once']:
+            for run in run_due_jobs():
+                self.report(run)
+            return
+
+        stopping = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+        self.stdout.write(f"Maintenance scheduler running {len(jobs)} jobs")
+        try:
+            run_forever(stopping, on_run=self.report)
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write("Maintenance scheduler stopped")
+
+    def report(self, run):
+        if run.succeeded:
+            details = ', '.join(f"{key}={value}" for key, value in run.details.items())
+            self.stdout.write(f"{run.job}: {run.rows} rows in {run.duration_ms}ms ({details})")
+        else:
+            self.stderr.write(f"{run.job}: failed after {run.duration_ms}ms: {run.error}")
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:29
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.utils import timezone
+
+
+def seed_counters(apps, schema_editor):
+    """Start the counters from the current row counts"""
+    User = apps.get_model('authentication', 'User')
+    UserInvitation = apps.get_model('management', 'UserInvitation')
+    Session = apps.get_model('sessions', 'Session')
+    DashboardCounter = apps.get_model('management', 'DashboardCounter')
+
+    counts = {f"users:{user_type}": 0 for user_type in ('admin', 'doctor', 'staff', 'patient')}
+    counts.update({f"invitations:{status}": 0 for status in ('pending', 'accepted', 'expired')})
+    for user_type, total in User.objects.values_list('user_type').annotate(total=Count('id')).order_by():
+        counts[f"users:{user_type}"] = total
+    for status, total in UserInvitation.objects.values_list('status').annotate(total=Count('id')).order_by():
+        counts[f"invitations:{status}"] = total
+    counts['appointments'] = 0
+    counts['sessions:active'] = Session.objects.filter(expire_date__gte=timezone.now()).count()
+
+    DashboardCounter.objects.bulk_create([DashboardCounter(key=key, value=value) for key, value in counts.items()])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('management', '0001_initial'),
+        ('authentication', '0004_user_search_index'),
+        ('sessions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardCounter',
+            fields=[
+                ('key', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('value', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(seed_counters, migrations.RunPython.noop),
+    ]
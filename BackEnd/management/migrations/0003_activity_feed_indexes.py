@@ -0,0 +1,27 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('management', '0002_dashboard_counter'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='systemactivity',
+            index=models.Index(fields=['-created_at', '-id'], name='activity_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='systemactivity',
+            index=models.Index(fields=['activity_type', '-created_at', '-id'], name='activity_type_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='systemactivity',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='activity_user_feed_idx'),
+        ),
+    ]
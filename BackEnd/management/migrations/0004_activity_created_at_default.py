@@ -0,0 +1,19 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:30
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('management', '0003_activity_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='systemactivity',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
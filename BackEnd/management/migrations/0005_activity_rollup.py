@@ -0,0 +1,29 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:32
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('management', '0004_activity_created_at_default'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('activity_type', models.CharField(choices=[('user_invited', 'User Invited'), ('user_registered', 'User Registered'), ('user_login', 'User Login'), ('appointment_created', 'Appointment Created'), ('appointment_cancelled', 'Appointment Cancelled')], max_length=30)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day', 'activity_type'], name='activity_rollup_day_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,134 @@
+from datetime import date, datetime, time
+
+from django.db import migrations
+from django.utils import timezone
+
+TABLE = 'management_systemactivity'
+SEQUENCE = f'{TABLE}_id_seq'
+COLUMNS = 'id, activity_type, description, created_at, metadata, user_id'
+
+# Kept in step with SystemActivity.Meta.indexes
+INDEXES = [
+    ('activity_feed_idx', 'created_at DESC, id DESC'),
+    ('activity_type_feed_idx', 'activity_type, created_at DESC, id DESC'),
+    ('activity_user_feed_idx', 'user_id, created_at DESC, id DESC'),
+]
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_start_at(month):
+    return timezone.make_aware(datetime.combine(month, time.min))
+
+
+def create_indexes(schema_editor):
+    for name, columns in INDEXES:
+        schema_editor.execute(f'CREATE INDEX "{name}" ON "{TABLE}" ({columns})')
+    schema_editor.execute(
+        f'ALTER TABLE "{TABLE}" ADD CONSTRAINT "{TABLE}_user_id_fk" FOREIGN KEY (user_id) '
+        'REFERENCES authentication_user (id) DEFERRABLE INITIALLY DEFERRED'
+    )
+
+
+def free_names(schema_editor, renamed):
+    """
+    Renaming a table keeps the names of its primary key and id sequence,
+    which the replacement table needs. Move them onto the renamed table.
+    """
+    schema_editor.execute(f'ALTER TABLE "{renamed}" RENAME CONSTRAINT "{TABLE}_pkey" TO "{renamed}_pkey"')
+    # An identity column's sequence cannot be renamed apart from it; the copy keeps the ids
+    schema_editor.execute(f'ALTER TABLE "{renamed}" ALTER COLUMN id DROP IDENTITY IF EXISTS')
+    # A serial column (tables created before identity columns) or the partitioned table's own sequence
+    schema_editor.execute(f'ALTER SEQUENCE IF EXISTS "{SEQUENCE}" RENAME TO "{renamed}_id_seq"')
+
+
+def partition_by_month(apps, schema_editor):
+    """
+    Rebuild SystemActivity as a table range-partitioned by month on
+    created_at (see management.activity_storage). The primary key becomes
+    (id, created_at) because a partitioned table's unique constraints must
+    include the partition key; ids still come from one sequence.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        # Other databases keep the plain table; retention deletes rows there
+        return
+    old = f'{TABLE}_unpartitioned'
+    schema_editor.execute(f'ALTER TABLE "{TABLE}" RENAME TO "{old}"')
+    free_names(schema_editor, old)
+    schema_editor.execute(f'CREATE SEQUENCE "{SEQUENCE}" AS bigint')
+    schema_editor.execute(f'''
+        CREATE TABLE "{TABLE}" (
+            id bigint NOT NULL DEFAULT nextval('"{SEQUENCE}"'),
+            activity_type varchar(30) NOT NULL,
+            description text NOT NULL,
+            created_at timestamp with time zone NOT NULL,
+            metadata jsonb NOT NULL,
+            user_id bigint NULL,
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    ''')
+    schema_editor.execute(f'ALTER SEQUENCE "{SEQUENCE}" OWNED BY "{TABLE}".id')
+    schema_editor.execute(f'CREATE TABLE "{TABLE}_default" PARTITION OF "{TABLE}" DEFAULT')
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'SELECT min(created_at) FROM "{old}"')
+        earliest = cursor.fetchone()[0]
+    today = timezone.localdate()
+    month = date(today.year, today.month, 1)
+    if earliest is not None:
+        earliest = timezone.localtime(earliest)
+        month = min(month, date(earliest.year, earliest.month, 1))
+    last = add_months(date(today.year, today.month, 1), 3)
+    while month <= last:
+        schema_editor.execute(
+            f'CREATE TABLE "{TABLE}_p{month:%Y%m}" PARTITION OF "{TABLE}" FOR VALUES FROM (%s) TO (%s)',
+            [month_start_at(month), month_start_at(add_months(month, 1))],
+        )
+        month = add_months(month, 1)
+
+    schema_editor.execute(f'INSERT INTO "{TABLE}" ({COLUMNS}) SELECT {COLUMNS} FROM "{old}"')
+    schema_editor.execute(
+        f'SELECT setval(\'"{SEQUENCE}"\', coalesce((SELECT max(id) FROM "{TABLE}"), 0) + 1, false)'
+    )
+    schema_editor.execute(f'DROP TABLE "{old}"')
+    create_indexes(schema_editor)
+
+
+def unpartition(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    partitioned = f'{TABLE}_partitioned'
+    schema_editor.execute(f'ALTER TABLE "{TABLE}" RENAME TO "{partitioned}"')
+    free_names(schema_editor, partitioned)
+    schema_editor.execute(f'''
+        CREATE TABLE "{TABLE}" (
+            id bigint NOT NULL GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+            activity_type varchar(30) NOT NULL,
+            description text NOT NULL,
+            created_at timestamp with time zone NOT NULL,
+            metadata jsonb NOT NULL,
+            user_id bigint NULL
+        )
+    ''')
+    schema_editor.execute(f'INSERT INTO "{TABLE}" ({COLUMNS}) SELECT {COLUMNS} FROM "{partitioned}"')
+    schema_editor.execute(
+        f"SELECT setval(pg_get_serial_sequence('\"{TABLE}\"', 'id'), "
+        f'coalesce((SELECT max(id) FROM "{TABLE}"), 0) + 1, false)'
+    )
+    schema_editor.execute(f'DROP TABLE "{partitioned}" CASCADE')
+    create_indexes(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('management', '0005_activity_rollup'),
+        ('authentication', '0004_user_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_by_month, unpartition),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:35
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('management', '0006_partition_system_activity'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userinvitation',
+            index=models.Index(fields=['status', '-created_at', '-id'], name='invitation_status_feed_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:41
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('management', '0007_invitation_status_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MaintenanceRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job', models.CharField(max_length=50)),
+                ('started_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('duration_ms', models.PositiveIntegerField(default=0)),
+                ('rows', models.BigIntegerField(default=0)),
+                ('succeeded', models.BooleanField(default=True)),
+                ('details', models.JSONField(blank=True, default=dict)),
+                ('error', models.TextField(blank=True)),
+            ],
+            options={
+                'ordering': ['-started_at'],
+                'indexes': [models.Index(fields=['job', '-started_at'], name='maintenance_run_job_idx')],
+            },
+        ),
+    ]
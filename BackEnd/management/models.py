@@ -40,6 +40,10 @@ class UserInvitation(models.Model):
     class Meta:
         unique_together = ['email', 'role']
         ordering = ['-created_at']
+        # Keyset pages of invitations by status (pending_invitations)
+        indexes = [
+            models.Index(fields=['status', '-created_at', '-id'], name='invitation_status_feed_idx'),
+        ]
     
     def __str__(self):
         return f"Invitation to {self.email} as {self.role}"
@@ -73,12 +77,71 @@ class SystemActivity(models.Model):
         null=True, blank=True
     )
     
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Set when the event happens, not when the write-behind logger flushes it
+    created_at = models.DateTimeField(default=timezone.now)
     metadata = models.JSONField(default=dict, blank=True)
     
+    # On PostgreSQL the table is partitioned by month on created_at (see management.activity_storage)
     class Meta:
         ordering = ['-created_at']
         verbose_name_plural = "System Activities"
+        # Keyset feed scans (see management.activity_feed), unfiltered and per filter
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='activity_feed_idx'),
+            models.Index(fields=['activity_type', '-created_at', '-id'], name='activity_type_feed_idx'),
+            models.Index(fields=['user', '-created_at', '-id'], name='activity_user_feed_idx'),
+        ]
     
     def __str__(self):
         return f"{self.activity_type} - {self.description[:50]}"
+
+
+class ActivityRollup(models.Model):
+    """SystemActivity counts per day, type and user, maintained by management.activity_storage"""
+    day = models.DateField()
+    activity_type = models.CharField(max_length=30, choices=SystemActivity.ACTIVITY_TYPES)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='+'
+    )
+    count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['day', 'activity_type'], name='activity_rollup_day_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.day} {self.activity_type} = {self.count}"
+
+
+class DashboardCounter(models.Model):
+    """One row per dashboard statistic, kept current by management.counters"""
+    key = models.CharField(max_length=50, primary_key=True)
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.key} = {self.value}"
+
+
+class MaintenanceRun(models.Model):
+    """One run of a scheduled maintenance job (see management.scheduler)"""
+    job = models.CharField(max_length=50)
+    started_at = models.DateTimeField(default=timezone.now)
+    duration_ms = models.PositiveIntegerField(default=0)
+    rows = models.BigIntegerField(default=0)
+    succeeded = models.BooleanField(default=True)
+    details = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True)
+    
+    class Meta:
+        ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['job', '-started_at'], name='maintenance_run_job_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.job} at {self.started_at} ({self.rows} rows)"
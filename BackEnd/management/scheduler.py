@@ -0,0 +1,168 @@
+# management/scheduler.py
+"""
+In-process scheduler for periodic maintenance jobs.
+
+``manage.py run_maintenance`` runs on any number of nodes with no broker.
+Every POLL_SECONDS it looks up each job's last run in MaintenanceRun, and
+for jobs that are due it takes a per-job lock and re-checks the last run
+before starting. Only one node runs a given job at a time, and a job that
+another node has just finished is skipped. On PostgreSQL the lock is a
+session advisory lock, which is released by the server if the node dies;
+other databases fall back to an expiring ``cache.add`` key.
+
+Each run is recorded with its duration and the rows it touched.
+MaintenanceRun history older than KEEP_RUNS_DAYS is pruned as it goes.
+"""
+import hashlib
+import logging
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, connection
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import MaintenanceRun
+
+logger = logging.getLogger(__name__)
+
+MAINTENANCE_DEFAULTS = {
+    'POLL_SECONDS': 30,
+    'LOCK_TIMEOUT': 3600,
+    'KEEP_RUNS_DAYS': 30,
+    'JOBS': {
+        'expire_invitations': {'TASK': 'management.jobs.expire_invitations', 'EVERY': 300},
+        'purge_otps': {'TASK': 'management.jobs.purge_otps', 'EVERY': 900},
+        'release_expired_holds': {'TASK': 'management.jobs.release_expired_holds', 'EVERY': 60},
+        'clear_sessions': {'TASK': 'management.jobs.clear_sessions', 'EVERY': 3600},
+        'reconcile_dashboard_counters': {'TASK': 'management.jobs.reconcile_dashboard_counters', 'EVERY': 3600},
+        'reconcile_unread_counters': {'TASK': 'management.jobs.reconcile_unread_counters', 'EVERY': 3600},
+        'maintain_activity_storage': {'TASK': 'management.jobs.maintain_activity_storage', 'EVERY': 86400},
+    },
+}
+
+
+def maintenance_setting(name):
+    return getattr(settings, 'MAINTENANCE', {}).get(name, MAINTENANCE_DEFAULTS[name])
+
+
+def configured_jobs():
+    """{name: (task, every_seconds)}; settings entries override defaults, None disables a job"""
+    jobs = {**MAINTENANCE_DEFAULTS['JOBS'], **maintenance_setting('JOBS')}
+    return {name: (job['TASK'], job['EVERY']) for name, job in jobs.items() if job}
+
+
+def lock_key(name):
+    """Signed 64-bit advisory lock key for a job name"""
+    return int.from_bytes(hashlib.blake2b(f"maintenance:{name}".encode(), digest_size=8).digest(), 'big', signed=True)
+
+
+@contextmanager
+def job_lock(name):
+    """Yield True if this process holds the job's lock, False if another node does"""
+    if connection.vendor == 'postgresql':
+        key = lock_key(name)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_try_advisory_lock(%s)", [key])
+            acquired = cursor.fetchone()[0]
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT pg_advisory_unlock(%s)", [key])
+        return
+
+    cache_key = f"maintenance:lock:{name}"
+    token = uuid.uuid4().hex
+    acquired = cache.add(cache_key, token, maintenance_setting('LOCK_TIMEOUT'))
+    try:
+        yield acquired
+    finally:
+        if acquired and cache.get(cache_key) == token:
+            cache.delete(cache_key)
+
+
+def renew_lock(name):
+    """Keep a long-held job lock alive; returns False once it has been lost"""
+    if connection.vendor == 'postgresql':
+        # The advisory lock lives as long as the session holding it
+        return connection.connection is not None and connection.is_usable()
+    return cache.touch(f"maintenance:lock:{name}", maintenance_setting('LOCK_TIMEOUT'))
+
+
+def last_runs():
+    """{job: started_at} of each job's latest run"""
+    return dict(MaintenanceRun.objects.values('job').annotate(latest=Max('started_at')).values_list('job', 'latest'))
+
+
+def last_run(name):
+    return MaintenanceRun.objects.filter(job=name).order_by('-started_at').values_list('started_at', flat=True).first()
+
+
+def is_due(started_at, every, now):
+    return started_at is None or (now - started_at).total_seconds() >= every
+
+
+def run_job(name, task, every=None):
+    """
+    Run one job under its lock and record it. With ``every`` the job is
+    skipped if it ran within that many seconds. Returns the MaintenanceRun,
+    or None when skipped.
+    """
+    with job_lock(name) as acquired:
+        if not acquired:
+            logger.debug(f"Maintenance job {name} is running elsewhere")
+            return None
+        if every is not None and not is_due(last_run(name), every, timezone.now()):
+            return None
+
+        run = MaintenanceRun(job=name, started_at=timezone.now())
+        started = time.perf_counter()
+        try:
+            details = import_string(task)() or {}
+        except Exception as e:
+            run.succeeded = False
+            run.error = str(e)[:2000]
+            logger.error(f"Maintenance job {name} failed: {str(e)}")
+        else:
+            run.details = details
+            run.rows = sum(value for value in details.values() if isinstance(value, int))
+        run.duration_ms = int((time.perf_counter() - started) * 1000)
+        run.save()
+
+        MaintenanceRun.objects.filter(
+            job=name, started_at__lt=timezone.now() - timezone.timedelta(days=maintenance_setting('KEEP_RUNS_DAYS'))
+        ).delete()
+        if run.succeeded:
+            logger.info(f"Maintenance job {name}: {run.rows} rows in {run.duration_ms}ms {run.details}")
+        return run
+
+
+def run_due_jobs():
+    """Run every job that is due now. Returns the runs that happened."""
+    runs = []
+    latest = last_runs()
+    now = timezone.now()
+    for name, (task, every) in configured_jobs().items():
+        if is_due(latest.get(name), every, now):
+            run = run_job(name, task, every)
+            if run is not None:
+                runs.append(run)
+    return runs
+
+
+def run_forever(stopping, poll_seconds=None, on_run=None):
+    """Poll for due jobs until ``stopping`` (a threading.Event) is set"""
+    poll_seconds = poll_seconds or maintenance_setting('POLL_SECONDS')
+    while not stopping.is_set():
+        close_old_connections()
+        for run in run_due_jobs():
+            if on_run is not None:
+                on_run(run)
+        stopping.wait(poll_seconds)
+    close_old_connections()
@@ -1,7 +1,9 @@
 # management/serializers.py
 from rest_framework import serializers
-from django.contrib.auth.models import User
+from authentication.models import PatientImport, User
 from .models import UserInvitation, SystemActivity
+from . import activity_feed
+from .invitations import MAX_BATCH
 
 class UserInvitationSerializer(serializers.ModelSerializer):
     invited_by_name = serializers.CharField(source='invited_by.get_full_name', read_only=True)
@@ -31,12 +33,27 @@ class InviteUserSerializer(serializers.Serializer):
         
         return value
 
+class BulkInviteSerializer(serializers.Serializer):
+    emails = serializers.ListField(child=serializers.CharField(max_length=254), allow_empty=False, max_length=MAX_BATCH)
+    role = serializers.ChoiceField(choices=UserInvitation.ROLE_CHOICES)
+
+class PatientImportSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PatientImport
+        fields = ['id', 'file_name', 'file_format', 'dry_run', 'status', 'created_at', 'started_at', 'finished_at',
+                  'report', 'error']
+
 class SystemActivitySerializer(serializers.ModelSerializer):
     user_name = serializers.CharField(source='user.get_full_name', read_only=True)
+    cursor = serializers.SerializerMethodField()
     
     class Meta:
         model = SystemActivity
-        fields = ['id', 'activity_type', 'description', 'user_name', 'created_at', 'metadata']
+        fields = ['id', 'activity_type', 'description', 'user_name', 'created_at', 'metadata', 'cursor']
+    
+    def get_cursor(self, obj):
+        # Poll dashboard/activities/since/ with the newest item's cursor
+        return activity_feed.encode_cursor(obj)
 
 class DashboardStatsSerializer(serializers.Serializer):
     total_patients = serializers.IntegerField()
@@ -46,20 +63,16 @@ class DashboardStatsSerializer(serializers.Serializer):
     pending_approvals = serializers.IntegerField()
     active_sessions = serializers.IntegerField()
     pending_invites = serializers.IntegerField()
+    activity_log = serializers.DictField()
+
+class ActivitySummarySerializer(serializers.Serializer):
+    day = serializers.DateField()
+    activity_type = serializers.CharField()
+    count = serializers.IntegerField()
 
 class UserSearchSerializer(serializers.ModelSerializer):
-    role = serializers.SerializerMethodField()
+    role = serializers.CharField(source='user_type', read_only=True)
     
     class Meta:
         model = User
-        fields = ['id', 'first_name', 'last_name', 'email', 'role']
-    
-    def get_role(self, obj):
-        # Determine user role based on groups or related models
-        if hasattr(obj, 'doctor'):
-            return 'doctor'
-        elif hasattr(obj, 'staff'):
-            return 'staff'
-        elif hasattr(obj, 'patient'):
-            return 'patient'
-        return 'user'
\ No newline at end of file
+        fields = ['id', 'first_name', 'last_name', 'email', 'role']
\ No newline at end of file
@@ -0,0 +1,98 @@
+# management/signals.py
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from authentication.models import User
+from . import counters
+from .models import UserInvitation
+from .user_search import get_user_search
+
+
+@receiver(post_save, sender=User)
+def index_saved_user(sender, instance, **kwargs):
+    """Keep this process's user search index in step with saved users"""
+    transaction.on_commit(lambda: get_user_search().user_saved(instance))
+
+
+@receiver(post_delete, sender=User)
+def unindex_deleted_user(sender, instance, **kwargs):
+    user_id = instance.pk
+    transaction.on_commit(lambda: get_user_search().user_deleted(user_id))
+
+
+# Dashboard counters: remember the counted value as loaded so a save can move
+# the count between keys. __dict__ is read directly so deferred fields stay unloaded.
+
+@receiver(post_init, sender=User)
+def remember_user_type(sender, instance, **kwargs):
+    instance._counted_user_type = instance.__dict__.get('user_type')
+
+
+@receiver(post_save, sender=User)
+def count_saved_user(sender, instance, created, **kwargs):
+    new = instance.__dict__.get('user_type')
+    old = None if created else instance._counted_user_type
+    if new is None or new == old or (old is None and not created):
+        return
+    if old is not None:
+        counters.increment(counters.user_key(old), -1)
+    counters.increment(counters.user_key(new))
+    instance._counted_user_type = new
+
+
+@receiver(post_delete, sender=User)
+def count_deleted_user(sender, instance, **kwargs):
+    if instance._counted_user_type is not None:
+        counters.increment(counters.user_key(instance._counted_user_type), -1)
+
+
+@receiver(post_init, sender=UserInvitation)
+def remember_invitation_status(sender, instance, **kwargs):
+    instance._counted_status = instance.__dict__.get('status')
+
+
+@receiver(post_save, sender=UserInvitation)
+def count_saved_invitation(sender, instance, created, **kwargs):
+    new = instance.__dict__.get('status')
+    old = None if created else instance._counted_status
+    if new is None or new == old or (old is None and not created):
+        return
+    if old is not None:
+        counters.increment(counters.invitation_key(old), -1)
+    counters.increment(counters.invitation_key(new))
+    instance._counted_status = new
+
+
+@receiver(post_delete, sender=UserInvitation)
+def count_deleted_invitation(sender, instance, **kwargs):
+    if instance._counted_status is not None:
+        counters.increment(counters.invitation_key(instance._counted_status), -1)
+
+
+# Holds are not appointments until confirmed, so they are counted when they leave 'held'
+
+def remember_appointment_held(sender, instance, **kwargs):
+    instance._counted_held = instance.__dict__.get('status') == 'held'
+
+
+def count_saved_appointment(sender, instance, created, **kwargs):
+    status = instance.__dict__.get('status')
+    if status is None:
+        return
+    held = status == 'held'
+    if not held and (created or instance._counted_held):
+        counters.increment(counters.APPOINTMENTS)
+    instance._counted_held = held
+
+
+def count_deleted_appointment(sender, instance, **kwargs):
+    if not instance._counted_held:
+        counters.increment(counters.APPOINTMENTS, -1)
+
+
+Appointment = counters.appointment_model()
+if Appointment is not None:
+    post_init.connect(remember_appointment_held, sender=Appointment, dispatch_uid='remember_appointment_held')
+    post_save.connect(count_saved_appointment, sender=Appointment, dispatch_uid='count_saved_appointment')
+    post_delete.connect(count_deleted_appointment, sender=Appointment, dispatch_uid='count_deleted_appointment')
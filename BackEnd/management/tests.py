@@ -1,3 +1,67 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from authentication.models import User
+from notification.models import OutboundEmail
+from . import counters
+from .invitations import ALREADY_INVITED, DUPLICATE, INVALID, INVITED, REINVITED, USER_EXISTS, invite_many
+from .models import UserInvitation
+
+
+@override_settings(FRONTEND_URL='http://frontend.test')
+class InviteManyTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(email='admin@example.com', password=None, first_name='Ad',
+                                              last_name='Min', user_type='admin')
+        User.objects.create_user(email='doctor@example.com', password=None, first_name='Doc', last_name='Tor',
+                                 user_type='doctor')
+
+    def statuses(self, emails, role='doctor'):
+        return [result['status'] for result in invite_many(emails, role, self.admin)]
+
+    def test_outcomes(self):
+        UserInvitation.objects.create(email='pending@example.com', role='staff', invited_by=self.admin)
+        statuses = self.statuses([
+            'new@example.com', 'not-an-email', 'NEW@example.com', 'Doctor@Example.com', 'pending@example.com',
+        ])
+        self.assertEqual(statuses, [INVITED, INVALID, DUPLICATE, USER_EXISTS, ALREADY_INVITED])
+
+        invitation = UserInvitation.objects.get(email='new@example.com')
+        self.assertEqual((invitation.role, invitation.status, invitation.invited_by), ('doctor', 'pending', self.admin))
+        self.assertEqual(list(OutboundEmail.objects.values_list('recipient', 'category')),
+                         [('new@example.com', 'invitation')])
+
+    def test_existing_invitations_match_case_insensitively(self):
+        self.assertEqual(self.statuses(['Someone@Example.com']), [INVITED])
+        self.assertEqual(self.statuses(['someone@example.com'], role='staff'), [ALREADY_INVITED])
+
+    def test_expired_invitation_for_the_same_role_is_reopened(self):
+        expired = UserInvitation.objects.create(email='late@example.com', role='doctor', invited_by=self.admin,
+                                                status='expired', expires_at=timezone.now())
+        before = counters.read_counters()
+        results = invite_many(['late@example.com'], 'doctor', self.admin)
+        self.assertEqual(results[0]['status'], REINVITED)
+        self.assertEqual(results[0]['invitation'], str(expired.pk))
+
+        expired.refresh_from_db()
+        self.assertEqual(expired.status, 'pending')
+        self.assertGreater(expired.expires_at, timezone.now())
+        after = counters.read_counters()
+        self.assertEqual(after[counters.invitation_key('pending')] - before[counters.invitation_key('pending')], 1)
+        self.assertEqual(after[counters.invitation_key('expired')] - before[counters.invitation_key('expired')], -1)
+
+    def test_nothing_to_invite_writes_nothing(self):
+        self.assertEqual(self.statuses(['bad', 'doctor@example.com']), [INVALID, USER_EXISTS])
+        self.assertFalse(UserInvitation.objects.exists())
+        self.assertFalse(OutboundEmail.objects.exists())
+
+    def test_bulk_invite_is_admin_only(self):
+        patient = User.objects.create_user(email='patient@example.com', password=None, first_name='Pat',
+                                           last_name='Ient', user_type='patient')
+        client = APIClient()
+        client.force_authenticate(patient)
+        response = client.post('/api/v1/admin/users/invite/bulk/', {'emails': ['x@example.com'], 'role': 'doctor'},
+                               format='json')
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(UserInvitation.objects.exists())
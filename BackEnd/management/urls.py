@@ -8,10 +8,15 @@ urlpatterns = [
     # Dashboard endpoints
     path('dashboard/stats/', views.dashboard_stats, name='dashboard_stats'),
     path('dashboard/activities/', views.recent_activities, name='recent_activities'),
+    path('dashboard/activities/since/', views.activities_since, name='activities_since'),
+    path('dashboard/activity-summary/', views.activity_summary, name='activity_summary'),
     
     # User management endpoints
     path('users/search/', views.search_users, name='search_users'),
     path('users/invite/', views.invite_user, name='invite_user'),
+    path('users/invite/bulk/', views.bulk_invite_users, name='bulk_invite_users'),
+    path('patients/import/', views.import_patients, name='import_patients'),
+    path('patients/import/<uuid:import_id>/', views.patient_import_status, name='patient_import_status'),
     
     # Invitation management endpoints
     path('invitations/pending/', views.pending_invitations, name='pending_invitations'),
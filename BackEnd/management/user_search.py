@@ -0,0 +1,290 @@
+# management/user_search.py
+"""
+Ranked user search for the admin search box.
+
+Two backends share one interface (``search(query, cursor, limit, role)``):
+
+- PostgresUserSearch matches against a pg_trgm GIN index over the lowered
+  "first middle last email" document (authentication migration 0004) and
+  ranks by ``word_similarity``.
+- NGramUserSearch keeps an equivalent trigram inverted index in memory for
+  databases without pg_trgm (SQLite in development). Users saved in this
+  process are indexed right away, new users from other processes are
+  picked up by id every SYNC_SECONDS, and the whole index is rebuilt in
+  the background every REBUILD_SECONDS to catch edits and deletes made
+  elsewhere.
+
+Both rank a match by trigram similarity plus 1 when a word of the
+document starts with the query, and page with a keyset cursor over
+(rank, id) so later pages cost the same as the first.
+"""
+import math
+import threading
+import time
+from array import array
+from functools import lru_cache
+
+import numpy as np
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+from Core.pagination import InvalidCursor, decode_cursor, encode_cursor
+from addresses.gazetteer import normalize_name
+from authentication.models import User
+
+# Must match the expression indexed by authentication migration 0004
+SEARCH_DOCUMENT = "lower(first_name || ' ' || coalesce(middle_name, '') || ' ' || last_name || ' ' || email)"
+
+RESULT_FIELDS = ('id', 'first_name', 'last_name', 'email', 'user_type')
+
+ROLE_CODES = {role: code for code, (role, _) in enumerate(User.USER_TYPE_CHOICES, start=1)}
+EMPTY = array('i')
+
+
+def decode_rank_cursor(cursor):
+    rank, user_id = decode_cursor(cursor, 2)
+    try:
+        return float(rank), int(user_id)
+    except (ValueError, TypeError):
+        raise InvalidCursor("Invalid cursor")
+
+
+def trigrams(text):
+    """pg_trgm style: each word padded with two leading spaces and one trailing"""
+    grams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class BaseUserSearch:
+    def __init__(self, page_size=10, max_page_size=50, **options):
+        self.page_size = page_size
+        self.max_page_size = max_page_size
+
+    def normalize(self, query):
+        return ' '.join(query.lower().split())
+
+    def search(self, query, cursor=None, limit=None, role=None):
+        """Return (users, next_cursor); each user carries its ``search_rank``"""
+        limit = max(1, min(limit or self.page_size, self.max_page_size))
+        after = decode_rank_cursor(cursor) if cursor else None
+        text = self.normalize(query)
+        if not text:
+            return [], None
+
+        users = self.page(text, after, limit + 1, role)
+        next_cursor = None
+        if len(users) > limit:
+            users = users[:limit]
+            next_cursor = encode_cursor([users[-1].search_rank, users[-1].pk])
+        return users, next_cursor
+
+    def page(self, text, after, limit, role):
+        raise NotImplementedError
+
+    def user_saved(self, user):
+        pass
+
+    def user_deleted(self, user_id):
+        pass
+
+
+class PostgresUserSearch(BaseUserSearch):
+    def page(self, text, after, limit, role):
+        like = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        rank = RawSQL(
+            f"(word_similarity(%s, {SEARCH_DOCUMENT}) + "
+            f"CASE WHEN {SEARCH_DOCUMENT} LIKE %s OR {SEARCH_DOCUMENT} LIKE %s THEN 1 ELSE 0 END)::float8",
+            [text, f"{like}%", f"% {like}%"],
+            output_field=FloatField(),
+        )
+        # Both predicates are answered by the trigram index
+        match = RawSQL(
+            f"(%s <%% {SEARCH_DOCUMENT} OR {SEARCH_DOCUMENT} LIKE %s)",
+            [text, f"%{like}%"],
+            output_field=BooleanField(),
+        )
+
+        users = User.objects.annotate(search_rank=rank).filter(match)
+        if role:
+            users = users.filter(user_type=role)
+        if after:
+            users = users.filter(Q(search_rank__lt=after[0]) | Q(search_rank=after[0], id__lt=after[1]))
+        return list(users.only(*RESULT_FIELDS).order_by('-search_rank', '-id')[:limit])
+
+
+class NGramIndex:
+    """Trigram postings over user documents; doc numbers only grow, updates append and tombstone"""
+
+    def __init__(self):
+        self.user_ids = array('q')
+        self.docs = []
+        self.roles = bytearray()
+        self.alive = bytearray()
+        self.positions = {}
+        self.postings = {}
+        self.high_water = 0
+
+    @staticmethod
+    def document(first_name, middle_name, last_name, email):
+        return normalize_name(f"{first_name} {middle_name or ''} {last_name} {email}")
+
+    def add(self, user_id, document, role):
+        self.remove(user_id)
+        number = len(self.user_ids)
+        self.user_ids.append(user_id)
+        self.docs.append(document)
+        self.roles.append(ROLE_CODES.get(role, 0))
+        self.alive.append(1)
+        self.positions[user_id] = number
+        for gram in trigrams(document):
+            postings = self.postings.get(gram)
+            if postings is None:
+                postings = self.postings[gram] = array('i')
+            postings.append(number)
+        self.high_water = max(self.high_water, user_id)
+
+    def remove(self, user_id):
+        number = self.positions.pop(user_id, None)
+        if number is not None:
+            self.alive[number] = 0
+
+    def search(self, text, after, limit, role, min_similarity):
+        """Top ``limit`` (rank, user_id) pairs below the ``after`` keyset position"""
+        grams = trigrams(text)
+        if not grams:
+            return []
+        need = max(1, math.ceil(min_similarity * len(grams)))
+        # Postings hold each doc number once, so a scatter-add counts shared trigrams
+        counts = np.zeros(len(self.docs), dtype=np.uint16)
+        for gram in grams:
+            counts[np.frombuffer(self.postings.get(gram, EMPTY), dtype=np.int32)] += 1
+        numbers = np.flatnonzero(counts >= need)
+        shared = counts[numbers]
+
+        keep = np.frombuffer(self.alive, dtype=np.uint8)[numbers] == 1
+        if role:
+            keep &= np.frombuffer(self.roles, dtype=np.uint8)[numbers] == ROLE_CODES.get(role, 0)
+        numbers, shared = numbers[keep], shared[keep]
+        user_ids = np.frombuffer(self.user_ids, dtype=np.int64)[numbers]
+        similarity = shared / len(grams)
+        order = np.lexsort((-user_ids, -similarity))
+        numbers, user_ids, similarity = numbers[order], user_ids[order], similarity[order]
+
+        # Word-prefix matches rank a full point higher. Such a document holds every
+        # query trigram except possibly the last word's trailing one, so only those
+        # candidates need the string check.
+        word_prefix = f" {text}"
+        prefixed = []
+        bonus = np.zeros(len(numbers), dtype=bool)
+        for i in np.flatnonzero(shared[order] >= len(grams) - 1).tolist():
+            document = self.docs[numbers[i]]
+            if document.startswith(text) or word_prefix in document:
+                bonus[i] = True
+                key = (float(similarity[i]) + 1, int(user_ids[i]))
+                if after is None or key < after:
+                    prefixed.append(key)
+                    if len(prefixed) == limit:
+                        return prefixed
+
+        plain = ~bonus
+        if after is not None:
+            plain &= (similarity < after[0]) | ((similarity == after[0]) & (user_ids < after[1]))
+        rest = np.flatnonzero(plain)[:limit - len(prefixed)]
+        return prefixed + [(float(similarity[i]), int(user_ids[i])) for i in rest.tolist()]
+
+
+class NGramUserSearch(BaseUserSearch):
+    def __init__(self, min_similarity=0.5, sync_seconds=5, rebuild_seconds=600, **options):
+        super().__init__(**options)
+        self.min_similarity = min_similarity
+        self.sync_seconds = sync_seconds
+        self.rebuild_seconds = rebuild_seconds
+        self.index = None
+        self._lock = threading.Lock()
+        self._synced_at = 0.0
+        self._built_at = 0.0
+        self._rebuilding = False
+
+    def normalize(self, query):
+        return normalize_name(query)
+
+    @staticmethod
+    def load(index, users):
+        for user_id, first_name, middle_name, last_name, email, role in users.order_by('id').values_list(
+                'id', 'first_name', 'middle_name', 'last_name', 'email', 'user_type').iterator(chunk_size=10000):
+            index.add(user_id, NGramIndex.document(first_name, middle_name, last_name, email), role)
+        return index
+
+    def _rebuild_in_background(self):
+        try:
+            index = self.load(NGramIndex(), User.objects.all())
+            with self._lock:
+                self.index = index
+                self._built_at = self._synced_at = time.monotonic()
+        finally:
+            self._rebuilding = False
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self.index is None:
+            with self._lock:
+                if self.index is None:
+                    self.index = self.load(NGramIndex(), User.objects.all())
+                    self._built_at = self._synced_at = now
+            return
+        if now - self._built_at >= self.rebuild_seconds and not self._rebuilding:
+            self._rebuilding = True
+            threading.Thread(target=self._rebuild_in_background, name='user-search-rebuild', daemon=True).start()
+        if now - self._synced_at >= self.sync_seconds:
+            with self._lock:
+                self.load(self.index, User.objects.filter(id__gt=self.index.high_water))
+                self._synced_at = now
+
+    def page(self, text, after, limit, role):
+        self._refresh()
+        # The search holds numpy views of the postings, which block appends until released
+        with self._lock:
+            ranked = self.index.search(text, after, limit, role, self.min_similarity)
+        users = User.objects.only(*RESULT_FIELDS).in_bulk([user_id for _, user_id in ranked])
+        results = []
+        for rank, user_id in ranked:
+            user = users.get(user_id)
+            if user is not None:
+                user.search_rank = rank
+                results.append(user)
+        return results
+
+    def user_saved(self, user):
+        if self.index is None or user.get_deferred_fields():
+            return
+        with self._lock:
+            self.index.add(
+                user.pk,
+                NGramIndex.document(user.first_name, user.middle_name, user.last_name, user.email),
+                user.user_type,
+            )
+
+    def user_deleted(self, user_id):
+        if self.index is not None:
+            with self._lock:
+                self.index.remove(user_id)
+
+
+@lru_cache(maxsize=None)
+def get_user_search():
+    """Return the configured search backend (one instance per process)"""
+    options = dict(getattr(settings, 'USER_SEARCH', {}))
+    backend = options.pop('BACKEND', None)
+    if not backend:
+        backend = (
+            'management.user_search.PostgresUserSearch' if connection.vendor == 'postgresql'
+            else 'management.user_search.NGramUserSearch'
+        )
+    return import_string(backend)(**{key.lower(): value for key, value in options.items()})
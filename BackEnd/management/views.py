@@ -2,17 +2,29 @@
 from rest_framework import status, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
-from django.contrib.auth.models import User
-from django.db.models import Q, Count
+from django.db import IntegrityError
+from django.template import TemplateDoesNotExist, TemplateSyntaxError
 from django.utils import timezone
-from django.contrib.sessions.models import Session
 
-from .models import UserInvitation, SystemActivity
+from .models import UserInvitation
 from .serializers import (
     UserInvitationSerializer, InviteUserSerializer, 
-    SystemActivitySerializer, DashboardStatsSerializer, UserSearchSerializer
+    SystemActivitySerializer, DashboardStatsSerializer, UserSearchSerializer,
+    ActivitySummarySerializer, BulkInviteSerializer, PatientImportSerializer
 )
 from .email_service import EmailService
+from . import activity_feed, activity_storage, counters
+from .activity_log import log_activity, stats as activity_log_stats
+from .invitations import INVITED, REINVITED, invite_many
+from authentication.bulk_import import detect_format, queue_import
+from authentication.models import PatientImport
+from .user_search import get_user_search
+from Core.pagination import InvalidCursor, KeysetPaginator, with_next_link
+import logging
+
+logger = logging.getLogger(__name__)
+
+PENDING_INVITATIONS = KeysetPaginator(('-created_at', '-id'), max_limit=100)
 
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
@@ -36,7 +48,7 @@ def invite_user(request):
         
         if email_sent:
             # Log activity
-            SystemActivity.objects.create(
+            log_activity(
                 activity_type='user_invited',
                 description=f"Invited {email} as {role}",
                 user=request.user,
@@ -61,41 +73,71 @@ def invite_user(request):
         'errors': serializer.errors
     }, status=status.HTTP_400_BAD_REQUEST)
 
-@api_view(['GET'])
+@api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
-def dashboard_stats(request):
-    """Get dashboard statistics"""
+def bulk_invite_users(request):
+    """Invite many users with one role; emails are queued and sent in the background"""
+    if not request.user.is_admin():
+        return Response({
+            'success': False,
+            'message': 'Only admins can invite users'
+        }, status=status.HTTP_403_FORBIDDEN)
     
-    # Count users by type - you may need to adjust based on your user model structure
-    total_patients = User.objects.filter(groups__name='Patient').count()
-    total_doctors = User.objects.filter(groups__name='Doctor').count()
-    total_staff = User.objects.filter(groups__name='Staff').count()
+    serializer = BulkInviteSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response({
+            'success': False,
+            'errors': serializer.errors
+        }, status=status.HTTP_400_BAD_REQUEST)
     
-    # Count appointments (assuming you have an appointment model)
-    total_appointments = 0
+    role = serializer.validated_data['role']
     try:
-        from appointment.models import Appointment  # Adjust import as needed
-        total_appointments = Appointment.objects.count()
-    except ImportError:
-        pass
-    
-    # Pending invitations
-    pending_invites = UserInvitation.objects.filter(status='pending').count()
+        results = invite_many(serializer.validated_data['emails'], role, request.user)
+    except IntegrityError:
+        # Another request invited one of these addresses at the same moment
+        return Response({
+            'success': False,
+            'message': 'Some of these addresses were invited concurrently; please retry'
+        }, status=status.HTTP_409_CONFLICT)
+    except (TemplateDoesNotExist, TemplateSyntaxError) as e:
+        logger.error(f"Bulk invitation failed: {str(e)}")
+        return Response({
+            'success': False,
+            'message': 'Failed to prepare invitation emails'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
-    # Active sessions
-    active_sessions = Session.objects.filter(expire_date__gte=timezone.now()).count()
+    invited = [result['email'] for result in results if result['status'] in (INVITED, REINVITED)]
+    if invited:
+        log_activity(
+            activity_type='user_invited',
+            description=f"Invited {len(invited)} users as {role}",
+            user=request.user,
+            metadata={'emails': invited, 'role': role}
+        )
     
-    # Pending approvals (you can adjust this logic based on your needs)
-    pending_approvals = UserInvitation.objects.filter(status='pending').count()
+    return Response({
+        'success': True,
+        'invited': len(invited),
+        'results': results
+    }, status=status.HTTP_201_CREATED if invited else status.HTTP_200_OK)
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def dashboard_stats(request):
+    """Get dashboard statistics"""
+    # One read of the counters table; see management.counters
+    counts = counters.read_counters()
     
     stats_data = {
-        'total_patients': total_patients,
-        'total_doctors': total_doctors,
-        'total_staff': total_staff,
-        'total_appointments': total_appointments,
-        'pending_approvals': pending_approvals,
-        'active_sessions': active_sessions,
-        'pending_invites': pending_invites,
+        'total_patients': counts[counters.user_key('patient')],
+        'total_doctors': counts[counters.user_key('doctor')],
+        'total_staff': counts[counters.user_key('staff')],
+        'total_appointments': counts[counters.APPOINTMENTS],
+        'pending_approvals': counts[counters.invitation_key('pending')],
+        'active_sessions': counts[counters.ACTIVE_SESSIONS],
+        'pending_invites': counts[counters.invitation_key('pending')],
+        # Buffered activity logging: events dropped or not yet written show up here
+        'activity_log': activity_log_stats(),
     }
     
     serializer = DashboardStatsSerializer(stats_data)
@@ -104,37 +146,95 @@ def dashboard_stats(request):
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def recent_activities(request):
-    """Get recent system activities"""
-    activities = SystemActivity.objects.all()[:20]  # Last 20 activities
+    """Get system activities, newest first (?cursor= for older pages; filters: activity_type, user, from, to)"""
+    try:
+        activities, next_cursor = activity_feed.older(request.GET)
+    except activity_feed.InvalidFeedQuery as e:
+        return Response({
+            'success': False,
+            'message': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
     serializer = SystemActivitySerializer(activities, many=True)
+    return with_next_link(request, Response(serializer.data), next_cursor)
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def activities_since(request):
+    """Get activities logged after ?cursor=, oldest first, for polling"""
+    try:
+        activities, next_cursor = activity_feed.newer(request.GET)
+    except activity_feed.InvalidFeedQuery as e:
+        return Response({
+            'success': False,
+            'message': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    serializer = SystemActivitySerializer(activities, many=True)
+    return with_next_link(request, Response(serializer.data), next_cursor)
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def activity_summary(request):
+    """Get activity counts per day and type for the last ?days= days (default 30), from rollups"""
+    try:
+        days = max(1, min(int(request.GET.get('days') or 30), 366))
+    except ValueError:
+        return Response({
+            'success': False,
+            'message': 'days must be a number'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    summary = activity_storage.daily_summary(days, request.GET.get('activity_type'))
+    serializer = ActivitySummarySerializer(summary, many=True)
     return Response(serializer.data)
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def search_users(request):
-    """Search for users across the system"""
-    query = request.GET.get('q', '').strip()
+    """Search for users across the system, best matches first"""
+    # The admin dashboard sends ?query=
+    query = (request.GET.get('q') or request.GET.get('query') or '').strip()
     
     if not query:
         return Response([])
     
-    # Search in users
-    users = User.objects.filter(
-        Q(first_name__icontains=query) |
-        Q(last_name__icontains=query) |
-        Q(email__icontains=query)
-    )[:10]  # Limit results
+    try:
+        limit = int(request.GET['limit']) if request.GET.get('limit') else None
+        users, next_cursor = get_user_search().search(
+            query,
+            cursor=request.GET.get('cursor'),
+            limit=limit,
+            role=request.GET.get('role') or None,
+        )
+    except (ValueError, InvalidCursor):
+        return Response({
+            'success': False,
+            'message': 'Invalid limit or cursor'
+        }, status=status.HTTP_400_BAD_REQUEST)
     
     serializer = UserSearchSerializer(users, many=True)
-    return Response(serializer.data)
+    return with_next_link(request, Response(serializer.data), next_cursor)
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def pending_invitations(request):
-    """Get all pending invitations"""
-    invitations = UserInvitation.objects.filter(status='pending')
+    """Get pending invitations, newest first (?cursor= for older pages, ?limit=)"""
+    invitations = UserInvitation.objects.filter(status='pending').select_related('invited_by', 'accepted_by').only(
+        'id', 'email', 'role', 'status', 'created_at', 'expires_at', 'accepted_at',
+        'invited_by__first_name', 'invited_by__middle_name', 'invited_by__last_name',
+        'accepted_by__first_name', 'accepted_by__middle_name', 'accepted_by__last_name',
+    )
+    try:
+        invitations, next_cursor = PENDING_INVITATIONS.paginate(invitations, request.GET)
+    except InvalidCursor as e:
+        return Response({
+            'success': False,
+            'message': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
     serializer = UserInvitationSerializer(invitations, many=True)
-    return Response(serializer.data)
+    return with_next_link(request, Response(serializer.data), next_cursor)
 
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
@@ -185,4 +285,58 @@ def cancel_invitation(request, invitation_id):
         return Response({
             'success': False,
             'message': 'Invitation not found'
-        }, status=status.HTTP_404_NOT_FOUND)
\ No newline at end of file
+        }, status=status.HTTP_404_NOT_FOUND)
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def import_patients(request):
+    """Queue a bulk import of patients from an uploaded CSV or JSONL file; poll patients/import/<id>/ for the report"""
+    if not request.user.is_admin():
+        return Response({
+            'success': False,
+            'message': 'Only admins can import patients'
+        }, status=status.HTTP_403_FORBIDDEN)
+    
+    upload = request.FILES.get('file')
+    if upload is None:
+        return Response({
+            'success': False,
+            'message': 'Upload the CSV or JSONL file as "file"'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    file_format = request.data.get('format') or detect_format(upload.name)
+    if file_format not in ('csv', 'jsonl'):
+        return Response({
+            'success': False,
+            'message': 'Format must be csv or jsonl'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    # Imports run in the run_patient_imports worker, not in this request
+    job = queue_import(upload, file_format, str(request.data.get('dry_run', '')).lower() in ('1', 'true'), request.user)
+    return Response({
+        'success': True,
+        'import': PatientImportSerializer(job).data
+    }, status=status.HTTP_202_ACCEPTED)
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def patient_import_status(request, import_id):
+    """Status of a queued patient import, with its report once done"""
+    if not request.user.is_admin():
+        return Response({
+            'success': False,
+            'message': 'Only admins can import patients'
+        }, status=status.HTTP_403_FORBIDDEN)
+    
+    try:
+        job = PatientImport.objects.get(pk=import_id)
+    except PatientImport.DoesNotExist:
+        return Response({
+            'success': False,
+            'message': 'Import not found'
+        }, status=status.HTTP_404_NOT_FOUND)
+    
+    return Response({
+        'success': True,
+        'import': PatientImportSerializer(job).data
+    })
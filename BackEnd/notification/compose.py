@@ -0,0 +1,151 @@
+# notification/compose.py
+"""
+Email composition.
+
+A ``MessageTemplate`` is a subject format string plus ``<name>.txt`` and
+(optionally) ``<name>.html`` templates, compiled once per process. Most
+of an email is the same for every recipient who shares a few static
+values (the invitation role, the OTP lifetime), so the first message for
+each combination renders the templates with placeholders for the
+per-recipient ``variables`` and keeps the static text between them as a
+frame. Later messages are a string join with the values escaped exactly
+as the template would have escaped them. Templates that use a
+per-recipient value anywhere but a plain ``{{ name }}`` (filters, tags,
+includes) are rendered in full, and the first fill of every frame is
+checked against a full render as well.
+
+``send_batch()`` delivers a list of messages with ``send_messages`` over a
+single SMTP connection.
+"""
+import re
+import threading
+
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.conf import settings
+from django.template import TemplateDoesNotExist
+from django.template.base import Lexer, TokenType
+from django.template.loader import get_template
+from django.utils.html import conditional_escape
+
+# Private-use characters that no template contains
+OPEN, CLOSE = '\ue000', '\ue001'
+PLACEHOLDER = re.compile(f'{OPEN}(\\d+)(&amp;|&){CLOSE}')
+
+
+def only_plain_uses(template, variables):
+    """True when ``variables`` appear in the template source only as bare ``{{ name }}`` outputs"""
+    names = set(variables)
+    for token in Lexer(template.template.source).tokenize():
+        if token.token_type == TokenType.VAR:
+            if token.contents.strip() in names:
+                continue
+        elif token.token_type == TokenType.BLOCK:
+            if token.contents.split()[0] in ('include', 'extends'):
+                return False
+        else:
+            continue
+        if names & set(re.findall(r'\w+', token.contents)):
+            return False
+    return True
+
+
+class Frame:
+    """Static text of one rendered template with the positions of the per-recipient values"""
+
+    def __init__(self, template, context, variables):
+        # The '&' shows whether the template escapes the value at that spot
+        rendered = template.render({
+            **context, **{name: f'{OPEN}{i}&{CLOSE}' for i, name in enumerate(variables)}
+        })
+        self.variables = variables
+        self.parts = []
+        position = 0
+        for match in PLACEHOLDER.finditer(rendered):
+            self.parts.append(rendered[position:match.start()])
+            self.parts.append((int(match.group(1)), match.group(2) == '&amp;'))
+            position = match.end()
+        self.parts.append(rendered[position:])
+        self.usable = only_plain_uses(template, variables) and not any(
+            OPEN in part or CLOSE in part for part in self.parts if isinstance(part, str)
+        )
+        self.verified = False
+
+    def fill(self, values):
+        return ''.join(
+            part if isinstance(part, str) else (conditional_escape(values[part[0]]) if part[1] else str(values[part[0]]))
+            for part in self.parts
+        )
+
+
+class MessageTemplate:
+    def __init__(self, name, subject, variables=()):
+        self.name = name
+        self.subject = subject
+        self.variables = tuple(variables)
+        self._templates = None
+        self._frames = {}
+        self._lock = threading.Lock()
+
+    def templates(self):
+        """(text, html) compiled templates; html is None when the template has no .html part"""
+        if self._templates is None:
+            try:
+                html = get_template(f'{self.name}.html')
+            except TemplateDoesNotExist:
+                html = None
+            self._templates = (get_template(f'{self.name}.txt'), html)
+        return self._templates
+
+    def render_part(self, template, context):
+        static = {key: value for key, value in context.items() if key not in self.variables}
+        try:
+            key = (template.origin.name, tuple(sorted(static.items())))
+            hash(key)
+        except TypeError:
+            # Only plain values can key a frame
+            return template.render(context)
+        frame = self._frames.get(key)
+        if frame is None:
+            with self._lock:
+                frame = self._frames.get(key)
+                if frame is None:
+                    frame = self._frames[key] = Frame(template, static, self.variables)
+        if not frame.usable:
+            return template.render(context)
+
+        filled = frame.fill([context[name] for name in self.variables])
+        if not frame.verified:
+            frame.usable = filled == template.render(context)
+            frame.verified = True
+            if not frame.usable:
+                return template.render(context)
+        return filled
+
+    def render(self, context):
+        """Return (subject, text, html) for one recipient's context"""
+        text, html = self.templates()
+        return (
+            self.subject.format(**context),
+            self.render_part(text, context),
+            self.render_part(html, context) if html is not None else '',
+        )
+
+    def build(self, recipient, context, from_email=None, connection=None):
+        subject, body, html_body = self.render(context)
+        message = EmailMultiAlternatives(
+            subject=subject,
+            body=body,
+            from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+            to=[recipient],
+            connection=connection,
+        )
+        if html_body:
+            message.attach_alternative(html_body, 'text/html')
+        return message
+
+
+def send_batch(messages, fail_silently=False):
+    """Send ``messages`` over one SMTP connection. Returns the number sent."""
+    if not messages:
+        return 0
+    return get_connection(fail_silently=fail_silently).send_messages(messages)
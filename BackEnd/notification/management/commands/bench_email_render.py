@@ -0,0 +1,98 @@
+import time
+import uuid
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+from django.test.utils import override_settings
+
+from management.email_service import INVITATION_EMAIL
+from notification.compose import send_batch
+from notification.smtp_sink import SMTPSink
+
+ROLES = ('Doctor', 'Staff')
+
+
+def contexts(count):
+    return [
+        {
+            'site_name': 'BukCare',
+            'role_title': ROLES[i % len(ROLES)],
+            'expires_in_days': 7,
+            'email': f"bench-{i}@example.com",
+            'invitation_url': f"https://bukcare.example/invitation/{uuid.uuid4()}/",
+        }
+        for i in range(count)
+    ]
+
+
+def render_each(context):
+    """The old path: both templates through render_to_string for every message"""
+    return (
+        f"You're invited to join BukCare as a {context['role_title']}",
+        render_to_string('emails/invitation.txt', context),
+        render_to_string('emails/invitation.html', context),
+    )
+
+
+def message(context, subject, body, html_body, connection=None):
+    email = EmailMultiAlternatives(subject, body, settings.DEFAULT_FROM_EMAIL, [context['email']],
+                                   connection=connection)
+    email.attach_alternative(html_body, 'text/html')
+    return email
+
+
+class Command(BaseCommand):
+    help = "Compare invitation email throughput: per-message render and send versus framed rendering sent in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=2000)
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--latencies', default='0,0.002',
+                            help="Comma separated per-reply SMTP delays in seconds")
+
+    def handle(self, *args, **options):
+        count = options['messages']
+        batch_size = options['batch_size']
+        items = contexts(count)
+
+        # Warm both paths so template compilation is not timed
+        render_each(items[0])
+        INVITATION_EMAIL.render(items[0])
+
+        started = time.perf_counter()
+        for context in items:
+            render_each(context)
+        render_rate = count / (time.perf_counter() - started)
+
+        started = time.perf_counter()
+        for context in items:
+            INVITATION_EMAIL.render(context)
+        framed_rate = count / (time.perf_counter() - started)
+
+        self.stdout.write(f"render only: render_to_string {render_rate:,.0f} msg/s, "
+                          f"framed {framed_rate:,.0f} msg/s ({framed_rate / render_rate:.1f}x)")
+
+        self.stdout.write(f"{'smtp delay':>10} {'per message msg/s':>18} {'batched msg/s':>14} {'speedup':>8}")
+        for latency in [float(value) for value in options['latencies'].split(',')]:
+            with SMTPSink(latency=latency) as sink, override_settings(**sink.email_settings()):
+                started = time.perf_counter()
+                for context in items:
+                    # send_mail() style: a fresh connection per message
+                    message(context, *render_each(context), connection=get_connection()).send()
+                single_rate = count / (time.perf_counter() - started)
+
+                started = time.perf_counter()
+                for start in range(0, count, batch_size):
+                    send_batch([
+                        INVITATION_EMAIL.build(context['email'], context)
+                        for context in items[start:start + batch_size]
+                    ])
+                batch_rate = count / (time.perf_counter() - started)
+
+                if sink.received != 2 * count:
+                    raise RuntimeError(f"SMTP sink received {sink.received} of {2 * count} messages")
+
+            self.stdout.write(f"{latency * 1000:>8.0f}ms {single_rate:>18,.0f} {batch_rate:>14,.0f} "
+                              f"{batch_rate / single_rate:>7.1f}x")
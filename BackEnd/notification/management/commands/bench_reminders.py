@@ -0,0 +1,241 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from appointment.management.commands.bench_booking import BENCH_DOMAIN, BENCH_SPECIALIZATION, cleanup
+from appointment.models import Appointment
+from authentication.models import User
+from doctor.models import Doctor, Specialization
+from notification.models import Notification, OutboundEmail
+from notification.outbox import enqueue_emails
+from notification.reminders import REMINDER_EMAIL, ReminderScheduler, due_reminders, reminders_setting, superseded
+
+SLOT = timedelta(minutes=15)
+
+
+class Command(BaseCommand):
+    help = ("Appointment reminders: per-minute scans versus the timing wheel, per-row versus batched delivery, "
+            "and a restart after downtime that must send each reminder exactly once")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctors', type=int, default=20)
+        parser.add_argument('--hours', type=int, default=48, help="Appointments fill this many hours from now")
+        parser.add_argument('--deliveries', type=int, default=1000, help="Reminders delivered per delivery method")
+
+    def handle(self, *args, **options):
+        cleanup()
+        self.now = timezone.now().replace(second=0, microsecond=0)
+        self.offsets = tuple(reminders_setting('OFFSETS_MINUTES'))
+        try:
+            count = self.populate(options['doctors'], options['hours'])
+            self.stdout.write(f"{count} appointments over {options['hours']}h, offsets {self.offsets} min, "
+                              f"{connection.vendor}")
+            self.compare_scans(options['hours'])
+            self.compare_delivery(options['deliveries'])
+            self.restart()
+        finally:
+            OutboundEmail.objects.filter(recipient__endswith=f"@{BENCH_DOMAIN}").delete()
+            cleanup()
+
+    def populate(self, doctors, hours):
+        specialization = Specialization.objects.create(name=BENCH_SPECIALIZATION)
+        doctor_ids = []
+        for i in range(doctors):
+            user = User.objects.create_user(email=f"doctor-{i}@{BENCH_DOMAIN}", password=None, first_name='Bench',
+                                            last_name=f"Doctor {i}", user_type='doctor')
+            doctor_ids.append(Doctor.objects.create(user=user, specialization=specialization,
+                                                    license_number=f"BENCH-REMIND-{i}", consultation_fee=0).pk)
+        patients = [
+            User.objects.create_user(email=f"patient-{i}@{BENCH_DOMAIN}", password=None, first_name='Bench',
+                                     last_name=f"Patient {i}", user_type='patient').pk
+            for i in range(50)
+        ]
+        # Back to back 15 minute appointments per doctor, from a day ago (for catch-up) to ``hours`` ahead
+        first = self.now - timedelta(hours=24)
+        slots = int((hours + 24) * 60 / 15)
+        Appointment.objects.bulk_create([
+            Appointment(doctor_id=doctor_id, patient_id=patients[(i + j) % len(patients)], status='confirmed',
+                        start_at=first + SLOT * i, end_at=first + SLOT * (i + 1))
+            for j, doctor_id in enumerate(doctor_ids)
+            for i in range(slots)
+        ], batch_size=1000)
+        # Booked well before any of their reminders
+        Appointment.objects.filter(doctor_id__in=doctor_ids).update(
+            created_at=self.now - timedelta(days=7), updated_at=self.now - timedelta(days=7),
+        )
+        return len(doctor_ids) * slots
+
+    def scan_minute(self, moment):
+        """The old way: every minute, look for appointments whose reminders fall in that minute"""
+        found = []
+        for minutes in self.offsets:
+            lead = timedelta(minutes=minutes)
+            rows = Appointment.objects.filter(
+                status__in=('pending', 'confirmed'),
+                start_at__gte=moment + lead, start_at__lt=moment + lead + timedelta(minutes=1),
+            ).values_list('id', flat=True)
+            found += [(appointment_id, minutes) for appointment_id in rows]
+        return found
+
+    def compare_scans(self, hours):
+        minutes = hours * 60
+        started = time.perf_counter()
+        scanned = set()
+        for minute in range(minutes):
+            scanned.update(self.scan_minute(self.now + timedelta(minutes=minute)))
+        scan_elapsed = time.perf_counter() - started
+
+        started = time.perf_counter()
+        scheduler = ReminderScheduler(now=self.now, offsets=self.offsets)
+        scheduler.loaded_from = scheduler.loaded_until = self.now
+        scheduler.load(self.now + timedelta(hours=hours))
+        load_elapsed = time.perf_counter() - started
+        started = time.perf_counter()
+        fired = set()
+        for minute in range(1, minutes + 1):
+            fired.update(key for key, _, _ in scheduler.wheel.advance(self.now + timedelta(minutes=minute)))
+        wheel_elapsed = time.perf_counter() - started
+
+        self.stdout.write(f"{hours}h of minutes: scan {len(scanned)} reminders with {minutes * len(self.offsets)} "
+                          f"queries in {scan_elapsed:.2f}s; wheel {len(fired)} reminders, load {load_elapsed:.2f}s "
+                          f"+ {minutes * 60} ticks in {wheel_elapsed:.2f}s "
+                          f"({scan_elapsed / (load_elapsed + wheel_elapsed):.1f}x)")
+        if scanned != fired:
+            raise CommandError(f"Scan and wheel disagree on {len(scanned ^ fired)} reminders")
+
+    def pending_reminders(self, count):
+        appointments = Appointment.objects.filter(
+            patient__email__endswith=f"@{BENCH_DOMAIN}", start_at__gte=self.now + timedelta(hours=2),
+        ).order_by('start_at').values_list('id', 'start_at')[:count]
+        minutes = min(self.offsets)
+        return [((appointment_id, minutes), start_at - timedelta(minutes=minutes))
+                for appointment_id, start_at in appointments]
+
+    def clear_sent(self):
+        Notification.objects.filter(recipient__email__endswith=f"@{BENCH_DOMAIN}").delete()
+        OutboundEmail.objects.filter(recipient__endswith=f"@{BENCH_DOMAIN}").delete()
+
+    def compare_delivery(self, count):
+        reminders = self.pending_reminders(count)
+        appointments = Appointment.objects.select_related('patient', 'doctor__user').in_bulk(
+            [appointment_id for (appointment_id, _), _ in reminders]
+        )
+
+        started = time.perf_counter()
+        for (appointment_id, minutes), due in reminders:
+            appointment = appointments[appointment_id]
+            with transaction.atomic():
+                Notification.objects.create(recipient_id=appointment.patient_id, appointment=appointment,
+                                            title='Appointment reminder', message='Reminder',
+                                            notification_type='reminder', scheduled_for=due)
+                enqueue_emails([(appointment.patient.email, *REMINDER_EMAIL.render({
+                    'site_name': 'BukCare', 'lead': 'in 1 hour', 'name': appointment.patient.get_full_name(),
+                    'doctor_name': appointment.doctor.user.get_full_name(), 'when': str(appointment.start_at),
+                }))], category='reminder')
+        per_row = len(reminders) / (time.perf_counter() - started)
+        self.clear_sent()
+
+        scheduler = ReminderScheduler(now=self.now, offsets=self.offsets)
+        size = reminders_setting('BATCH_SIZE')
+        started = time.perf_counter()
+        sent = sum(scheduler.deliver(reminders[i:i + size]) for i in range(0, len(reminders), size))
+        batched = sent / (time.perf_counter() - started)
+        emails = OutboundEmail.objects.filter(recipient__endswith=f"@{BENCH_DOMAIN}").count()
+        self.clear_sent()
+
+        self.stdout.write(f"delivery of {len(reminders)}: per row {per_row:,.0f}/s, batches of {size} "
+                          f"{batched:,.0f}/s ({batched / per_row:.1f}x), {emails} emails queued")
+        if sent != len(reminders) or emails != sent:
+            raise CommandError(f"Batched delivery sent {sent} notifications and {emails} emails for "
+                               f"{len(reminders)} reminders")
+
+    def run(self, scheduler, start, end, on_minute=None):
+        moment = start
+        while moment <= end:
+            scheduler.step(moment)
+            if on_minute is not None:
+                on_minute(moment)
+            moment += timedelta(minutes=1)
+
+    def restart(self):
+        """
+        Run 6h, stop for 2h, restart and run 4h more. Along the way some
+        appointments are moved later, some cancelled and some pulled in to
+        3h away, which makes their day-ahead reminder stale.
+        """
+        catch_up = timedelta(hours=reminders_setting('CATCH_UP_HOURS'))
+        changed_at = self.now + timedelta(hours=2)
+        later = Appointment.objects.filter(
+            patient__email__endswith=f"@{BENCH_DOMAIN}",
+            start_at__gte=self.now + timedelta(hours=30), start_at__lt=self.now + timedelta(hours=40),
+        ).order_by('start_at').values_list('id', flat=True)
+        moved, cancelled, pulled = list(later[:50]), list(later[50:100]), list(later[100:120])
+        # Pulled appointments go to a doctor of their own so they overlap nothing
+        user = User.objects.create_user(email=f"doctor-pulled@{BENCH_DOMAIN}", password=None, first_name='Bench',
+                                        last_name='Doctor', user_type='doctor')
+        spare = Doctor.objects.create(user=user, specialization=Specialization.objects.get(name=BENCH_SPECIALIZATION),
+                                      license_number='BENCH-REMIND-PULLED', consultation_fee=0)
+
+        def change(moment):
+            if moment == changed_at:
+                for appointment_id in moved:
+                    appointment = Appointment.objects.get(pk=appointment_id)
+                    Appointment.objects.filter(pk=appointment_id).update(
+                        start_at=appointment.start_at + timedelta(days=2),
+                        end_at=appointment.end_at + timedelta(days=2), updated_at=moment,
+                    )
+                Appointment.objects.filter(pk__in=cancelled).update(status='cancelled', updated_at=moment)
+                for i, appointment_id in enumerate(pulled):
+                    start_at = moment + timedelta(hours=3) + SLOT * i
+                    Appointment.objects.filter(pk=appointment_id).update(
+                        doctor=spare, start_at=start_at, end_at=start_at + SLOT, updated_at=moment,
+                    )
+
+        started = time.perf_counter()
+        first = ReminderScheduler(now=self.now, offsets=self.offsets)
+        self.run(first, self.now, self.now + timedelta(hours=6), on_minute=change)
+        end = self.now + timedelta(hours=12)
+        second = ReminderScheduler(now=self.now + timedelta(hours=8), offsets=self.offsets)
+        caught_up = second.step(self.now + timedelta(hours=8))
+        self.run(second, self.now + timedelta(hours=8, minutes=1), end)
+        elapsed = time.perf_counter() - started
+
+        def fired_at(due):
+            # Missed before the first start or during the downtime: fired on the first tick after
+            if due <= self.now:
+                return self.now
+            if self.now + timedelta(hours=6) < due < self.now + timedelta(hours=8):
+                return self.now + timedelta(hours=8)
+            return due
+
+        expected = set()
+        active = Appointment.objects.filter(
+            patient__email__endswith=f"@{BENCH_DOMAIN}", status__in=('pending', 'confirmed'),
+        ).values_list('id', 'start_at', 'created_at')
+        for appointment_id, start_at, created_at in active:
+            for (_, minutes), due in due_reminders(appointment_id, start_at, created_at, self.offsets):
+                if not self.now - catch_up <= due <= end:
+                    continue
+                if appointment_id in pulled and due < changed_at:
+                    continue
+                if superseded(start_at, created_at, minutes, self.offsets, fired_at(due)):
+                    continue
+                expected.add((appointment_id, due))
+        sent = list(Notification.objects.filter(
+            recipient__email__endswith=f"@{BENCH_DOMAIN}", notification_type='reminder',
+        ).values_list('appointment_id', 'scheduled_for'))
+        emails = OutboundEmail.objects.filter(recipient__endswith=f"@{BENCH_DOMAIN}").count()
+
+        self.stdout.write(f"restart after 2h down: {len(sent)} reminders sent ({caught_up} on the first tick after "
+                          f"restart), {len(expected)} expected, {emails} emails queued, 12h simulated in "
+                          f"{elapsed:.2f}s")
+        duplicates = len(sent) - len(set(sent))
+        stale = Notification.objects.filter(appointment_id__in=pulled, scheduled_for__lt=changed_at).count()
+        if stale:
+            raise CommandError(f"{stale} reminders sent for times before their appointment was moved")
+        if duplicates or set(sent) != expected or emails != len(sent):
+            raise CommandError(f"{duplicates} duplicates, {len(expected - set(sent))} missed, "
+                               f"{len(set(sent) - expected)} unexpected")
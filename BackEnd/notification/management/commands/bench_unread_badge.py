@@ -0,0 +1,68 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from authentication.models import User
+from notification.models import Notification
+from notification.unread import create_notifications, mark_all_read, mark_read, reconcile, unread_count
+
+BENCH_DOMAIN = 'unread.bench.invalid'
+
+
+def cleanup():
+    User.objects.filter(email__endswith=f"@{BENCH_DOMAIN}").delete()
+
+
+class Command(BaseCommand):
+    help = "Unread badge: COUNT(*) over a user's unread notifications versus the per-user counter read"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--per-user', type=int, default=250, help="Notifications per user")
+        parser.add_argument('--reads', type=int, default=5000, help="Badge reads per method")
+
+    def handle(self, *args, **options):
+        cleanup()
+        rng = random.Random(0)
+        try:
+            users = [
+                User.objects.create_user(email=f"user-{i}@{BENCH_DOMAIN}", password=None, first_name='Bench',
+                                         last_name=f"User {i}", user_type='patient').pk
+                for i in range(options['users'])
+            ]
+            create_notifications([
+                Notification(recipient_id=user_id, title='Bench', message='Bench', notification_type='system',
+                             is_read=rng.random() < 0.8)
+                for user_id in users
+                for _ in range(options['per_user'])
+            ])
+            total = len(users) * options['per_user']
+            self.stdout.write(f"{len(users)} users, {total} notifications, {connection.vendor}")
+
+            # Mark some read one by one and some all at once, so the counters have moved
+            for user_id in users[::3]:
+                ids = list(Notification.objects.filter(recipient_id=user_id, is_read=False)
+                           .values_list('id', flat=True)[:5])
+                mark_read(user_id, ids)
+            for user_id in users[1::7]:
+                mark_all_read(user_id)
+
+            samples = [rng.choice(users) for _ in range(options['reads'])]
+            started = time.perf_counter()
+            counted = [Notification.objects.filter(recipient_id=user_id, is_read=False).count() for user_id in samples]
+            count_rate = len(samples) / (time.perf_counter() - started)
+            started = time.perf_counter()
+            badges = [unread_count(user_id) for user_id in samples]
+            badge_rate = len(samples) / (time.perf_counter() - started)
+
+            self.stdout.write(f"badge reads: COUNT(*) {count_rate:,.0f}/s, counter {badge_rate:,.0f}/s "
+                              f"({badge_rate / count_rate:.1f}x)")
+            mismatched = sum(1 for a, b in zip(counted, badges) if a != b)
+            drift = reconcile()
+            self.stdout.write(f"{mismatched} mismatched reads, reconcile corrected {len(drift)} counters")
+            if mismatched or drift:
+                raise CommandError("Unread counters drifted from the notifications")
+        finally:
+            cleanup()
@@ -0,0 +1,30 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+
+from notification.outbox import OutboxWorkerPool
+
+
+class Command(BaseCommand):
+    help = "Run the email outbox worker pool until interrupted"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, help="Number of sender threads (default: EMAIL_OUTBOX['WORKERS'])")
+        parser.add_argument('--batch-size', type=int, help="Rows claimed per worker per poll")
+
+    def handle(self, *args, **options):
+        pool = OutboxWorkerPool(workers=options['workers'], batch_size=options['batch_size'])
+        signal.signal(signal.SIGTERM, lambda *_: pool.stopping.set())
+
+        pool.start()
+        self.stdout.write(f"Email outbox running with {pool.workers} workers")
+        try:
+            while not pool.stopping.is_set():
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            pool.stop()
+            self.stdout.write(f"Email outbox stopped: {pool.stats['sent']} sent, "
+                              f"{pool.stats['failed_attempts']} failed attempts")
@@ -0,0 +1,42 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+
+from management.scheduler import job_lock, renew_lock
+from notification.reminders import ReminderScheduler
+
+LOCK_NAME = 'reminders'
+
+
+class Command(BaseCommand):
+    help = "Send appointment reminders from a timing wheel until interrupted"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--standby-seconds', type=int, default=30,
+                            help="While another node holds the scheduler lock, retry this often")
+
+    def handle(self, *args, **options):
+        stopping = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+        try:
+            while not stopping.is_set():
+                with job_lock(LOCK_NAME) as acquired:
+                    if acquired:
+                        self.run(stopping)
+                        return
+                self.stdout.write("Reminder scheduler is running on another node, standing by")
+                stopping.wait(options['standby_seconds'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write("Reminder scheduler stopped")
+
+    def run(self, stopping):
+        scheduler = ReminderScheduler()
+        scheduler.step()
+        self.stdout.write(f"Reminder scheduler running: {len(scheduler.wheel)} reminders on the wheel")
+        held = scheduler.run_forever(stopping, holds_lock=lambda: renew_lock(LOCK_NAME))
+        stats = ', '.join(f"{key}={value}" for key, value in scheduler.stats.items())
+        self.stdout.write(f"Reminder scheduler stopped ({stats})")
+        if not held:
+            raise CommandError("Lost the reminders lock")
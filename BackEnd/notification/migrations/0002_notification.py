@@ -0,0 +1,38 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:57
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointment', '0005_appointment_reminder_indexes'),
+        ('notification', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=200)),
+                ('message', models.TextField()),
+                ('notification_type', models.CharField(choices=[('appointment', 'Appointment'), ('reminder', 'Reminder'), ('system', 'System')], max_length=20)),
+                ('is_read', models.BooleanField(default=False)),
+                ('scheduled_for', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('appointment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='appointment.appointment')),
+                ('recipient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to=settings.AUTH_USER_MODEL)),
+                ('sender', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sent_notifications', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(condition=models.Q(('notification_type', 'reminder')), fields=['scheduled_for'], name='notification_reminder_due_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('notification_type', 'reminder')), fields=('appointment', 'scheduled_for'), name='notification_reminder_once')],
+            },
+        ),
+    ]
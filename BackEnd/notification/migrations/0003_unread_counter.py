@@ -0,0 +1,30 @@
+# Generated by Django 5.2.1 on 2026-10-18 18:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointment', '0005_appointment_reminder_indexes'),
+        ('authentication', '0004_user_search_index'),
+        ('notification', '0002_notification'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnreadCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='unread_counter', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['recipient', '-created_at'], name='notification_unread_idx'),
+        ),
+    ]
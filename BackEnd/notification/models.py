@@ -1,23 +1,105 @@
-# # notifications/models.py
-# from django.db import models
-# from authentication.models import User
-# from appointment.models import Appointment
-
-# class Notification(models.Model):
-#     TYPE_CHOICES = [
-#         ('appointment', 'Appointment'),
-#         ('reminder', 'Reminder'),
-#         ('system', 'System'),
-#     ]
-    
-#     recipient = models.ForeignKey(User, on_delete=models.CASCADE)
-#     sender = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='sent_notifications')
-#     appointment = models.ForeignKey(Appointment, on_delete=models.CASCADE, null=True, blank=True)
-    
-#     title = models.CharField(max_length=200)
-#     message = models.TextField()
-#     notification_type = models.CharField(max_length=20, choices=TYPE_CHOICES)
-#     is_read = models.BooleanField(default=False)
-    
-#     created_at = models.DateTimeField(auto_now_add=True)
-#     updated_at = models.DateTimeField(auto_now=True)
\ No newline at end of file
+from django.db import models, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from appointment.models import Appointment
+from authentication.models import User
+
+
+class OutboundEmail(models.Model):
+    """Email queued by a request and delivered later by the outbox workers"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    CATEGORY_CHOICES = [
+        ('otp', 'OTP'),
+        ('invitation', 'Invitation'),
+        ('welcome', 'Welcome'),
+        ('reminder', 'Reminder'),
+        ('general', 'General'),
+    ]
+
+    recipient = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    from_email = models.CharField(max_length=254, blank=True)
+    category = models.CharField(max_length=20, choices=CATEGORY_CHOICES, default='general')
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # Earliest time a worker may pick the row up. Doubles as the lease expiry
+    # while a row is 'sending', so rows held by a crashed worker are retried.
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.category} email to {self.recipient} ({self.status})"
+
+
+class Notification(models.Model):
+    TYPE_CHOICES = [
+        ('appointment', 'Appointment'),
+        ('reminder', 'Reminder'),
+        ('system', 'System'),
+    ]
+
+    recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications')
+    sender = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='sent_notifications')
+    appointment = models.ForeignKey(Appointment, on_delete=models.CASCADE, null=True, blank=True)
+
+    title = models.CharField(max_length=200)
+    message = models.TextField()
+    notification_type = models.CharField(max_length=20, choices=TYPE_CHOICES)
+    is_read = models.BooleanField(default=False)
+    # When a reminder was due; with the constraint below each reminder is created once (see notification.reminders)
+    scheduled_for = models.DateTimeField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['appointment', 'scheduled_for'], condition=Q(notification_type='reminder'),
+                                    name='notification_reminder_once'),
+        ]
+        indexes = [
+            models.Index(fields=['scheduled_for'], condition=Q(notification_type='reminder'),
+                         name='notification_reminder_due_idx'),
+            # Unread rows only: mark-all-read and reconciliation never touch read history
+            models.Index(fields=['recipient', '-created_at'], condition=Q(is_read=False),
+                         name='notification_unread_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # The unread counter moves in post_save (notification.signals); commit both or neither.
+        # Deletes need nothing extra: the deletion collector already runs post_delete in its transaction.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.title} for {self.recipient}"
+
+
+class UnreadCounter(models.Model):
+    """A user's unread notification count, kept current by notification.unread"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='unread_counter')
+    count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.count} unread"
@@ -0,0 +1,284 @@
+# notification/outbox.py
+"""
+Transactional email outbox.
+
+Requests call ``enqueue_email`` inside their own transaction and return
+immediately. ``OutboxWorkerPool`` drains the table in the background over
+long-lived SMTP connections, retrying with exponential backoff and backing
+off the whole pool through a circuit breaker when the relay is down.
+"""
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_DEFAULTS = {
+    'WORKERS': 2,
+    'BATCH_SIZE': 20,
+    'MAX_ATTEMPTS': 5,
+    'BACKOFF_BASE_SECONDS': 5,
+    'BACKOFF_MAX_SECONDS': 600,
+    'LEASE_SECONDS': 120,
+    'POLL_INTERVAL_SECONDS': 1.0,
+    'BREAKER_FAILURE_THRESHOLD': 5,
+    'BREAKER_RESET_SECONDS': 60,
+}
+
+
+def outbox_setting(name):
+    return getattr(settings, 'EMAIL_OUTBOX', {}).get(name, OUTBOX_DEFAULTS[name])
+
+
+def enqueue_email(recipient, subject, body, html_body='', category='general', from_email=None):
+    """Queue an email for background delivery. Call inside the caller's transaction."""
+    return OutboundEmail.objects.create(
+        recipient=recipient,
+        subject=subject,
+        body=body,
+        html_body=html_body,
+        category=category,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL or '',
+    )
+
+
+def enqueue_emails(messages, category='general', from_email=None):
+    """Queue many (recipient, subject, body, html_body) emails with one insert"""
+    from_email = from_email or settings.DEFAULT_FROM_EMAIL or ''
+    return OutboundEmail.objects.bulk_create(
+        [
+            OutboundEmail(
+                recipient=recipient,
+                subject=subject,
+                body=body,
+                html_body=html_body,
+                category=category,
+                from_email=from_email,
+            )
+            for recipient, subject, body, html_body in messages
+        ],
+        batch_size=500,
+    )
+
+
+def backoff_delay(attempts):
+    """Exponential backoff with full jitter, capped at BACKOFF_MAX_SECONDS"""
+    base = outbox_setting('BACKOFF_BASE_SECONDS')
+    cap = outbox_setting('BACKOFF_MAX_SECONDS')
+    return random.uniform(0, min(cap, base * (2 ** max(attempts - 1, 0))))
+
+
+class CircuitBreaker:
+    """Stops every worker from hammering an SMTP relay that keeps failing"""
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_seconds=60):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Return True if the caller may talk to the relay right now"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                # Let exactly one worker probe the relay
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def release_probe(self):
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning("SMTP circuit breaker opened after %s failures", self.failures)
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+
+def claim_batch(batch_size):
+    """Lease up to ``batch_size`` due rows to the calling worker"""
+    now = timezone.now()
+    with transaction.atomic():
+        rows = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(Q(status='pending') | Q(status='sending'), next_attempt_at__lte=now)
+            .order_by('next_attempt_at')[:batch_size]
+        )
+        if rows:
+            OutboundEmail.objects.filter(pk__in=[row.pk for row in rows]).update(
+                status='sending',
+                next_attempt_at=now + timezone.timedelta(seconds=outbox_setting('LEASE_SECONDS')),
+            )
+    return rows
+
+
+def build_message(row, connection):
+    message = EmailMultiAlternatives(
+        subject=row.subject,
+        body=row.body,
+        from_email=row.from_email or settings.DEFAULT_FROM_EMAIL,
+        to=[row.recipient],
+        connection=connection,
+    )
+    if row.html_body:
+        message.attach_alternative(row.html_body, 'text/html')
+    return message
+
+
+class OutboxWorker(threading.Thread):
+    """Drains the outbox over a single SMTP connection that is kept open between batches"""
+
+    def __init__(self, pool, index):
+        super().__init__(name=f"outbox-worker-{index}", daemon=True)
+        self.pool = pool
+        self.connection = None
+
+    def run(self):
+        try:
+            while not self.pool.stopping.is_set():
+                if not self.pool.breaker.allow():
+                    self.close_connection()
+                    self.pool.stopping.wait(self.pool.poll_interval)
+                    continue
+
+                close_old_connections()
+                rows = claim_batch(self.pool.batch_size)
+                if not rows:
+                    # Nothing to probe the relay with; let the next caller try
+                    self.pool.breaker.release_probe()
+                    self.pool.stopping.wait(self.pool.poll_interval)
+                    continue
+
+                for row in rows:
+                    self.deliver(row)
+        finally:
+            self.close_connection()
+            close_old_connections()
+
+    def open_connection(self):
+        if self.connection is None:
+            self.connection = get_connection(fail_silently=False)
+            self.connection.open()
+        return self.connection
+
+    def close_connection(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except Exception:
+                pass
+            self.connection = None
+
+    def deliver(self, row):
+        if self.pool.breaker.state == CircuitBreaker.OPEN:
+            # Relay went down mid-batch; hand the row back without burning an attempt
+            OutboundEmail.objects.filter(pk=row.pk).update(status='pending', next_attempt_at=timezone.now())
+            return
+
+        attempts = row.attempts + 1
+        try:
+            connection = self.open_connection()
+            build_message(row, connection).send()
+        except Exception as e:
+            # Drop the connection; it may be half-closed after a protocol error
+            self.close_connection()
+            self.pool.breaker.record_failure()
+            self.pool.record('failed_attempts')
+
+            if attempts >= self.pool.max_attempts:
+                status, next_attempt_at = 'failed', timezone.now()
+                logger.error(f"Giving up on outbox email {row.pk} to {row.recipient}: {str(e)}")
+            else:
+                status = 'pending'
+                next_attempt_at = timezone.now() + timezone.timedelta(seconds=backoff_delay(attempts))
+                logger.warning(f"Outbox email {row.pk} to {row.recipient} failed (attempt {attempts}): {str(e)}")
+
+            OutboundEmail.objects.filter(pk=row.pk).update(
+                status=status,
+                attempts=attempts,
+                next_attempt_at=next_attempt_at,
+                last_error=str(e)[:1000],
+            )
+            return
+
+        self.pool.breaker.record_success()
+        self.pool.record('sent')
+        OutboundEmail.objects.filter(pk=row.pk).update(
+            status='sent',
+            attempts=attempts,
+            sent_at=timezone.now(),
+            last_error='',
+        )
+
+
+class OutboxWorkerPool:
+    """A small pool of threads sharing one circuit breaker"""
+
+    def __init__(self, workers=None, batch_size=None, poll_interval=None):
+        self.workers = workers or outbox_setting('WORKERS')
+        self.batch_size = batch_size or outbox_setting('BATCH_SIZE')
+        self.poll_interval = poll_interval or outbox_setting('POLL_INTERVAL_SECONDS')
+        self.max_attempts = outbox_setting('MAX_ATTEMPTS')
+        self.breaker = CircuitBreaker(
+            failure_threshold=outbox_setting('BREAKER_FAILURE_THRESHOLD'),
+            reset_seconds=outbox_setting('BREAKER_RESET_SECONDS'),
+        )
+        self.stopping = threading.Event()
+        self.stats = {'sent': 0, 'failed_attempts': 0}
+        self._stats_lock = threading.Lock()
+        self._threads = []
+
+    def record(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def start(self):
+        self.stopping.clear()
+        self._threads = [OutboxWorker(self, i) for i in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self.stopping.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
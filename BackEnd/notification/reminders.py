@@ -0,0 +1,388 @@
+# notification/reminders.py
+"""
+Appointment reminders.
+
+``manage.py run_reminders`` keeps every reminder due within
+LOOKAHEAD_HOURS in a hierarchical timing wheel instead of scanning the
+appointment table each minute. Scheduling, cancelling and firing a
+reminder are O(1); the loop only touches the slot under the current tick,
+plus one cascade of a coarser slot every SLOTS ticks.
+
+The wheel is kept in step with the database incrementally:
+
+- every REFRESH_SECONDS the horizon moves forward and only the newly
+  covered stretch of appointments is loaded (an index range on start_at)
+- every POLL_SECONDS the appointments updated since the last poll are
+  re-planned: a reschedule moves its reminders, a cancellation drops them
+  (an index range on updated_at)
+
+Due reminders fire in batches. Each batch is re-checked against the
+database, then written as ``Notification`` rows with one bulk_create
+(counted unread by notification.unread) and queued as emails with one
+outbox insert, in the same transaction. The outbox workers deliver them
+over their long-lived SMTP connections.
+
+Each reminder is created at most once (the notification_reminder_once
+constraint), so a restart can simply reload everything due since
+CATCH_UP_HOURS ago. Reminders missed while the scheduler was down fire on
+the first tick, minus the ones already sent and the ones a shorter missed
+reminder replaces; late reminders state the time actually left. A
+reschedule that puts a reminder in the past drops it. While running, a stalled
+loop steps through every tick it missed. Only one scheduler runs at a
+time: it holds the 'reminders' maintenance lock.
+"""
+import logging
+import math
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from appointment.models import Appointment
+from management.email_service import SITE_NAME
+from .compose import MessageTemplate
+from .models import Notification
+from .outbox import enqueue_emails
+from .unread import create_notifications
+
+logger = logging.getLogger(__name__)
+
+REMINDERS_DEFAULTS = {
+    # Minutes before the appointment; one reminder each
+    'OFFSETS_MINUTES': (1440, 60),
+    'TICK_SECONDS': 1,
+    'LOOKAHEAD_HOURS': 48,
+    'REFRESH_SECONDS': 300,
+    'POLL_SECONDS': 5,
+    # Changes are re-read this far back so a transaction that committed late is not missed
+    'POLL_OVERLAP_SECONDS': 60,
+    'CATCH_UP_HOURS': 24,
+    'BATCH_SIZE': 500,
+}
+
+# A reminder sent this much after its due time says how long is actually left
+LATE_MINUTES = 5
+
+REMINDER_EMAIL = MessageTemplate(
+    'emails/appointment_reminder',
+    "Reminder: your {site_name} appointment {lead}",
+    variables=('name', 'doctor_name', 'when'),
+)
+
+
+def reminders_setting(name):
+    return getattr(settings, 'REMINDERS', {}).get(name, REMINDERS_DEFAULTS[name])
+
+
+class TimingWheel:
+    """
+    LEVELS wheels of SLOTS buckets. A level-k bucket spans SLOTS**k ticks;
+    entries move down a level when the current tick enters their bucket's
+    span, and fire from level 0. Entries past the top level wait in an
+    overflow bucket that is re-sorted whenever the top level turns.
+    """
+
+    def __init__(self, now, tick_seconds=1, slots=64, levels=4):
+        if slots & (slots - 1):
+            raise ValueError("slots must be a power of two")
+        self.tick_seconds = tick_seconds
+        self.slots = slots
+        self.levels = levels
+        self.shift = slots.bit_length() - 1
+        self.current = self.to_tick(now)
+        self.wheels = [[{} for _ in range(slots)] for _ in range(levels)]
+        self.overflow = {}
+        # Due at or before the current tick, fired by the next advance
+        self.ready = {}
+        # key -> the bucket holding it, so cancel is O(1)
+        self.where = {}
+
+    def __len__(self):
+        return len(self.where)
+
+    def __contains__(self, key):
+        return key in self.where
+
+    def to_tick(self, moment):
+        return math.floor(moment.timestamp() / self.tick_seconds)
+
+    def schedule(self, key, due, payload=None):
+        self.cancel(key)
+        self._place(key, self.to_tick(due), payload)
+
+    def cancel(self, key):
+        bucket = self.where.pop(key, None)
+        if bucket is not None:
+            del bucket[key]
+
+    def _place(self, key, due_tick, payload):
+        delta = due_tick - self.current
+        bucket = self.overflow
+        if delta <= 0:
+            bucket = self.ready
+        else:
+            for level in range(self.levels):
+                if delta < 1 << (self.shift * (level + 1)):
+                    bucket = self.wheels[level][(due_tick >> (self.shift * level)) & (self.slots - 1)]
+                    break
+        bucket[key] = (due_tick, payload)
+        self.where[key] = bucket
+
+    def _cascade(self, bucket):
+        entries = list(bucket.items())
+        bucket.clear()
+        for key, (due_tick, payload) in entries:
+            self._place(key, due_tick, payload)
+
+    def advance(self, now):
+        """Move to ``now``, stepping through every tick in between. Returns [(key, due_tick, payload)] that fired."""
+        target = self.to_tick(now)
+        fired = self._drain(self.ready)
+        mask = self.slots - 1
+        while self.current < target:
+            self.current += 1
+            # Top level first, so entries it hands down are cascaded again in the same step
+            for level in range(self.levels - 1, 0, -1):
+                if self.current & ((1 << (self.shift * level)) - 1) == 0:
+                    if level == self.levels - 1 and self.current & ((1 << (self.shift * self.levels)) - 1) == 0:
+                        self._cascade(self.overflow)
+                    self._cascade(self.wheels[level][(self.current >> (self.shift * level)) & mask])
+            fired += self._drain(self.wheels[0][self.current & mask])
+            fired += self._drain(self.ready)
+        return fired
+
+    def _drain(self, bucket):
+        if not bucket:
+            return []
+        fired = [(key, due_tick, payload) for key, (due_tick, payload) in bucket.items()]
+        for key in bucket:
+            del self.where[key]
+        bucket.clear()
+        return fired
+
+
+def lead_text(minutes):
+    if minutes % 1440 == 0:
+        days = minutes // 1440
+        return "tomorrow" if days == 1 else f"in {days} days"
+    if minutes % 60 == 0:
+        hours = minutes // 60
+        return "in 1 hour" if hours == 1 else f"in {hours} hours"
+    return "in 1 minute" if minutes == 1 else f"in {minutes} minutes"
+
+
+def lead_at(start_at, minutes, now):
+    """
+    How far off the appointment is when a ``minutes`` reminder goes out at
+    ``now``: the offset itself when on time, the actual time left when late
+    (after a restart, or for an appointment moved closer).
+    """
+    left = (start_at - now).total_seconds() / 60
+    if left >= minutes - LATE_MINUTES:
+        return lead_text(minutes)
+    if left >= 90:
+        return lead_text(round(left / 60) * 60)
+    return lead_text(max(1, math.ceil(left)))
+
+
+def superseded(start_at, created_at, minutes, offsets, now):
+    """Whether a shorter reminder of the same appointment is also due by ``now``, making this one redundant"""
+    return any(
+        shorter < minutes and start_at - timedelta(minutes=shorter) <= now
+        and (created_at is None or start_at - timedelta(minutes=shorter) > created_at)
+        for shorter in offsets
+    )
+
+
+def due_reminders(appointment_id, start_at, created_at, offsets):
+    """[(key, due)] for an appointment; reminders that would fall before it was booked are skipped"""
+    reminders = []
+    for minutes in offsets:
+        due = start_at - timedelta(minutes=minutes)
+        if created_at is None or due > created_at:
+            reminders.append(((appointment_id, minutes), due))
+    return reminders
+
+
+class ReminderScheduler:
+    def __init__(self, now=None, offsets=None):
+        now = now or timezone.now()
+        self.offsets = tuple(offsets or reminders_setting('OFFSETS_MINUTES'))
+        self.wheel = TimingWheel(now, tick_seconds=reminders_setting('TICK_SECONDS'))
+        self.loaded_from = now - timedelta(hours=reminders_setting('CATCH_UP_HOURS'))
+        self.loaded_until = self.loaded_from
+        self.polled_at = now
+        self.refreshed_at = None
+        # key -> due of reminders already handled, so re-read changes do not fire them again
+        self.handled = {}
+        self.stats = {'loaded': 0, 'rescheduled': 0, 'fired': 0, 'sent': 0, 'skipped': 0}
+
+    # Keeping the wheel in step
+
+    def plan(self, appointment_id, start_at, created_at, status, now):
+        """
+        (Re)schedule one appointment's reminders inside the loaded window
+        after a change seen at ``now``; returns how many. Reminders that the
+        change put in the past are dropped rather than sent late.
+        """
+        for minutes in self.offsets:
+            self.wheel.cancel((appointment_id, minutes))
+        if status not in ('pending', 'confirmed'):
+            return 0
+        # Changes reach the poll up to POLL_SECONDS after they are made
+        stale = now - timedelta(seconds=reminders_setting('POLL_SECONDS'))
+        planned = 0
+        for key, due in due_reminders(appointment_id, start_at, created_at, self.offsets):
+            if due < stale:
+                continue
+            if self.loaded_from <= due < self.loaded_until and self.handled.get(key) != due:
+                self.wheel.schedule(key, due, due)
+                planned += 1
+        return planned
+
+    def load(self, until):
+        """Schedule reminders due in [loaded_until, until) that were not sent yet"""
+        since = self.loaded_until
+        if until <= since:
+            return 0
+        appointments = Appointment.objects.filter(
+            status__in=('pending', 'confirmed'),
+            start_at__gte=since + timedelta(minutes=min(self.offsets)),
+            start_at__lt=until + timedelta(minutes=max(self.offsets)),
+        ).values_list('id', 'start_at', 'updated_at')
+        sent = set(Notification.objects.filter(
+            notification_type='reminder', scheduled_for__gte=since, scheduled_for__lt=until,
+        ).values_list('appointment_id', 'scheduled_for'))
+        loaded = 0
+        for appointment_id, start_at, updated_at in appointments.iterator(chunk_size=2000):
+            # Due before the appointment last changed: sent already, or made stale by a reschedule
+            for key, due in due_reminders(appointment_id, start_at, updated_at, self.offsets):
+                if since <= due < until and (appointment_id, due) not in sent:
+                    self.wheel.schedule(key, due, due)
+                    loaded += 1
+        self.loaded_until = until
+        self.stats['loaded'] += loaded
+        return loaded
+
+    def poll_changes(self, now):
+        """Re-plan appointments updated since the last poll; returns how many were seen"""
+        since = self.polled_at - timedelta(seconds=reminders_setting('POLL_OVERLAP_SECONDS'))
+        changed = Appointment.objects.filter(updated_at__gte=since).values_list(
+            'id', 'start_at', 'created_at', 'status'
+        )
+        seen = 0
+        for appointment_id, start_at, created_at, status in changed.iterator(chunk_size=2000):
+            self.plan(appointment_id, start_at, created_at, status, now)
+            seen += 1
+        self.polled_at = now
+        self.stats['rescheduled'] += seen
+        return seen
+
+    # Firing
+
+    def fire(self, now):
+        """Deliver every reminder due by ``now``; returns how many were sent"""
+        due = [(key, payload) for key, _, payload in self.wheel.advance(now)]
+        self.stats['fired'] += len(due)
+        sent = 0
+        size = reminders_setting('BATCH_SIZE')
+        for start in range(0, len(due), size):
+            try:
+                sent += self.deliver(due[start:start + size], now)
+            except Exception:
+                # Back on the wheel to fire again on the next tick
+                for key, when in due[start:]:
+                    self.wheel.schedule(key, when, when)
+                raise
+            self.handled.update(due[start:start + size])
+        return sent
+
+    def deliver(self, reminders, now=None):
+        """
+        Write one batch of (key, due) reminders as notifications and queued
+        emails. Reminders delivered late (catch-up after a restart) skip the
+        ones a shorter, also due reminder replaces, and state the time left.
+        """
+        now = now or timezone.now()
+        by_id = {}
+        for (appointment_id, minutes), due in reminders:
+            by_id.setdefault(appointment_id, []).append((minutes, due))
+        appointments = Appointment.objects.filter(
+            pk__in=by_id, status__in=('pending', 'confirmed')
+        ).select_related('patient', 'doctor__user').only(
+            'id', 'start_at', 'created_at', 'patient', 'doctor', 'doctor__user', 'patient__email', 'patient__first_name', 'patient__middle_name',
+            'patient__last_name', 'doctor__user__first_name', 'doctor__user__middle_name',
+            'doctor__user__last_name',
+        )
+        already = set(Notification.objects.filter(
+            notification_type='reminder', appointment_id__in=by_id,
+            scheduled_for__in={due for pending in by_id.values() for _, due in pending},
+        ).values_list('appointment_id', 'scheduled_for'))
+
+        notifications, emails = [], []
+        for appointment in appointments:
+            for minutes, due in by_id[appointment.pk]:
+                # Moved since it was scheduled: the change poll has planned its new time
+                if appointment.start_at - timedelta(minutes=minutes) != due or (appointment.pk, due) in already:
+                    continue
+                if superseded(appointment.start_at, appointment.created_at, minutes, self.offsets, now):
+                    continue
+                doctor_name = f"Dr. {appointment.doctor.user.get_full_name()}"
+                when = timezone.localtime(appointment.start_at).strftime('%A, %B %d at %I:%M %p')
+                lead = lead_at(appointment.start_at, minutes, now)
+                notifications.append(Notification(
+                    recipient_id=appointment.patient_id,
+                    appointment_id=appointment.pk,
+                    title='Appointment reminder',
+                    message=f"Your appointment with {doctor_name} is {lead}, on {when}.",
+                    notification_type='reminder',
+                    scheduled_for=due,
+                ))
+                emails.append((appointment.patient.email, *REMINDER_EMAIL.render({
+                    'site_name': SITE_NAME, 'lead': lead,
+                    'name': appointment.patient.get_full_name(), 'doctor_name': doctor_name, 'when': when,
+                })))
+
+        if notifications:
+            with transaction.atomic():
+                create_notifications(notifications)
+                enqueue_emails(emails, category='reminder')
+        self.stats['sent'] += len(notifications)
+        self.stats['skipped'] += len(reminders) - len(notifications)
+        return len(notifications)
+
+    # Loop
+
+    def step(self, now=None):
+        """One scheduler iteration: extend the horizon, apply changes, fire what is due"""
+        now = now or timezone.now()
+        if self.refreshed_at is None or (now - self.refreshed_at).total_seconds() >= reminders_setting('REFRESH_SECONDS'):
+            self.load(now + timedelta(hours=reminders_setting('LOOKAHEAD_HOURS')))
+            self.refreshed_at = now
+            horizon = now - timedelta(seconds=reminders_setting('POLL_OVERLAP_SECONDS'))
+            self.handled = {key: due for key, due in self.handled.items() if due >= horizon}
+        if (now - self.polled_at).total_seconds() >= reminders_setting('POLL_SECONDS'):
+            self.poll_changes(now)
+        return self.fire(now)
+
+    def run_forever(self, stopping, holds_lock=None):
+        """
+        Step every tick until ``stopping`` (a threading.Event) is set.
+        ``holds_lock`` is checked each tick; returns False if it reported the
+        lock lost, True when stopped.
+        """
+        tick = reminders_setting('TICK_SECONDS')
+        while not stopping.is_set():
+            if holds_lock is not None and not holds_lock():
+                logger.error("Reminder scheduler lost its lock, stopping")
+                return False
+            try:
+                sent = self.step()
+                if sent:
+                    logger.info(f"Sent {sent} appointment reminders")
+            except Exception as e:
+                # Unsent reminders stay on the wheel and fire on a later tick
+                logger.error(f"Reminder scheduler step failed: {str(e)}")
+            stopping.wait(tick)
+        return True
@@ -0,0 +1,32 @@
+# notification/signals.py
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from . import unread
+from .models import Notification
+
+
+# Remember the unread state as loaded so a save only counts a change.
+# __dict__ is read directly so deferred fields stay unloaded.
+
+@receiver(post_init, sender=Notification)
+def remember_unread(sender, instance, **kwargs):
+    instance._counted_unread = instance.__dict__.get('is_read') is False
+
+
+@receiver(post_save, sender=Notification)
+def count_saved_notification(sender, instance, created, **kwargs):
+    is_read = instance.__dict__.get('is_read')
+    if is_read is None:
+        return
+    now_unread = not is_read
+    counted = False if created else instance._counted_unread
+    if now_unread != counted:
+        unread.increment(instance.recipient_id, 1 if now_unread else -1)
+    instance._counted_unread = now_unread
+
+
+@receiver(post_delete, sender=Notification)
+def count_deleted_notification(sender, instance, **kwargs):
+    if instance._counted_unread:
+        unread.increment(instance.recipient_id, -1)
@@ -0,0 +1,81 @@
+# notification/smtp_sink.py
+"""
+Minimal local SMTP server for benchmarks.
+
+Speaks just enough SMTP for Django's SMTP backend (no TLS, no AUTH) and can
+add an artificial delay to every reply to imitate a slow relay.
+"""
+import socketserver
+import threading
+import time
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        self.reply("220 localhost SMTP sink ready")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors='replace').strip().upper()
+
+            if command.startswith(("EHLO", "HELO")):
+                self.reply("250-localhost")
+                self.wfile.write(b"250 8BITMIME\r\n")
+            elif command == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b".\r\n", b".\n", b""):
+                    pass
+                with self.server.lock:
+                    self.server.received += 1
+                self.reply("250 OK queued")
+            elif command == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                # MAIL, RCPT, RSET, NOOP
+                self.reply("250 OK")
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    """Threaded SMTP sink on 127.0.0.1; use as a context manager"""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, latency=0.0, port=0):
+        super().__init__(("127.0.0.1", port), _SMTPHandler)
+        self.latency = latency
+        self.received = 0
+        self.lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def email_settings(self):
+        """Settings overrides that point Django's SMTP backend at this sink"""
+        return {
+            'EMAIL_BACKEND': 'django.core.mail.backends.smtp.EmailBackend',
+            'EMAIL_HOST': '127.0.0.1',
+            'EMAIL_PORT': self.port,
+            'EMAIL_USE_TLS': False,
+            'EMAIL_USE_SSL': False,
+            'EMAIL_HOST_USER': '',
+            'EMAIL_HOST_PASSWORD': '',
+            'DEFAULT_FROM_EMAIL': 'bench@localhost',
+        }
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
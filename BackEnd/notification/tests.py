@@ -1,3 +1,132 @@
-from django.test import TestCase
+from datetime import datetime, timedelta, timezone as dt_timezone
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase
+
+from authentication.models import User
+from . import unread
+from .models import Notification, UnreadCounter
+from .reminders import TimingWheel
+
+START = datetime(2026, 1, 5, 8, 0, tzinfo=dt_timezone.utc)
+
+
+class TimingWheelTests(SimpleTestCase):
+    def run_wheel(self, wheel, until):
+        """Advance one second at a time; {key: tick it fired on}"""
+        fired = {}
+        moment = START
+        while moment < START + timedelta(seconds=until):
+            moment += timedelta(seconds=1)
+            for key, due_tick, _ in wheel.advance(moment):
+                self.assertNotIn(key, fired)
+                fired[key] = wheel.current
+                self.assertEqual(due_tick, wheel.current)
+        return fired
+
+    def test_entries_fire_on_their_due_tick(self):
+        # Two levels of four slots: level 0 spans 4 ticks, level 1 spans 16, the rest overflows
+        wheel = TimingWheel(START, tick_seconds=1, slots=4, levels=2)
+        offsets = {'next': 1, 'slot-edge': 3, 'level-1': 4, 'level-1-edge': 15, 'overflow': 16, 'far': 70}
+        for key, seconds in offsets.items():
+            wheel.schedule(key, START + timedelta(seconds=seconds), payload=seconds)
+        self.assertEqual(len(wheel), len(offsets))
+
+        fired = self.run_wheel(wheel, 80)
+        start_tick = wheel.to_tick(START)
+        self.assertEqual(fired, {key: start_tick + seconds for key, seconds in offsets.items()})
+        self.assertEqual(len(wheel), 0)
+
+    def test_payload_and_batched_advance(self):
+        wheel = TimingWheel(START, slots=64, levels=4)
+        wheel.schedule('a', START + timedelta(seconds=10), payload={'id': 1})
+        wheel.schedule('b', START + timedelta(hours=3), payload={'id': 2})
+        self.assertEqual(wheel.advance(START + timedelta(seconds=9)), [])
+        fired = wheel.advance(START + timedelta(hours=3))
+        self.assertEqual([(key, payload) for key, _, payload in fired], [('a', {'id': 1}), ('b', {'id': 2})])
+
+    def test_past_due_entry_fires_on_the_next_advance(self):
+        wheel = TimingWheel(START)
+        wheel.schedule('late', START - timedelta(minutes=5))
+        self.assertEqual([key for key, _, _ in wheel.advance(START)], ['late'])
+
+    def test_cancel_and_reschedule(self):
+        wheel = TimingWheel(START, slots=4, levels=2)
+        wheel.schedule('cancelled', START + timedelta(seconds=5))
+        wheel.schedule('moved', START + timedelta(seconds=5))
+        wheel.cancel('cancelled')
+        wheel.cancel('never-scheduled')
+        wheel.schedule('moved', START + timedelta(seconds=30))
+        self.assertNotIn('cancelled', wheel)
+
+        fired = self.run_wheel(wheel, 40)
+        self.assertEqual(fired, {'moved': wheel.to_tick(START) + 30})
+
+    def test_slots_must_be_a_power_of_two(self):
+        with self.assertRaises(ValueError):
+            TimingWheel(START, slots=60)
+
+
+class UnreadCounterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='patient@example.com', password=None, first_name='Pat',
+                                             last_name='Ient', user_type='patient')
+        self.other = User.objects.create_user(email='other@example.com', password=None, first_name='Oth',
+                                              last_name='Er', user_type='patient')
+
+    def notify(self, recipient=None, **fields):
+        return Notification.objects.create(recipient=recipient or self.user, title='Hello', message='Hi',
+                                           notification_type='system', **fields)
+
+    def count(self, user=None):
+        return unread.unread_count((user or self.user).pk)
+
+    def test_create_counts_unread_only(self):
+        self.assertEqual(self.count(), 0)
+        self.notify()
+        self.notify(is_read=True)
+        self.assertEqual(self.count(), 1)
+        self.assertEqual(self.count(self.other), 0)
+
+    def test_saves_and_deletes_move_the_counter(self):
+        notification = self.notify()
+        notification.title = 'Edited'
+        notification.save()
+        self.assertEqual(self.count(), 1)
+        notification.is_read = True
+        notification.save()
+        self.assertEqual(self.count(), 0)
+
+        self.notify().delete()
+        self.notify(is_read=True).delete()
+        self.assertEqual(self.count(), 0)
+
+    def test_bulk_create(self):
+        unread.create_notifications([
+            Notification(recipient=recipient, title='Hello', message='Hi', notification_type='system', is_read=is_read)
+            for recipient, is_read in [(self.user, False), (self.user, False), (self.user, True), (self.other, False)]
+        ])
+        self.assertEqual((self.count(), self.count(self.other)), (2, 1))
+
+    def test_mark_read(self):
+        first, second, _ = self.notify(), self.notify(), self.notify()
+        someone_elses = self.notify(recipient=self.other)
+        self.assertEqual(unread.mark_read(self.user.pk, [first.pk, second.pk, someone_elses.pk]), 2)
+        self.assertEqual(unread.mark_read(self.user.pk, [first.pk]), 0)
+        self.assertEqual((self.count(), self.count(self.other)), (1, 1))
+
+    def test_mark_all_read(self):
+        for _ in range(3):
+            self.notify()
+        self.notify(recipient=self.other)
+        self.assertEqual(unread.mark_all_read(self.user.pk), 3)
+        self.assertEqual(unread.mark_all_read(self.user.pk), 0)
+        self.assertEqual((self.count(), self.count(self.other)), (0, 1))
+        self.assertEqual(unread.reconcile(), {})
+
+    def test_reconcile_fixes_drift(self):
+        self.notify()
+        # Bypasses the helpers, so the counter drifts
+        Notification.objects.filter(recipient=self.user).update(is_read=True)
+        with self.assertLogs('notification.unread', 'WARNING'):
+            self.assertEqual(unread.reconcile(), {self.user.pk: (1, 0)})
+        self.assertEqual(UnreadCounter.objects.get(pk=self.user.pk).count, 0)
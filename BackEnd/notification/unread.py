@@ -0,0 +1,144 @@
+# notification/unread.py
+"""
+Per-user unread notification counts kept in the UnreadCounter table.
+
+Every change to a notification's unread state adjusts its recipient's
+counter with an ``F()`` increment inside the same transaction, so a
+rollback undoes both and concurrent writers never lose an update:
+
+- a single save or delete, through notification.signals (Notification.save
+  opens a transaction for the insert and the increment)
+- ``create_notifications`` for bulk_create, which sends no signals
+- ``mark_read`` and ``mark_all_read``, one UPDATE each plus the decrement
+  of the rows it actually flipped
+
+The badge (``unread_count``) is then one primary-key read instead of a
+COUNT(*) over the user's notifications.
+
+``reconcile()`` recounts unread rows (the notification_unread_idx partial
+index) and fixes any drift from writes that bypass the helpers above. It
+runs as the reconcile_unread_counters maintenance job.
+"""
+import logging
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from authentication.models import User
+from .models import Notification, UnreadCounter
+
+logger = logging.getLogger(__name__)
+
+
+def adjust(deltas):
+    """Apply {user_id: delta} to the counters, creating missing rows; call inside the writing transaction"""
+    by_delta = defaultdict(list)
+    for user_id, delta in deltas.items():
+        if delta:
+            by_delta[delta].append(user_id)
+    now = timezone.now()
+    for delta, user_ids in by_delta.items():
+        counters = UnreadCounter.objects.filter(user_id__in=user_ids)
+        # A missing row has nothing to decrement (its user may be mid-delete); reconcile settles it
+        if counters.update(count=F('count') + delta, updated_at=now) == len(user_ids) or delta < 0:
+            continue
+        # First unread change for some users: create them at 0, then increment,
+        # so two writers creating the same row both keep their delta
+        existing = set(counters.values_list('user_id', flat=True))
+        missing = [user_id for user_id in user_ids if user_id not in existing]
+        UnreadCounter.objects.bulk_create([UnreadCounter(user_id=user_id) for user_id in missing],
+                                          ignore_conflicts=True)
+        UnreadCounter.objects.filter(user_id__in=missing).update(count=F('count') + delta, updated_at=now)
+
+
+def increment(user_id, delta=1):
+    adjust({user_id: delta})
+
+
+def unread_count(user_id):
+    """The badge: one primary-key read; users without a row have nothing unread"""
+    count = UnreadCounter.objects.filter(pk=user_id).values_list('count', flat=True).first()
+    return max(count or 0, 0)
+
+
+def create_notifications(notifications, batch_size=500):
+    """bulk_create ``notifications`` and count the unread ones, in one transaction"""
+    with transaction.atomic():
+        created = Notification.objects.bulk_create(notifications, batch_size=batch_size)
+        adjust(Counter(notification.recipient_id for notification in created if not notification.is_read))
+    return created
+
+
+def mark_read(user_id, notification_ids):
+    """Mark some of a user's notifications read. Returns how many were unread."""
+    with transaction.atomic():
+        marked = Notification.objects.filter(
+            recipient_id=user_id, pk__in=notification_ids, is_read=False,
+        ).update(is_read=True, updated_at=timezone.now())
+        increment(user_id, -marked)
+    return marked
+
+
+def mark_all_read(user_id):
+    """Mark every unread notification of a user read. Returns how many there were."""
+    with transaction.atomic():
+        # Decrement by the rows flipped rather than zeroing, so a notification
+        # created concurrently (and its increment) is not lost
+        marked = Notification.objects.filter(recipient_id=user_id, is_read=False).update(
+            is_read=True, updated_at=timezone.now(),
+        )
+        increment(user_id, -marked)
+    return marked
+
+
+def true_counts(user_ids):
+    """{user_id: unread} for those of ``user_ids`` with unread notifications"""
+    return dict(
+        Notification.objects.filter(recipient_id__in=user_ids, is_read=False).values_list('recipient_id')
+        .annotate(total=Count('id')).order_by()
+    )
+
+
+def reconcile_users(user_ids):
+    """Recount ``user_ids`` and overwrite their drifted counters. Returns {user_id: (old, new)}."""
+    with transaction.atomic():
+        # Lock first, then count: see management.counters.reconcile
+        stored = dict(UnreadCounter.objects.select_for_update().filter(user_id__in=user_ids)
+                      .values_list('user_id', 'count'))
+        counts = true_counts(user_ids)
+        drift = {
+            user_id: (stored.get(user_id, 0), counts.get(user_id, 0))
+            for user_id in stored.keys() | counts.keys()
+            if stored.get(user_id, 0) != counts.get(user_id, 0)
+        }
+        UnreadCounter.objects.bulk_create(
+            [UnreadCounter(user_id=user_id) for user_id in drift if user_id not in stored], ignore_conflicts=True,
+        )
+        now = timezone.now()
+        for user_id, (_, value) in drift.items():
+            UnreadCounter.objects.filter(pk=user_id).update(count=value, updated_at=now)
+    return drift
+
+
+def reconcile(batch_size=1000):
+    """
+    Recount every user's unread notifications and fix drifted counters,
+    batch_size users per transaction so badge writes are only held up
+    briefly. Returns {user_id: (old, new)}.
+    """
+    drift = {}
+    user_ids = User.objects.order_by('pk').values_list('pk', flat=True)
+    batch = []
+    for user_id in user_ids.iterator(chunk_size=batch_size):
+        batch.append(user_id)
+        if len(batch) == batch_size:
+            drift.update(reconcile_users(batch))
+            batch = []
+    if batch:
+        drift.update(reconcile_users(batch))
+
+    if drift:
+        logger.warning(f"Unread notification counters drifted for {len(drift)} users")
+    return drift
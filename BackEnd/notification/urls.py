@@ -0,0 +1,12 @@
+# notification/urls.py
+from django.urls import path
+from . import views
+
+app_name = 'notification'
+
+urlpatterns = [
+    path('notifications/', views.notifications, name='notifications'),
+    path('notifications/unread-count/', views.unread_badge, name='unread_badge'),
+    path('notifications/read/', views.mark_notifications_read, name='mark_notifications_read'),
+    path('notifications/read-all/', views.mark_all_notifications_read, name='mark_all_notifications_read'),
+]
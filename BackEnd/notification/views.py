@@ -1,3 +1,67 @@
-from django.shortcuts import render
+# notification/views.py
+from rest_framework import status, permissions
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
 
-# Create your views here.
+from Core.pagination import InvalidCursor, KeysetPaginator, with_next_link
+from .models import Notification
+from .serializers import MarkReadSerializer, NotificationSerializer
+from .unread import mark_all_read, mark_read, unread_count
+
+NOTIFICATIONS = KeysetPaginator(('-created_at', '-id'), max_limit=100)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def notifications(request):
+    """The user's notifications, newest first (?cursor=, ?limit=, ?unread=true)"""
+    queryset = Notification.objects.filter(recipient=request.user)
+    if request.GET.get('unread') in ('1', 'true'):
+        queryset = queryset.filter(is_read=False)
+    try:
+        rows, next_cursor = NOTIFICATIONS.paginate(queryset, request.GET)
+    except InvalidCursor as e:
+        return Response({
+            'success': False,
+            'message': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    serializer = NotificationSerializer(rows, many=True)
+    return with_next_link(request, Response(serializer.data), next_cursor)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def unread_badge(request):
+    """Unread notification count for the app badge; one primary-key read (see notification.unread)"""
+    return Response({'unread': unread_count(request.user.pk)})
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def mark_notifications_read(request):
+    """Mark the given notification ids read"""
+    serializer = MarkReadSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response({
+            'success': False,
+            'errors': serializer.errors
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    marked = mark_read(request.user.pk, serializer.validated_data['ids'])
+    return Response({
+        'success': True,
+        'marked': marked,
+        'unread': unread_count(request.user.pk)
+    })
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def mark_all_notifications_read(request):
+    marked = mark_all_read(request.user.pk)
+    return Response({
+        'success': True,
+        'marked': marked,
+        'unread': unread_count(request.user.pk)
+    })
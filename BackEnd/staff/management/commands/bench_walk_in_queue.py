@@ -0,0 +1,105 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from authentication.models import User
+from doctor.models import Doctor, Specialization
+from staff.models import WalkIn
+from staff.queue import PRIORITIES, WalkInQueues
+
+BENCH_DOMAIN = 'walk-in.bench.invalid'
+BENCH_SPECIALIZATION = 'Walk-in bench'
+
+
+def cleanup():
+    User.objects.filter(email__endswith=f"@{BENCH_DOMAIN}").delete()
+    Specialization.objects.filter(name=BENCH_SPECIALIZATION).delete()
+
+
+def polled_position(walk_in):
+    """What the front desk would otherwise run on every refresh"""
+    return WalkIn.objects.filter(doctor_id=walk_in.doctor_id, status='waiting').filter(
+        Q(priority__lt=walk_in.priority)
+        | Q(priority=walk_in.priority, queued_at__lt=walk_in.queued_at)
+        | Q(priority=walk_in.priority, queued_at=walk_in.queued_at, id__lt=walk_in.pk)
+    ).count()
+
+
+class Command(BaseCommand):
+    help = ("Run random enqueue/next/requeue/leave traffic through the walk-in queues, check every position "
+            "against the database, and compare queue lookups with polling the WalkIn table")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctors', type=int, default=20)
+        parser.add_argument('--operations', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        cleanup()
+        rng = random.Random(0)
+        try:
+            specialization = Specialization.objects.create(name=BENCH_SPECIALIZATION)
+            doctor_ids = []
+            for i in range(options['doctors']):
+                user = User.objects.create_user(email=f"doctor-{i}@{BENCH_DOMAIN}", password=None,
+                                                first_name='Bench', last_name=f"Doctor {i}", user_type='doctor')
+                doctor_ids.append(Doctor.objects.create(user=user, specialization=specialization,
+                                                        license_number=f"WALKIN-{i}", consultation_fee=0).pk)
+
+            queues = WalkInQueues(version_check_seconds=3600)
+            started = time.perf_counter()
+            counts = {'enqueue': 0, 'next': 0, 'requeue': 0, 'leave': 0, 'finish': 0}
+            for _ in range(options['operations']):
+                doctor_id = rng.choice(doctor_ids)
+                roll = rng.random()
+                if roll < 0.5:
+                    queues.enqueue(doctor_id, 'Walk-in', rng.randrange(PRIORITIES))
+                    counts['enqueue'] += 1
+                elif roll < 0.75:
+                    walk_in = queues.call_next(doctor_id)
+                    counts['next'] += 1
+                    if walk_in is not None and rng.random() < 0.8:
+                        queues.finish(walk_in)
+                        counts['finish'] += 1
+                else:
+                    walk_in = WalkIn.objects.filter(doctor_id=doctor_id, status__in=('waiting', 'called')).order_by('?').first()
+                    if walk_in is None:
+                        continue
+                    if roll < 0.9:
+                        queues.requeue(walk_in, rng.randrange(PRIORITIES))
+                        counts['requeue'] += 1
+                    else:
+                        queues.leave(walk_in)
+                        counts['leave'] += 1
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"{options['operations']} operations on {len(doctor_ids)} doctors in {elapsed:.2f}s "
+                              f"({', '.join(f'{key} {value}' for key, value in counts.items())})")
+
+            # Every in-memory position must match a fresh count from the table, and a fresh load must agree
+            waiting = list(WalkIn.objects.filter(doctor_id__in=doctor_ids, status='waiting'))
+            fresh = WalkInQueues()
+            for walk_in in waiting:
+                expected = polled_position(walk_in)
+                if queues.estimate_wait(walk_in)[0] != expected or fresh.estimate_wait(walk_in)[0] != expected:
+                    raise CommandError(f"Walk-in {walk_in.pk}: queue position disagrees with the database")
+            self.stdout.write(f"{len(waiting)} waiting walk-ins: positions match the database")
+
+            started = time.perf_counter()
+            for walk_in in waiting:
+                polled_position(walk_in)
+            polled = (time.perf_counter() - started) / len(waiting) * 1e6
+            started = time.perf_counter()
+            for walk_in in waiting:
+                queues.estimate_wait(walk_in)
+            in_memory = (time.perf_counter() - started) / len(waiting) * 1e6
+            self.stdout.write(f"position lookup: polling {polled:,.0f}us, queue {in_memory:,.1f}us "
+                              f"({polled / in_memory:.0f}x)")
+
+            started = time.perf_counter()
+            for _ in range(200):
+                queues.least_loaded(doctor_ids)
+            self.stdout.write(f"least loaded of {len(doctor_ids)} doctors: "
+                              f"{(time.perf_counter() - started) / 200 * 1e6:,.0f}us")
+        finally:
+            cleanup()
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:55
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('doctor', '0002_working_hours'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WalkIn',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=150)),
+                ('priority', models.PositiveSmallIntegerField(choices=[(0, 'Emergency'), (1, 'Urgent'), (2, 'Normal')], default=2)),
+                ('status', models.CharField(choices=[('waiting', 'Waiting'), ('called', 'Called'), ('done', 'Done'), ('left', 'Left')], default='waiting', max_length=10)),
+                ('queued_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('called_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='walk_ins', to='doctor.doctor')),
+                ('patient', models.ForeignKey(blank=True, limit_choices_to={'user_type': 'patient'}, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='walk_ins', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['priority', 'queued_at', 'id'],
+                'indexes': [models.Index(condition=models.Q(('status', 'waiting')), fields=['doctor', 'queued_at'], name='walk_in_waiting_idx'), models.Index(condition=models.Q(('status', 'done')), fields=['doctor', '-finished_at'], name='walk_in_done_idx')],
+            },
+        ),
+    ]
@@ -1,3 +1,46 @@
+# staff/models.py
 from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+from authentication.models import User
+from doctor.models import Doctor
 
-# Create your models here.
+class WalkIn(models.Model):
+    PRIORITY_CHOICES = [
+        (0, 'Emergency'),
+        (1, 'Urgent'),
+        (2, 'Normal'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('waiting', 'Waiting'),
+        ('called', 'Called'),
+        ('done', 'Done'),
+        ('left', 'Left'),
+    ]
+    
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='walk_ins')
+    # Walk-ins need not have an account; name is what the front desk calls out
+    patient = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True,
+                                limit_choices_to={'user_type': 'patient'}, related_name='walk_ins')
+    name = models.CharField(max_length=150)
+    priority = models.PositiveSmallIntegerField(choices=PRIORITY_CHOICES, default=2)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='waiting')
+    # Queue order within a priority; a requeue to the back moves it (see staff.queue)
+    queued_at = models.DateTimeField(default=timezone.now)
+    called_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['priority', 'queued_at', 'id']
+        indexes = [
+            # Queue loads read only the waiting rows of one doctor
+            models.Index(fields=['doctor', 'queued_at'], condition=Q(status='waiting'),
+                         name='walk_in_waiting_idx'),
+            models.Index(fields=['doctor', '-finished_at'], condition=Q(status='done'), name='walk_in_done_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.name} for {self.doctor} ({self.get_status_display()})"
@@ -0,0 +1,376 @@
+# staff/queue.py
+"""
+Walk-in queues for the front desk.
+
+Each doctor's waiting walk-ins live in memory as a heap keyed by
+(priority, ticket), where a ticket is the walk-in's place in arrival
+(queued_at) order within this process's copy of the queue. Alongside it, one growable Fenwick tree per
+priority level counts waiting tickets. That makes every operation
+O(log n):
+
+- enqueue: push a new ticket
+- call_next: pop the smallest live key (stale keys are skipped)
+- requeue: push the walk-in again under a new key
+- estimate_wait: everyone of higher priority, plus this level's waiting
+  tickets below ours (a Fenwick prefix sum), times the doctor's average
+  service time
+
+Every change is written through to WalkIn first, so queues survive
+restarts and are shared between processes. A process rebuilds a doctor's
+queue from the waiting rows when its version in the shared cache moves
+(checked at most every VERSION_CHECK_SECONDS), and calling a patient is
+a conditional UPDATE on status='waiting', so two desks never call the
+same walk-in.
+
+``least_loaded`` is the merged view over a specialization's doctors: it
+ranks them by the expected wait of a new arrival and picks the shortest.
+"""
+import heapq
+import threading
+import time
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import WalkIn
+
+WALK_INS_DEFAULTS = {
+    'DEFAULT_SERVICE_MINUTES': 15,
+    # Average service time is seeded from visits finished in this many days
+    'SERVICE_WINDOW_DAYS': 7,
+    # Weight of each finished visit in the running average
+    'SERVICE_SMOOTHING': 0.2,
+    'VERSION_CHECK_SECONDS': 2,
+}
+
+PRIORITIES = len(WalkIn.PRIORITY_CHOICES)
+NORMAL = WalkIn.PRIORITY_CHOICES[-1][0]
+
+
+def walk_ins_setting(name):
+    return getattr(settings, 'WALK_INS', {}).get(name, WALK_INS_DEFAULTS[name])
+
+
+def version_key(doctor_id):
+    return f"walk_ins:version:{doctor_id}"
+
+
+def bump_version(doctor_id):
+    key = version_key(doctor_id)
+    if cache.add(key, 1, None):
+        return 1
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+        return 1
+
+
+class Fenwick:
+    """Counts by position (1-based) with O(log n) prefix sums; positions are only ever appended"""
+
+    def __init__(self):
+        self.tree = [0]
+
+    def append(self, value):
+        # Node i covers positions (i - lowbit(i), i]: fold in the nodes below it
+        i = len(self.tree)
+        total, j, stop = value, i - 1, i - (i & -i)
+        while j > stop:
+            total += self.tree[j]
+            j -= j & -j
+        self.tree.append(total)
+        return i
+
+    def add(self, i, delta):
+        while i < len(self.tree):
+            self.tree[i] += delta
+            i += i & -i
+
+    def prefix(self, i):
+        """Sum of positions 1..i"""
+        total = 0
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+
+class DoctorQueue:
+    """One doctor's waiting walk-ins"""
+
+    def __init__(self, doctor_id, walk_ins, service_seconds, version=None):
+        self.doctor_id = doctor_id
+        self.service_seconds = service_seconds
+        self.version = version
+        self.checked_at = time.monotonic()
+        self.heap = []
+        # walk_in_id -> (priority, ticket); heap items not matching it are stale
+        self.entries = {}
+        self.levels = [Fenwick() for _ in range(PRIORITIES)]
+        self.sizes = [0] * PRIORITIES
+        for walk_in_id, priority in walk_ins:
+            self.push(walk_in_id, priority)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def push(self, walk_in_id, priority, ticket=None):
+        """Queue at the back of ``priority``, or at ``ticket``'s place in arrival order"""
+        if ticket is None:
+            for level in range(PRIORITIES):
+                ticket = self.levels[level].append(1 if level == priority else 0)
+        else:
+            self.levels[priority].add(ticket, 1)
+        self.entries[walk_in_id] = (priority, ticket)
+        self.sizes[priority] += 1
+        heapq.heappush(self.heap, (priority, ticket, walk_in_id))
+
+    def discard(self, walk_in_id):
+        """Forget a walk-in; its heap item goes stale. Returns its (priority, ticket) or None."""
+        entry = self.entries.pop(walk_in_id, None)
+        if entry is not None:
+            priority, ticket = entry
+            self.levels[priority].add(ticket, -1)
+            self.sizes[priority] -= 1
+            if len(self.heap) > 2 * len(self.entries) + 16:
+                self.heap = [(p, t, i) for i, (p, t) in self.entries.items()]
+                heapq.heapify(self.heap)
+        return entry
+
+    def peek(self):
+        while self.heap:
+            priority, ticket, walk_in_id = self.heap[0]
+            if self.entries.get(walk_in_id) == (priority, ticket):
+                return walk_in_id
+            heapq.heappop(self.heap)
+        return None
+
+    def position(self, walk_in_id):
+        """Walk-ins ahead of ``walk_in_id``, or None if it is not waiting"""
+        entry = self.entries.get(walk_in_id)
+        if entry is None:
+            return None
+        priority, ticket = entry
+        return sum(self.sizes[:priority]) + self.levels[priority].prefix(ticket - 1)
+
+    def ahead_of_new(self, priority=NORMAL):
+        """Walk-ins a new arrival of ``priority`` would wait behind"""
+        return sum(self.sizes[:priority + 1])
+
+    def record_service(self, seconds):
+        smoothing = walk_ins_setting('SERVICE_SMOOTHING')
+        self.service_seconds += smoothing * (seconds - self.service_seconds)
+
+
+def service_averages(doctor_ids):
+    """{doctor_id: average seconds from called to done} over SERVICE_WINDOW_DAYS"""
+    since = timezone.now() - timedelta(days=walk_ins_setting('SERVICE_WINDOW_DAYS'))
+    totals = {}
+    rows = WalkIn.objects.filter(
+        doctor_id__in=doctor_ids, status='done', finished_at__gte=since, called_at__isnull=False
+    ).values_list('doctor_id', 'called_at', 'finished_at')
+    for doctor_id, called_at, finished_at in rows.iterator():
+        seconds, count = totals.get(doctor_id, (0.0, 0))
+        totals[doctor_id] = (seconds + (finished_at - called_at).total_seconds(), count + 1)
+    default = walk_ins_setting('DEFAULT_SERVICE_MINUTES') * 60
+    return {
+        doctor_id: totals[doctor_id][0] / totals[doctor_id][1] if doctor_id in totals else default
+        for doctor_id in doctor_ids
+    }
+
+
+def load_queues(doctor_ids):
+    """Build DoctorQueues from the waiting rows of ``doctor_ids`` with two queries"""
+    versions = cache.get_many([version_key(doctor_id) for doctor_id in doctor_ids])
+    waiting = {doctor_id: [] for doctor_id in doctor_ids}
+    # Tickets follow arrival, whatever the priority, so a priority change keeps its place
+    rows = WalkIn.objects.filter(doctor_id__in=doctor_ids, status='waiting').order_by(
+        'queued_at', 'id'
+    ).values_list('doctor_id', 'id', 'priority')
+    for doctor_id, walk_in_id, priority in rows.iterator():
+        waiting[doctor_id].append((walk_in_id, priority))
+    services = service_averages(doctor_ids)
+    return {
+        doctor_id: DoctorQueue(doctor_id, walk_ins, services[doctor_id], versions.get(version_key(doctor_id)))
+        for doctor_id, walk_ins in waiting.items()
+    }
+
+
+class QueueChanged(Exception):
+    """The walk-in was changed by another desk; reload and try again"""
+
+
+class WalkInQueues:
+    def __init__(self, version_check_seconds=None):
+        self.version_check_seconds = (
+            walk_ins_setting('VERSION_CHECK_SECONDS') if version_check_seconds is None else version_check_seconds
+        )
+        self.queues = {}
+        self._lock = threading.RLock()
+
+    # Loading and sharing
+
+    def get_many(self, doctor_ids):
+        """{doctor_id: DoctorQueue}, reloading missing queues and those another process changed"""
+        now = time.monotonic()
+        with self._lock:
+            found = {doctor_id: self.queues[doctor_id] for doctor_id in doctor_ids if doctor_id in self.queues}
+        due = [doctor_id for doctor_id, queue in found.items() if now - queue.checked_at >= self.version_check_seconds]
+        if due:
+            versions = cache.get_many([version_key(doctor_id) for doctor_id in due])
+            for doctor_id in due:
+                if versions.get(version_key(doctor_id)) != found[doctor_id].version:
+                    del found[doctor_id]
+                else:
+                    found[doctor_id].checked_at = now
+        stale = [doctor_id for doctor_id in doctor_ids if doctor_id not in found]
+        if stale:
+            loaded = load_queues(stale)
+            with self._lock:
+                self.queues.update(loaded)
+            found.update(loaded)
+        return found
+
+    def get(self, doctor_id):
+        return self.get_many([doctor_id])[doctor_id]
+
+    def reload(self, doctor_id):
+        with self._lock:
+            self.queues.pop(doctor_id, None)
+        return self.get(doctor_id)
+
+    def changed(self, queue):
+        """Publish a change made here once it commits; this process's copy is already current"""
+        def publish():
+            version = bump_version(queue.doctor_id)
+            # Only adopt the new version if nobody else changed the queue in between
+            if version == (queue.version or 0) + 1:
+                queue.version = version
+        transaction.on_commit(publish)
+
+    # Operations
+
+    def enqueue(self, doctor_id, name, priority=NORMAL, patient=None, created_by=None):
+        """Add a walk-in at the back of its priority. Returns (walk_in, position)."""
+        queue = self.get(doctor_id)
+        walk_in = WalkIn.objects.create(
+            doctor_id=doctor_id, name=name, priority=priority, patient=patient, created_by=created_by
+        )
+        with self._lock:
+            queue.push(walk_in.pk, priority)
+            position = queue.position(walk_in.pk)
+        self.changed(queue)
+        return walk_in, position
+
+    def call_next(self, doctor_id, attempts=3):
+        """Mark the doctor's first waiting walk-in as called and return it, or None if nobody waits"""
+        queue = self.get(doctor_id)
+        for _ in range(attempts):
+            with self._lock:
+                walk_in_id = queue.peek()
+            if walk_in_id is None:
+                return None
+            called = WalkIn.objects.filter(pk=walk_in_id, status='waiting').update(
+                status='called', called_at=timezone.now()
+            )
+            with self._lock:
+                queue.discard(walk_in_id)
+            if called:
+                self.changed(queue)
+                return WalkIn.objects.select_related('patient').get(pk=walk_in_id)
+            # Another desk called it or it was removed: our copy is behind
+            queue = self.reload(doctor_id)
+        raise QueueChanged()
+
+    def requeue(self, walk_in, priority=None):
+        """
+        Change a waiting walk-in's priority, keeping its place in arrival order,
+        or put a called one back at the end of its priority. Returns its position.
+        """
+        priority = walk_in.priority if priority is None else priority
+        queue = self.get(walk_in.doctor_id)
+        if walk_in.status == 'waiting':
+            if not WalkIn.objects.filter(pk=walk_in.pk, status='waiting').update(priority=priority):
+                raise QueueChanged()
+            with self._lock:
+                entry = queue.discard(walk_in.pk)
+                queue.push(walk_in.pk, priority, ticket=entry[1] if entry else None)
+        elif walk_in.status == 'called':
+            requeued = WalkIn.objects.filter(pk=walk_in.pk, status='called').update(
+                status='waiting', priority=priority, queued_at=timezone.now(), called_at=None
+            )
+            if not requeued:
+                raise QueueChanged()
+            with self._lock:
+                queue.push(walk_in.pk, priority)
+        else:
+            raise ValueError("Only waiting or called walk-ins can be requeued")
+        walk_in.status, walk_in.priority = 'waiting', priority
+        self.changed(queue)
+        with self._lock:
+            return queue.position(walk_in.pk)
+
+    def finish(self, walk_in):
+        """Mark a called walk-in done and fold its visit into the doctor's service time"""
+        if walk_in.status != 'called':
+            raise ValueError("Only called walk-ins can be finished")
+        now = timezone.now()
+        if not WalkIn.objects.filter(pk=walk_in.pk, status='called').update(status='done', finished_at=now):
+            raise QueueChanged()
+        queue = self.get(walk_in.doctor_id)
+        if walk_in.called_at is not None:
+            with self._lock:
+                queue.record_service((now - walk_in.called_at).total_seconds())
+        walk_in.status, walk_in.finished_at = 'done', now
+
+    def leave(self, walk_in):
+        """The walk-in left before being seen"""
+        if walk_in.status not in ('waiting', 'called'):
+            raise ValueError("Only waiting or called walk-ins can leave")
+        if not WalkIn.objects.filter(pk=walk_in.pk, status__in=('waiting', 'called')).update(status='left'):
+            raise QueueChanged()
+        queue = self.get(walk_in.doctor_id)
+        with self._lock:
+            queue.discard(walk_in.pk)
+        walk_in.status = 'left'
+        self.changed(queue)
+
+    # Estimates
+
+    def estimate_wait(self, walk_in):
+        """(walk-ins ahead, estimated wait) for a waiting walk-in, or None if it is not waiting"""
+        queue = self.get(walk_in.doctor_id)
+        with self._lock:
+            ahead = queue.position(walk_in.pk)
+            if ahead is None:
+                return None
+            return ahead, timedelta(seconds=ahead * queue.service_seconds)
+
+    def least_loaded(self, doctor_ids, priority=NORMAL, limit=None):
+        """
+        Doctors ordered by how long a new walk-in of ``priority`` would wait:
+        [(doctor_id, waiting, estimated_wait)], shortest first.
+        """
+        queues = self.get_many(list(doctor_ids))
+        with self._lock:
+            loads = [
+                (queue.ahead_of_new(priority) * queue.service_seconds, len(queue), doctor_id)
+                for doctor_id, queue in queues.items()
+            ]
+        ranked = heapq.nsmallest(limit, loads) if limit else sorted(loads)
+        return [(doctor_id, waiting, timedelta(seconds=seconds)) for seconds, waiting, doctor_id in ranked]
+
+    def clear(self):
+        with self._lock:
+            self.queues.clear()
+
+
+@lru_cache(maxsize=None)
+def get_walk_in_queues():
+    """This process's WalkInQueues"""
+    return WalkInQueues()
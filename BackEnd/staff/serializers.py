@@ -0,0 +1,40 @@
+# staff/serializers.py
+from rest_framework import serializers
+
+from authentication.models import User
+from doctor.models import Doctor, Specialization
+from .models import WalkIn
+
+
+class WalkInSerializer(serializers.ModelSerializer):
+    doctor_name = serializers.CharField(source='doctor.user.get_full_name', read_only=True)
+    
+    class Meta:
+        model = WalkIn
+        fields = [
+            'id', 'doctor', 'doctor_name', 'patient', 'name', 'priority', 'status',
+            'queued_at', 'called_at', 'finished_at'
+        ]
+        read_only_fields = fields
+
+
+class EnqueueWalkInSerializer(serializers.Serializer):
+    """A doctor, or a specialization to send the walk-in to its least loaded doctor"""
+    doctor = serializers.PrimaryKeyRelatedField(queryset=Doctor.objects.filter(is_available=True), required=False)
+    specialization = serializers.PrimaryKeyRelatedField(queryset=Specialization.objects.all(), required=False)
+    patient = serializers.PrimaryKeyRelatedField(queryset=User.objects.filter(user_type='patient'), required=False)
+    name = serializers.CharField(max_length=150, required=False)
+    priority = serializers.ChoiceField(choices=WalkIn.PRIORITY_CHOICES, default=2)
+    
+    def validate(self, data):
+        if not data.get('doctor') and not data.get('specialization'):
+            raise serializers.ValidationError("Either doctor or specialization is required.")
+        if not data.get('name'):
+            if not data.get('patient'):
+                raise serializers.ValidationError("Either patient or name is required.")
+            data['name'] = data['patient'].get_full_name()
+        return data
+
+
+class RequeueWalkInSerializer(serializers.Serializer):
+    priority = serializers.ChoiceField(choices=WalkIn.PRIORITY_CHOICES, required=False)
@@ -1,3 +1,74 @@
+from django.core.cache import cache
 from django.test import TestCase
 
-# Create your tests here.
+from authentication.models import User
+from doctor.models import Doctor, Specialization
+from .models import WalkIn
+from .queue import WalkInQueues
+
+EMERGENCY, URGENT, NORMAL = 0, 1, 2
+
+
+class WalkInQueueTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(email='doctor@example.com', password=None, first_name='Doc',
+                                        last_name='Tor', user_type='doctor')
+        specialization = Specialization.objects.create(name='General Medicine')
+        self.doctor = Doctor.objects.create(user=user, specialization=specialization, license_number='LIC-1',
+                                            consultation_fee=0)
+        # A fresh copy per test, re-checking the shared version on every read
+        self.queues = WalkInQueues(version_check_seconds=0)
+
+    def enqueue(self, name, priority=NORMAL):
+        walk_in, _ = self.queues.enqueue(self.doctor.pk, name, priority=priority)
+        return walk_in
+
+    def call_all(self, queues=None):
+        queues = queues or self.queues
+        names = []
+        while (walk_in := queues.call_next(self.doctor.pk)) is not None:
+            names.append(walk_in.name)
+        return names
+
+    def test_call_next_on_an_empty_queue(self):
+        self.assertIsNone(self.queues.call_next(self.doctor.pk))
+
+    def test_priority_then_arrival_order(self):
+        for name, priority in [('n1', NORMAL), ('u1', URGENT), ('n2', NORMAL), ('e1', EMERGENCY), ('u2', URGENT)]:
+            self.enqueue(name, priority)
+        called = self.queues.call_next(self.doctor.pk)
+        self.assertEqual((called.name, called.status), ('e1', 'called'))
+        self.assertIsNotNone(called.called_at)
+        self.assertEqual(self.call_all(), ['u1', 'u2', 'n1', 'n2'])
+
+    def test_queue_reloaded_from_the_database_keeps_the_order(self):
+        for name, priority in [('n1', NORMAL), ('e1', EMERGENCY), ('n2', NORMAL)]:
+            self.enqueue(name, priority)
+        self.assertEqual(self.call_all(WalkInQueues(version_check_seconds=0)), ['e1', 'n1', 'n2'])
+
+    def test_called_walk_in_requeues_at_the_back_of_its_priority(self):
+        for name in ['a', 'b', 'c']:
+            self.enqueue(name)
+        called = self.queues.call_next(self.doctor.pk)
+        self.assertEqual(self.queues.requeue(called), 2)
+        self.assertEqual(WalkIn.objects.get(pk=called.pk).status, 'waiting')
+        self.assertEqual(self.call_all(), ['b', 'c', 'a'])
+
+    def test_waiting_walk_in_changes_priority_keeping_its_arrival(self):
+        first = self.enqueue('first')
+        self.enqueue('second')
+        self.enqueue('urgent', URGENT)
+        late = self.enqueue('late')
+        # Raised to urgent, but behind the walk-in that was urgent before it arrived
+        self.assertEqual(self.queues.requeue(late, URGENT), 1)
+        # Requeued at the same priority, a waiting walk-in keeps its place
+        self.queues.requeue(first, NORMAL)
+        self.assertEqual(self.call_all(), ['urgent', 'late', 'first', 'second'])
+
+    def test_walk_in_called_elsewhere_is_skipped(self):
+        first = self.enqueue('first')
+        self.enqueue('second')
+        WalkIn.objects.filter(pk=first.pk).update(status='called')
+        self.assertEqual(self.queues.call_next(self.doctor.pk).name, 'second')
+        self.assertIsNone(self.queues.call_next(self.doctor.pk))
@@ -0,0 +1,16 @@
+# staff/urls.py
+from django.urls import path
+from . import views
+
+app_name = 'staff'
+
+urlpatterns = [
+    # Walk-in queue
+    path('walk-ins/', views.walk_ins, name='walk_ins'),
+    path('walk-ins/least-loaded/', views.least_loaded_doctors, name='least_loaded_doctors'),
+    path('walk-ins/doctors/<int:doctor_id>/next/', views.call_next_walk_in, name='call_next_walk_in'),
+    path('walk-ins/<int:walk_in_id>/wait/', views.walk_in_wait, name='walk_in_wait'),
+    path('walk-ins/<int:walk_in_id>/requeue/', views.update_walk_in, {'action': 'requeue'}, name='requeue_walk_in'),
+    path('walk-ins/<int:walk_in_id>/finish/', views.update_walk_in, {'action': 'finish'}, name='finish_walk_in'),
+    path('walk-ins/<int:walk_in_id>/leave/', views.update_walk_in, {'action': 'leave'}, name='leave_walk_in'),
+]
@@ -1,3 +1,205 @@
-from django.shortcuts import render
+# staff/views.py
+from rest_framework import status, permissions
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
 
-# Create your views here.
+from doctor.models import Doctor
+from .models import WalkIn
+from .queue import NORMAL, QueueChanged, get_walk_in_queues
+from .serializers import EnqueueWalkInSerializer, RequeueWalkInSerializer, WalkInSerializer
+
+
+def front_desk_only(request):
+    """A 403 response for patients, who do not manage the walk-in queue"""
+    if request.user.is_patient():
+        return Response({
+            'success': False,
+            'message': 'Only clinic staff can manage walk-ins'
+        }, status=status.HTTP_403_FORBIDDEN)
+    return None
+
+
+def queue_changed():
+    return Response({
+        'success': False,
+        'message': 'The walk-in was updated at another desk; refresh and try again'
+    }, status=status.HTTP_409_CONFLICT)
+
+
+def wait_payload(estimate):
+    if estimate is None:
+        return {'ahead': None, 'estimated_wait_minutes': None}
+    ahead, wait = estimate
+    return {'ahead': ahead, 'estimated_wait_minutes': round(wait.total_seconds() / 60)}
+
+
+def doctor_loads(specialization_id, priority=NORMAL, limit=None):
+    doctor_ids = Doctor.objects.filter(is_available=True, specialization_id=specialization_id).values_list('id', flat=True)
+    return get_walk_in_queues().least_loaded(doctor_ids, priority=priority, limit=limit)
+
+
+@api_view(['GET', 'POST'])
+@permission_classes([permissions.IsAuthenticated])
+def walk_ins(request):
+    """List a doctor's waiting walk-ins in call order (?doctor=), or add one"""
+    denied = front_desk_only(request)
+    if denied:
+        return denied
+    
+    if request.method == 'GET':
+        if not request.GET.get('doctor', '').isdigit():
+            return Response({
+                'success': False,
+                'message': 'doctor is required'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        doctor_id = int(request.GET['doctor'])
+        waiting = WalkIn.objects.filter(doctor_id=doctor_id, status='waiting').select_related('doctor__user')
+        service_seconds = get_walk_in_queues().get(doctor_id).service_seconds
+        return Response([
+            {**WalkInSerializer(walk_in).data, 'ahead': ahead,
+             'estimated_wait_minutes': round(ahead * service_seconds / 60)}
+            for ahead, walk_in in enumerate(waiting)
+        ])
+    
+    serializer = EnqueueWalkInSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response({
+            'success': False,
+            'errors': serializer.errors
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    data = serializer.validated_data
+    if data.get('doctor'):
+        doctor_id = data['doctor'].pk
+    else:
+        loads = doctor_loads(data['specialization'].pk, priority=data['priority'], limit=1)
+        if not loads:
+            return Response({
+                'success': False,
+                'message': 'No available doctor for this specialization'
+            }, status=status.HTTP_404_NOT_FOUND)
+        doctor_id = loads[0][0]
+    
+    queues = get_walk_in_queues()
+    walk_in, _ = queues.enqueue(doctor_id, data['name'], data['priority'], patient=data.get('patient'),
+                                created_by=request.user)
+    return Response({
+        'success': True,
+        'walk_in': WalkInSerializer(walk_in).data,
+        **wait_payload(queues.estimate_wait(walk_in))
+    }, status=status.HTTP_201_CREATED)
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def call_next_walk_in(request, doctor_id):
+    """Call the doctor's next walk-in: highest priority, then earliest queued"""
+    denied = front_desk_only(request)
+    if denied:
+        return denied
+    
+    try:
+        walk_in = get_walk_in_queues().call_next(doctor_id)
+    except QueueChanged:
+        return queue_changed()
+    if walk_in is None:
+        return Response({
+            'success': True,
+            'walk_in': None,
+            'message': 'Nobody is waiting'
+        })
+    return Response({
+        'success': True,
+        'walk_in': WalkInSerializer(walk_in).data
+    })
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def update_walk_in(request, walk_in_id, action):
+    """requeue (optional priority), finish, or leave"""
+    denied = front_desk_only(request)
+    if denied:
+        return denied
+    
+    walk_in = WalkIn.objects.filter(pk=walk_in_id).select_related('doctor__user').first()
+    if walk_in is None:
+        return Response({
+            'success': False,
+            'message': 'Walk-in not found'
+        }, status=status.HTTP_404_NOT_FOUND)
+    
+    queues = get_walk_in_queues()
+    try:
+        if action == 'requeue':
+            serializer = RequeueWalkInSerializer(data=request.data)
+            if not serializer.is_valid():
+                return Response({
+                    'success': False,
+                    'errors': serializer.errors
+                }, status=status.HTTP_400_BAD_REQUEST)
+            queues.requeue(walk_in, serializer.validated_data.get('priority'))
+        elif action == 'finish':
+            queues.finish(walk_in)
+        else:
+            queues.leave(walk_in)
+    except QueueChanged:
+        return queue_changed()
+    except ValueError as e:
+        return Response({
+            'success': False,
+            'message': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    return Response({
+        'success': True,
+        'walk_in': WalkInSerializer(walk_in).data,
+        **wait_payload(queues.estimate_wait(walk_in))
+    })
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def walk_in_wait(request, walk_in_id):
+    """Walk-ins ahead and the estimated wait; patients may ask about their own"""
+    walk_in = WalkIn.objects.filter(pk=walk_in_id).only('id', 'doctor_id', 'patient_id', 'status').first()
+    if walk_in is None or (request.user.is_patient() and walk_in.patient_id != request.user.pk):
+        return Response({
+            'success': False,
+            'message': 'Walk-in not found'
+        }, status=status.HTTP_404_NOT_FOUND)
+    return Response({'id': walk_in.pk, 'status': walk_in.status,
+                     **wait_payload(get_walk_in_queues().estimate_wait(walk_in))})
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def least_loaded_doctors(request):
+    """Doctors of ?specialization= by expected wait for a new walk-in (?priority=, ?limit=)"""
+    denied = front_desk_only(request)
+    if denied:
+        return denied
+    
+    try:
+        specialization_id = int(request.GET['specialization'])
+        priority = int(request.GET.get('priority', NORMAL))
+        limit = int(request.GET['limit']) if request.GET.get('limit') else None
+    except (KeyError, ValueError):
+        return Response({
+            'success': False,
+            'message': 'specialization is required; priority and limit must be numbers'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    if priority not in dict(WalkIn.PRIORITY_CHOICES):
+        return Response({
+            'success': False,
+            'message': 'Unknown priority'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    loads = doctor_loads(specialization_id, priority=priority, limit=limit)
+    names = {doctor.pk: str(doctor) for doctor in Doctor.objects.filter(
+        pk__in=[doctor_id for doctor_id, _, _ in loads]).select_related('user')}
+    return Response([
+        {'doctor': doctor_id, 'doctor_name': names[doctor_id], 'waiting': waiting,
+         'estimated_wait_minutes': round(wait.total_seconds() / 60)}
+        for doctor_id, waiting, wait in loads
+    ])